@@ -0,0 +1,100 @@
+from __future__ import annotations
+from pathlib import Path
+
+import pandas as pd
+
+import data as data_mod
+from metrics import compute_derived_metrics
+
+# Aggregates the pages show, for one filter set; shared by the views and the JSON API
+# (api.py) so both report the same numbers.
+
+KPI_KEYS = ["spend", "total_revenue", "attributed_revenue", "new_customers", "mer", "blended_cac", "attributed_roas"]
+CAMPAIGN_KEYS = ["channel", "tactic", "state", "campaign"]
+
+
+def previous_period(filters: dict | None) -> dict | None:
+    """`filters` moved to the equally long window that ends the day before, or None without a date range."""
+    dr = (filters or {}).get("date_range") or []
+    if not (isinstance(dr, (list, tuple)) and len(dr) == 2):
+        return None
+    try:
+        start, end = pd.to_datetime(dr[0]), pd.to_datetime(dr[1])
+    except (TypeError, ValueError):
+        return None
+    if pd.isna(start) or pd.isna(end):
+        return None
+    prev_end = start.normalize() - pd.Timedelta(days=1)
+    prev_start = prev_end - pd.Timedelta(days=(end - start).days)
+    return {**(filters or {}), "date_range": [prev_start, prev_end]}
+
+
+def kpis(filters: dict | None = None, data_dir: Path | None = None) -> dict:
+    """Headline KPIs: spend, business revenue, MER, blended CAC and attributed ROAS.
+
+    Business totals (revenue, new customers) follow the date range only; spend and
+    attributed revenue follow every filter.
+    """
+    m_daily = data_mod.query_marketing(["date"], filters, data_dir)
+    blended = data_mod.blended_kpis(filters, data_dir)
+    business = data_mod.load_business_data(data_dir)
+    dr = (filters or {}).get("date_range") or []
+    if len(dr) == 2 and not business.empty:
+        start, end = pd.to_datetime(dr[0]), pd.to_datetime(dr[1])
+        business = business[(business["date"] >= start) & (business["date"] <= end)]
+    spend = float(m_daily["spend"].sum()) if not m_daily.empty else 0.0
+    revenue = float(blended["total_revenue"].sum()) if not blended.empty else 0.0
+    attributed = float(m_daily["attributed_revenue"].sum()) if not m_daily.empty else 0.0
+    new_customers = float(business["new_customers"].sum()) if not business.empty else 0.0
+    return {
+        "spend": spend,
+        "total_revenue": revenue,
+        "attributed_revenue": attributed,
+        "new_customers": new_customers,
+        "mer": revenue / spend if spend else 0.0,
+        "blended_cac": spend / new_customers if new_customers else 0.0,
+        "attributed_roas": attributed / spend if spend else 0.0,
+    }
+
+
+def channel_breakdown(filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Per-channel totals with CTR, CPC, CPM and ROAS."""
+    return compute_derived_metrics(data_mod.query_marketing(["channel"], filters, data_dir).drop(columns="rows"))
+
+
+def campaign_table(filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Per channel x tactic x state x campaign totals with CTR, CPC, CPM and ROAS."""
+    return compute_derived_metrics(data_mod.query_marketing(CAMPAIGN_KEYS, filters, data_dir).drop(columns="rows"))
+
+
+def daily_channels(filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Per date x channel totals with ratios (the Trends page's series)."""
+    return compute_derived_metrics(data_mod.query_marketing(["date", "channel"], filters, data_dir).drop(columns="rows"))
+
+
+def geo_tactic_table(filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Per state x channel x tactic totals with ratios (the Geo & Tactic page's breakdown)."""
+    return compute_derived_metrics(
+        data_mod.query_marketing(["state", "channel", "tactic"], filters, data_dir).drop(columns="rows")
+    )
+
+
+def cost_percentiles(filters: dict | None = None, data_dir: Path | None = None, by: tuple = ("channel",)) -> pd.DataFrame:
+    """CPC and CPM p50/p90/p99 per `by` group, one row per group (columns like cpc_p50, cpm_p99).
+
+    Approximate, from the ingest sketches (see data.cost_percentiles); groups with no
+    clicks or impressions get NaN for that ratio.
+    """
+    long = data_mod.cost_percentiles(by, filters, data_dir)
+    pcts = [c for c in long.columns if c not in list(by) + ["metric", "count"]]
+    if long.empty:
+        return pd.DataFrame(columns=list(by) + [f"{m}_{p}" for m in ("cpc", "cpm") for p in pcts])
+    wide = long.pivot(index=list(by), columns="metric", values=pcts)
+    wide.columns = [f"{m}_{p}" for p, m in wide.columns]
+    order = [f"{m}_{p}" for m in ("cpc", "cpm") for p in pcts if f"{m}_{p}" in wide.columns]
+    return wide[order].reset_index()
+
+
+def blended_daily(filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Daily spend joined with business totals (see metrics.BLENDED_COLUMNS). Shared: copy before mutating."""
+    return data_mod.blended_kpis(filters, data_dir)
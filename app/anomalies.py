@@ -0,0 +1,296 @@
+"""EWMA/CUSUM control charts over every campaign-day series.
+
+Run headless (e.g. from cron) to print the ranked alert table:
+
+    python app/anomalies.py [--data-dir DIR] [--days 7] [--top 50] [--format table|csv|json]
+                            [--state FILE] [--fail-on-alert]
+
+With --state, the chart state is saved between runs so only new days are processed.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+import argparse
+import hashlib
+import pickle
+import sys
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+METRICS = ("spend", "ctr", "cpc", "roas")
+SERIES_KEYS = ["channel", "campaign"]
+# EWMA smoothing; 0.1 weighs roughly the last 20 days
+ALPHA = 0.1
+# Observations a series needs before it can alert
+WARMUP = 14
+# |z| of a single day that raises an alert
+Z_ALERT = 4.0
+# CUSUM slack and decision interval, in standard deviations
+CUSUM_K = 0.5
+CUSUM_H = 6.0
+# Residuals are clipped to this many std before updating the EWMA, so one spike
+# does not inflate the baseline it is judged against
+Z_CLIP = 3.0
+# Std floor relative to the level, so near-constant series do not alert on tiny moves
+REL_STD_FLOOR = 0.05
+# Days of alerts kept in the state
+ALERT_HISTORY_DAYS = 90
+
+ALERT_COLUMNS = SERIES_KEYS + ["date", "metric", "value", "expected", "z", "cusum", "direction", "severity"]
+
+
+VALUE_COLUMNS = ["impressions", "clicks", "spend", "attributed_revenue"]
+
+
+def _series_ids(daily: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    """Sorted series keys of a daily aggregate, and each row's index into them."""
+    grouped = daily.groupby(SERIES_KEYS, sort=True)
+    return grouped.size().index.to_frame(index=False), grouped.ngroup().to_numpy()
+
+
+def _dense(daily: pd.DataFrame, sid: np.ndarray, off: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """(metric, series, day) array of the rows of `daily`, at series `sid` and day `off`.
+
+    Days a series has no row, and ratios with a zero denominator, are NaN (not observed).
+    """
+    flat = sid * shape[1] + off
+    seen = np.bincount(flat, minlength=shape[0] * shape[1]).reshape(shape) > 0
+
+    def dense(col: str) -> np.ndarray:
+        return np.bincount(flat, daily[col].to_numpy(dtype=float), shape[0] * shape[1]).reshape(shape)
+
+    impressions, clicks, spend, revenue = (dense(c) for c in VALUE_COLUMNS)
+
+    def ratio(n: np.ndarray, d: np.ndarray) -> np.ndarray:
+        out = np.full(shape, np.nan)
+        np.divide(n, d, out=out, where=d > 0)
+        return out
+
+    return np.stack([np.where(seen, spend, np.nan), ratio(clicks, impressions), ratio(spend, clicks), ratio(revenue, spend)])
+
+
+def series_matrix(daily: pd.DataFrame) -> tuple[pd.DataFrame, np.datetime64, np.ndarray]:
+    """Dense (metric, series, day) array from a date x channel x campaign daily aggregate.
+
+    Returns (series keys, first day, array); see _dense for what is NaN.
+    """
+    keys, sid = _series_ids(daily)
+    day = daily["date"].to_numpy().astype("datetime64[D]")
+    start = day.min()
+    off = (day - start).astype(np.int64)
+    return keys, start, _dense(daily, sid, off, (len(keys), int(off.max()) + 1))
+
+
+@dataclass
+class ControlState:
+    """Per-series chart state after `days` days starting at `start`; arrays are (metric, series)."""
+
+    keys: pd.DataFrame
+    start: np.datetime64
+    days: int
+    mean: np.ndarray
+    var: np.ndarray
+    n: np.ndarray
+    cusum_pos: np.ndarray
+    cusum_neg: np.ndarray
+    digest: int  # of the processed rows (see _digest), to detect restated days
+    alerts: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=ALERT_COLUMNS))
+    version: int | None = None  # dataset version it was last updated to (in-app cache only)
+
+    @property
+    def last_day(self) -> np.datetime64:
+        return self.start + np.timedelta64(self.days - 1, "D")
+
+
+def _row_hashes(daily: pd.DataFrame, keys: pd.DataFrame, sid: np.ndarray) -> np.ndarray:
+    """A hash of every daily row. Keys are hashed once per series, so the rest is numeric."""
+    series = pd.util.hash_pandas_object(keys, index=False).to_numpy()[sid]
+    cols = pd.DataFrame({"date": daily["date"].to_numpy(), "series": series, **{c: daily[c].to_numpy(dtype=float) for c in VALUE_COLUMNS}})
+    return pd.util.hash_pandas_object(cols, index=False).to_numpy()
+
+
+def _digest(hashes: np.ndarray) -> int:
+    """Sum of row hashes: independent of the rows' order, and extended with more rows by
+    adding theirs, so processed rows are never hashed into it again."""
+    return int(hashes.sum(dtype=np.uint64))
+
+
+def _fresh(keys: pd.DataFrame, start: np.datetime64) -> ControlState:
+    shape = (len(METRICS), len(keys))
+    zeros = np.zeros(shape)
+    return ControlState(keys, start, 0, zeros.copy(), zeros.copy(), np.zeros(shape, dtype=np.int64),
+                        zeros.copy(), zeros.copy(), 0)
+
+
+def _resume(
+    state: ControlState | None, keys: pd.DataFrame, start: np.datetime64, sid: np.ndarray, off: np.ndarray,
+    hashes: np.ndarray,
+) -> tuple[ControlState, np.ndarray]:
+    """Carry `state` over to the series in `keys`, or start over if its history was restated.
+
+    Only the rows `state` processed (its series, up to its last day) are checked against
+    its digest. Also returns which rows those are; series that are new since `state` get
+    a zero chart, still to be seeded.
+    """
+    fresh, none = _fresh(keys, start), np.zeros(len(sid), dtype=bool)
+    if state is None or state.days == 0 or state.start != start:
+        return fresh, none
+    idx = pd.MultiIndex.from_frame(keys).get_indexer(pd.MultiIndex.from_frame(state.keys))
+    if (idx < 0).any():
+        return fresh, none
+    known = np.zeros(len(keys), dtype=bool)
+    known[idx] = True
+    processed = known[sid] & (off < state.days)
+    if _digest(hashes[processed]) != state.digest:
+        return fresh, none
+    for name in ("mean", "var", "n", "cusum_pos", "cusum_neg"):
+        getattr(fresh, name)[:, idx] = getattr(state, name)
+    fresh.days, fresh.digest, fresh.alerts = state.days, state.digest, state.alerts
+    return fresh, processed
+
+
+def _step(st: ControlState, X: np.ndarray, first: np.datetime64, series: np.ndarray) -> list[pd.DataFrame]:
+    """Advance the charts of `series` (indices into st.keys) through the days of X.
+
+    Every series is stepped together: each day is a handful of (metric, series) array
+    operations. Returns the alerts raised, with their series index.
+    """
+    m, v, n, cp, cn = (getattr(st, name)[:, series] for name in ("mean", "var", "n", "cusum_pos", "cusum_neg"))
+    found = []
+    for t in range(X.shape[2]):
+        x = X[:, :, t]
+        seen = ~np.isnan(x)
+        warm = seen & (n >= WARMUP)
+        std = np.maximum(np.sqrt(v), REL_STD_FLOOR * np.abs(m) + 1e-9)
+        d = np.where(seen, x - m, 0.0)
+        z = d / std
+        zc = np.clip(z, -Z_CLIP, Z_CLIP)
+        cp[:] = np.where(warm, np.maximum(0.0, cp + zc - CUSUM_K), cp)
+        cn[:] = np.where(warm, np.maximum(0.0, cn - zc - CUSUM_K), cn)
+        hit = warm & ((np.abs(z) > Z_ALERT) | (cp > CUSUM_H) | (cn > CUSUM_H))
+        if hit.any():
+            mi, si = np.nonzero(hit)
+            cus = np.where(z[mi, si] >= 0, cp[mi, si], -cn[mi, si])
+            found.append(pd.DataFrame({
+                "series": series[si],
+                "date": first + np.timedelta64(t, "D"),
+                "metric": np.asarray(METRICS)[mi],
+                "value": x[mi, si],
+                "expected": m[mi, si],
+                "z": z[mi, si],
+                "cusum": cus,
+            }))
+            # A CUSUM alarm restarts its accumulator
+            cp[hit & (cp > CUSUM_H)] = 0.0
+            cn[hit & (cn > CUSUM_H)] = 0.0
+        # Update the EWMA with the clipped residual; first observations seed the level
+        step = np.where(warm, zc * std, d)
+        first_obs = seen & (n == 0)
+        m[:] = np.where(first_obs, np.nan_to_num(x), m + np.where(seen, ALPHA * step, 0.0))
+        v[:] = np.where(seen & ~first_obs, (1 - ALPHA) * (v + ALPHA * step * step), v)
+        n += seen
+    for name, a in zip(("mean", "var", "n", "cusum_pos", "cusum_neg"), (m, v, n, cp, cn)):
+        getattr(st, name)[:, series] = a
+    return found
+
+
+def update(state: ControlState | None, daily: pd.DataFrame) -> ControlState:
+    """Advance the charts to the end of `daily`, processing only days not yet in `state`.
+
+    Only the days after `state`'s last are made dense and stepped, every series together;
+    a series that is new since `state` first replays its own days up to there. A state whose processed rows no
+    longer match `daily` (restated history, a different start, or vanished series) is
+    discarded and the charts are rebuilt.
+    """
+    if daily.empty:
+        return state if state is not None else _fresh(pd.DataFrame(columns=SERIES_KEYS), np.datetime64("1970-01-01"))
+    keys, sid = _series_ids(daily)
+    day = daily["date"].to_numpy().astype("datetime64[D]")
+    start = day.min()
+    off = (day - start).astype(np.int64)
+    hashes = _row_hashes(daily, keys, sid)
+    st, processed = _resume(state, keys, start, sid, off, hashes)
+    found = []
+    later = off >= st.days
+    seed = ~processed & ~later
+    if seed.any():
+        # Series new since `state` replay their own days up to its last, on their own
+        added = np.flatnonzero(~pd.MultiIndex.from_frame(keys).isin(pd.MultiIndex.from_frame(state.keys)))
+        local = np.full(len(keys), -1)
+        local[added] = np.arange(len(added))
+        X = _dense(daily[seed], local[sid[seed]], off[seed], (len(added), st.days))
+        found += _step(st, X, start, added)
+    days = int(off.max()) + 1 - st.days
+    X = _dense(daily[later], sid[later], off[later] - st.days, (len(keys), days))
+    found += _step(st, X, st.start + np.timedelta64(st.days, "D"), np.arange(len(keys)))
+    st.days += days
+    st.digest = (st.digest + _digest(hashes[~processed])) % 2**64
+    if found:
+        new = pd.concat(found, ignore_index=True)
+        new = pd.concat([keys.iloc[new.pop("series")].reset_index(drop=True), new], axis=1)
+        new["direction"] = np.where(new["z"] >= 0, "up", "down")
+        new["severity"] = np.maximum(new["z"].abs() / Z_ALERT, new["cusum"].abs() / CUSUM_H)
+        st.alerts = pd.concat([st.alerts, new[ALERT_COLUMNS]], ignore_index=True) if len(st.alerts) else new[ALERT_COLUMNS]
+    cutoff = pd.Timestamp(st.last_day) - pd.Timedelta(days=ALERT_HISTORY_DAYS)
+    st.alerts = st.alerts[st.alerts["date"] > cutoff].reset_index(drop=True)
+    return st
+
+
+def alert_table(state: ControlState, days: int = 7, top: int | None = None) -> pd.DataFrame:
+    """Alerts from the last `days` processed days, most severe first."""
+    if state.days == 0 or state.alerts.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    since = pd.Timestamp(state.last_day) - pd.Timedelta(days=days - 1)
+    out = state.alerts[state.alerts["date"] >= since].sort_values(["severity", "date"], ascending=[False, False])
+    return (out.head(top) if top else out).reset_index(drop=True)
+
+
+def save_state(state: ControlState, path: Path) -> None:
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f)
+    tmp.replace(path)
+
+
+def load_state(path: Path) -> ControlState | None:
+    try:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return state if isinstance(state, ControlState) else None
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Print ranked campaign anomaly alerts.")
+    ap.add_argument("--data-dir", type=Path, default=None, help="data directory (default: DATA_DIR)")
+    ap.add_argument("--days", type=int, default=7, help="report alerts from the last N days")
+    ap.add_argument("--top", type=int, default=50, help="at most N alerts (0 for all)")
+    ap.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    ap.add_argument("--state", type=Path, default=None, help="file to resume chart state from and save it to")
+    ap.add_argument("--fail-on-alert", action="store_true", help="exit with status 1 if any alert is reported")
+    args = ap.parse_args(argv)
+
+    import data as data_mod  # deferred so the module stays importable without the data layer
+
+    daily = data_mod.query_marketing(["date"] + SERIES_KEYS, None, args.data_dir)
+    state = update(load_state(args.state) if args.state else None, daily)
+    if args.state:
+        save_state(state, args.state)
+    alerts = alert_table(state, args.days, args.top or None)
+    if args.format == "csv":
+        alerts.to_csv(sys.stdout, index=False)
+    elif args.format == "json":
+        print(alerts.to_json(orient="records", date_format="iso"))
+    elif alerts.empty:
+        print(f"No alerts in the last {args.days} days (through {state.last_day}).")
+    else:
+        print(alerts.to_string(index=False))
+    return 1 if args.fail_on_alert and not alerts.empty else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Local JSON API over the dashboard's aggregates, for tools that poll numbers.
+
+    python app/api.py [--host 127.0.0.1] [--port 8765] [--data-dir DIR]
+
+    GET /kpis       headline KPIs (object)
+    GET /channels   per-channel totals and ratios (records)
+    GET /campaigns  per channel x tactic x state x campaign totals and ratios (records)
+    GET /blended    daily spend joined with business totals (records)
+    GET /export/<table>.<csv|parquet>  a table from export.EXPORTS, streamed in chunks
+
+Filters use the dashboard's share-link parameters: channels, tactics and states as
+comma-separated lists, start and end as ISO dates. Every response carries an ETag built
+from the dataset fingerprint, the endpoint and the normalized filter signature; a
+request whose If-None-Match matches gets 304 before anything is computed.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Callable, Sequence
+
+import pandas as pd
+
+import aggregates
+import data as data_mod
+import export
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8765"))
+# Response bodies kept per ETag, so polls without If-None-Match skip recomputing too
+BODY_CACHE_SIZE = 256
+
+ENDPOINTS: dict[str, Callable[[dict, Path | None], object]] = {
+    "/kpis": aggregates.kpis,
+    "/channels": aggregates.channel_breakdown,
+    "/campaigns": aggregates.campaign_table,
+    "/blended": aggregates.blended_daily,
+}
+
+
+def parse_filters(query: str) -> dict:
+    """Dashboard filter dict from a query string; raises ValueError on a bad date."""
+    qs = parse_qs(query)
+
+    def values(key: str) -> list[str]:
+        return [p.strip() for v in qs.get(key, []) for p in v.split(",") if p.strip()]
+
+    filters = {"channels": values("channels"), "tactics": values("tactics"), "states": values("states"), "date_range": []}
+    start, end = (qs.get(k, [None])[-1] for k in ("start", "end"))
+    if start or end:
+        if not (start and end):
+            raise ValueError("start and end must be given together")
+        try:
+            filters["date_range"] = [pd.Timestamp(start).date(), pd.Timestamp(end).date()]
+        except ValueError:
+            raise ValueError(f"Invalid date range {start!r}..{end!r}") from None
+    return filters
+
+
+def etag(fingerprint: str, endpoint: str, sig: tuple) -> str:
+    # The fingerprint is the content key of the data files, so tags survive restarts
+    digest = hashlib.blake2b(repr((fingerprint, endpoint, sig)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _matches(header: str | None, tag: str) -> bool:
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or tag in tags
+
+
+def to_json(result: object, sig: tuple) -> bytes:
+    start, end, channels, tactics, states = sig
+    if isinstance(result, pd.DataFrame):
+        payload = result.to_json(orient="records", date_format="iso")
+    else:
+        payload = json.dumps(result)
+    filters = json.dumps({"start": start, "end": end, "channels": channels, "tactics": tactics, "states": states})
+    return f'{{"filters": {filters}, "data": {payload}}}'.encode()
+
+
+class _Bodies:
+    """Bounded LRU of response bodies by ETag."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tag: str) -> bytes | None:
+        with self._lock:
+            body = self._items.get(tag)
+            if body is not None:
+                self._items.move_to_end(tag)
+            return body
+
+    def put(self, tag: str, body: bytes) -> None:
+        with self._lock:
+            self._items[tag] = body
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "MarketingDashboardAPI/1"
+    data_dir: Path | None = None
+    bodies = _Bodies(BODY_CACHE_SIZE)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        if path == "/":
+            exports = [f"/export/{n}.{fmt}" for n in export.EXPORTS for fmt in export.FORMATS]
+            self._send(200, json.dumps({"endpoints": sorted(ENDPOINTS), "exports": exports}).encode())
+            return
+        if path.startswith("/export/"):
+            self._export(path, url.query)
+            return
+        compute = ENDPOINTS.get(path)
+        if compute is None:
+            self._error(404, f"Unknown endpoint {path}")
+            return
+        try:
+            filters = parse_filters(url.query)
+        except ValueError as exc:
+            self._error(400, str(exc))
+            return
+
+        ds = data_mod.get_dataset(self.data_dir)
+        sig = data_mod.filter_signature(filters, ds.catalog)
+        tag = etag(ds.fingerprint, path, sig)
+        if _matches(self.headers.get("If-None-Match"), tag):
+            self._send(304, b"", tag)
+            return
+        body = self.bodies.get(tag)
+        if body is None:
+            body = to_json(compute(filters, self.data_dir), sig)
+            self.bodies.put(tag, body)
+        self._send(200, body, tag)
+
+    def _export(self, path: str, query: str) -> None:
+        name, _, fmt = path[len("/export/"):].rpartition(".")
+        if name not in export.EXPORTS or fmt not in export.FORMATS:
+            self._error(404, f"Unknown export {path}")
+            return
+        try:
+            filters = parse_filters(query)
+        except ValueError as exc:
+            self._error(400, str(exc))
+            return
+        ds = data_mod.get_dataset(self.data_dir)
+        tag = etag(ds.fingerprint, path, data_mod.filter_signature(filters, ds.catalog))
+        if _matches(self.headers.get("If-None-Match"), tag):
+            self._send(304, b"", tag)
+            return
+        # No Content-Length: the body is written as it is encoded and ends when the connection closes
+        self.send_response(200)
+        self.send_header("ETag", tag)
+        self.send_header("Content-Type", export.MIME_TYPES[fmt])
+        self.send_header("Content-Disposition", f'attachment; filename="{export.file_name(name, fmt)}"')
+        self.end_headers()
+        for chunk in export.stream(name, fmt, filters, self.data_dir):
+            self.wfile.write(chunk)
+
+    def _error(self, status: int, message: str) -> None:
+        self._send(status, json.dumps({"error": message}).encode())
+
+    def _send(self, status: int, body: bytes, tag: str | None = None) -> None:
+        self.send_response(status)
+        if tag:
+            self.send_header("ETag", tag)
+            self.send_header("Cache-Control", "no-cache")
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+
+def make_server(host: str = API_HOST, port: int = API_PORT, data_dir: Path | None = None) -> ThreadingHTTPServer:
+    handler = type("BoundHandler", (Handler,), {"data_dir": data_dir})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Serve dashboard aggregates as JSON.")
+    ap.add_argument("--host", default=API_HOST, help="bind address (default: API_HOST or 127.0.0.1)")
+    ap.add_argument("--port", type=int, default=API_PORT, help="port (default: API_PORT or 8765)")
+    ap.add_argument("--data-dir", type=Path, default=None, help="data directory (default: DATA_DIR)")
+    args = ap.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.data_dir)
+    data_mod.get_dataset(args.data_dir)  # load before the first request
+    print(f"Serving {', '.join(sorted(ENDPOINTS))} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+from __future__ import annotations
+from typing import NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Diminishing-returns curves of daily attributed revenue on daily spend, one per group:
+#   hill: R(s) = a * s^k / (s^k + h^k)
+#   log:  R(s) = a * log(1 + s / h)
+# Shape parameters are searched on a grid shared by every group; for each candidate the
+# scale `a` has a closed-form least-squares solution, so a grid step is a handful of
+# bincounts over all rows at once rather than one optimizer call per group.
+
+HILL_SHAPES = (0.5, 1.0, 1.5, 2.0, 3.0)
+# Half-saturation points, as multiples of each group's mean daily spend
+HALF_SATURATION = tuple(np.geomspace(0.1, 10.0, 13))
+# Per-group refinement of the half-saturation point around the best grid value
+REFINE_FACTORS = tuple(np.geomspace(0.75, 1.33, 9))
+# Days at the end of the history averaged into a group's "current" daily spend
+RECENT_DAYS = 28
+
+CURVE_COLUMNS = ["model", "a", "h", "k", "r2", "days", "spend", "revenue", "roas", "marginal_roas"]
+
+
+def _grid() -> list[tuple[str, float, float]]:
+    grid = [("hill", k, c) for k in HILL_SHAPES for c in HALF_SATURATION]
+    return grid + [("log", 1.0, c) for c in HALF_SATURATION]
+
+
+def _basis(is_log, x: np.ndarray, k, c) -> np.ndarray:
+    """Curve shape with a = 1; the parameters may be scalars or per-row arrays."""
+    if np.ndim(is_log) == 0:
+        if is_log:
+            return np.log1p(x / c)
+        xk = np.power(x, k)
+        return xk / (xk + np.power(c, k))
+    xk = np.power(x, k)
+    return np.where(is_log, np.log1p(x / c), xk / (xk + np.power(c, k)))
+
+
+class CurveParams(NamedTuple):
+    """Fitted curve parameters as arrays, one entry per group."""
+
+    is_log: np.ndarray
+    a: np.ndarray
+    h: np.ndarray
+    k: np.ndarray
+
+
+def curve_params(fits: pd.DataFrame) -> CurveParams:
+    return CurveParams(
+        fits["model"].to_numpy() == "log",
+        *(fits[c].to_numpy(dtype=float) for c in ("a", "h", "k")),
+    )
+
+
+def curve_value(p: CurveParams, spend) -> np.ndarray:
+    """R(s) for each curve at `spend` (scalar or one value per curve)."""
+    s = np.maximum(np.asarray(spend, dtype=float), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sk = np.power(s, p.k)
+        hill = p.a * sk / (sk + np.power(p.h, p.k))
+        log = p.a * np.log1p(s / p.h)
+    return np.nan_to_num(np.where(p.is_log, log, hill))
+
+
+def curve_slope(p: CurveParams, spend) -> np.ndarray:
+    """dR/ds for each curve at `spend`: revenue from the next unit of spend."""
+    s = np.maximum(np.asarray(spend, dtype=float), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hk = np.power(p.h, p.k)
+        hill = p.a * p.k * hk * np.power(s, p.k - 1) / (np.power(s, p.k) + hk) ** 2
+        log = p.a / (p.h + s)
+    return np.nan_to_num(np.where(p.is_log, log, hill), posinf=0.0)
+
+
+def peak_slope_spend(p: CurveParams) -> np.ndarray:
+    """Spend where the slope peaks: the inflection of S-shaped Hill curves (k > 1), else 0.
+
+    Beyond this point every curve has diminishing returns.
+    """
+    k = np.where(p.is_log, 1.0, p.k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = p.h * np.power(np.clip((k - 1) / (k + 1), 0.0, None), 1 / k)
+    return np.where(k > 1, np.nan_to_num(s), 0.0)
+
+
+def predict(fits: pd.DataFrame, spend) -> np.ndarray:
+    """Revenue each fitted curve predicts at `spend` (scalar or one value per row of fits)."""
+    return curve_value(curve_params(fits), spend)
+
+
+def marginal(fits: pd.DataFrame, spend) -> np.ndarray:
+    """dR/ds of each fitted curve at `spend`: revenue from the next unit of spend."""
+    return curve_slope(curve_params(fits), spend)
+
+
+def fit_response_curves(daily: pd.DataFrame, keys: Sequence[str], recent_days: int = RECENT_DAYS) -> pd.DataFrame:
+    """Fit one curve per `keys` group of a daily frame (date, *keys, spend, attributed_revenue).
+
+    Returns one row per group: keys, then CURVE_COLUMNS. `spend` is the group's mean daily
+    spend over the last `recent_days` of the history, and revenue, roas and marginal_roas
+    are evaluated there. Groups with no spend keep a = 0 (a flat curve).
+    """
+    keys = list(keys)
+    if daily.empty:
+        return pd.DataFrame(columns=keys + CURVE_COLUMNS)
+    grouped = daily.groupby(keys, sort=True)
+    gid = grouped.ngroup().to_numpy()
+    groups = grouped.size().index.to_frame(index=False)
+    n_groups = len(groups)
+
+    s = np.clip(daily["spend"].to_numpy(dtype=float), 0.0, None)
+    y = daily["attributed_revenue"].to_numpy(dtype=float)
+    days = np.bincount(gid, minlength=n_groups)
+    scale = np.bincount(gid, s, n_groups) / np.maximum(days, 1)
+    scale[scale <= 0] = 1.0
+    x = s / scale[gid]
+
+    sy = np.bincount(gid, y, n_groups)
+    syy = np.bincount(gid, y * y, n_groups)
+    # a = 0 is the baseline every candidate has to beat
+    best_sse = syy.copy()
+    best_a = np.zeros(n_groups)
+    best_k = np.ones(n_groups)
+    best_c = np.ones(n_groups)
+    best_log = np.zeros(n_groups, dtype=bool)
+
+    def consider(is_log, k, c) -> None:
+        # Parameters are scalars (shared grid point) or per-group arrays (refinement)
+        per_row = [p[gid] if np.ndim(p) else p for p in (is_log, k, c)]
+        g = _basis(*per_row[:1], x, *per_row[1:])
+        sgy = np.bincount(gid, g * y, n_groups)
+        sgg = np.bincount(gid, g * g, n_groups)
+        a = np.zeros(n_groups)
+        np.divide(sgy, sgg, out=a, where=(sgg > 0) & (sgy > 0))
+        sse = syy - a * sgy
+        better = sse < best_sse
+        best_sse[better] = sse[better]
+        best_a[better] = a[better]
+        for best, p in ((best_log, is_log), (best_k, k), (best_c, c)):
+            best[better] = p[better] if np.ndim(p) else p
+
+    for model, k, c in _grid():
+        consider(model == "log", k, c)
+    # Second pass: each group searches a finer band around its own best point
+    base_log, base_k, base_c = best_log.copy(), best_k.copy(), best_c.copy()
+    for f in REFINE_FACTORS:
+        consider(base_log, base_k, base_c * f)
+
+    sst = syy - sy * sy / np.maximum(days, 1)
+    r2 = np.zeros(n_groups)
+    np.divide(sst - best_sse, sst, out=r2, where=sst > 0)
+
+    dates = daily["date"]
+    recent = (dates > dates.max() - pd.Timedelta(days=recent_days)).to_numpy()
+    current = np.bincount(gid[recent], s[recent], n_groups) / recent_days
+
+    fits = groups.assign(
+        model=np.where(best_log, "log", "hill"),
+        a=best_a,
+        h=best_c * scale,
+        k=np.where(best_log, 1.0, best_k),
+        r2=r2,
+        days=days,
+        spend=current,
+    )
+    fits["revenue"] = predict(fits, current)
+    roas = np.zeros(n_groups)
+    np.divide(fits["revenue"].to_numpy(), current, out=roas, where=current > 0)
+    fits["roas"] = roas
+    fits["marginal_roas"] = marginal(fits, current)
+    return fits
@@ -1,10 +1,35 @@
 from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
 from pathlib import Path
+import csv
+import hashlib
+import io
+import json
 import os
-from typing import Dict, Tuple, Iterable
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Tuple, Iterable, Iterator, NamedTuple
 
+import numpy as np
 import pandas as pd
-import streamlit as st
+import pyarrow as pa
+
+import materialized
+import store
+import validation
+from curves import RECENT_DAYS, fit_response_curves
+from dataset import Dataset, get_manager
+from lags import MAX_LAG, lag_correlation
+from metrics import BLENDED_COLUMNS, BUSINESS_DAILY_COLUMNS, DailyArrays, blend_daily, blended_ratios, daily_arrays
+
+# The readers and models behind a single page or the refresher thread are imported where
+# they are used, so that importing this module (every page does) stays cheap
+if TYPE_CHECKING:
+    import anomalies
+    from mmm import MMMResult
 
 ROOT = Path(__file__).resolve().parents[1]
 
@@ -29,162 +54,483 @@ def _resolve_data_dir() -> Path:
 
 DATA_DIR = _resolve_data_dir()
 
+# Optional manifest in DATA_DIR describing channel sources; without it every CSV
+# except the business file is treated as a channel named after the file stem
+MANIFEST_NAME = "channels.json"
+BUSINESS_FILE = "business.csv"
+# Threads used to parse channel files concurrently
+INGEST_WORKERS = int(os.environ.get("DATA_INGEST_WORKERS", "8"))
+# Read size when hashing channel files to tell appends from rewrites
+HASH_BLOCK_BYTES = 1 << 20
+# Filter combinations whose derived tables (blended KPIs, lag scans) are kept in memory
+BLENDED_CACHE_SIZE = int(os.environ.get("BLENDED_CACHE_SIZE", "64"))
+
+# "memory" holds the marketing history in a DataFrame; "disk" keeps it in an indexed
+# SQLite store (see store.py) and serves views aggregates computed by queries
+STORAGE_MODE = os.environ.get("DATA_STORAGE", "memory").strip().lower()
+# In memory mode, share one memory-mapped copy of each dataset version between server
+# processes (see shared.py); set DATA_SHARED=0 to have every process parse its own
+SHARED_DATASET = os.environ.get("DATA_SHARED", "1").strip().lower() not in ("0", "false", "no")
+
+MARKETING_COLUMNS = [
+    "date",
+    "channel",
+    "tactic",
+    "state",
+    "campaign",
+    "impressions",
+    "clicks",
+    "spend",
+    "attributed_revenue",
+]
+MARKETING_METRICS = ["impressions", "clicks", "spend", "attributed_revenue"]
+CATALOG_DIMENSIONS = ["channel", "tactic", "state", "campaign"]
+CATALOG_COLUMNS = ["dimension", "value", "rows", "spend", "first_date", "last_date"]
+
+# Groupings that get their own response curves (see curves.py)
+CURVE_LEVELS = {"Channel": ["channel"], "Tactic": ["channel", "tactic"], "Campaign": ["channel", "campaign"]}
+# Calendar grains offered by the Trends/Profit granularity switch, as pandas period aliases
+ROLLUP_GRAINS = {"Week": "W", "Month": "M", "Quarter": "Q"}
+
+DEFAULT_RENAME_MAP = {
+    "impression": "impressions",
+    "attributed revenue": "attributed_revenue",
+}
+BUSINESS_RENAME_MAP = {
+    "# of orders": "orders",
+    "# of new orders": "new_orders",
+    "new customers": "new_customers",
+    "total revenue": "total_revenue",
+    "gross profit": "gross_profit",
+    "COGS": "cogs",
+}
+BUSINESS_COLUMNS = ["date", "orders", "new_orders", "new_customers", "total_revenue", "gross_profit", "cogs"]
+
+# Declared layout of the CSV files. A file that follows it is read in one typed pass by
+# Arrow's CSV reader (see _read_typed); one that does not (text in a number column, a
+# fractional count, dates in another format) falls back to letting pandas infer and
+# coercing column by column.
+DATE_FORMAT = "%Y-%m-%d"
+# Arrow types of the logical column types. Text is dictionary-encoded, so it is stripped
+# once per distinct value rather than once per row.
+_ARROW_TYPES = {
+    "date": pa.timestamp("ns"),
+    "text": pa.dictionary(pa.int32(), pa.string()),
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+}
+# pandas' default missing-value markers, so both paths read the same cells as missing
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+# Bytes per batch when a file is streamed into the disk store
+CSV_BLOCK_BYTES = 8 << 20
+
+
+class CsvSchema(NamedTuple):
+    """Normalized column -> type ("date", "text" or a numpy dtype), in output order."""
+
+    columns: Tuple[Tuple[str, str], ...]
+    date_format: str = DATE_FORMAT
+
+
+MARKETING_SCHEMA = CsvSchema((
+    ("date", "date"), ("tactic", "text"), ("state", "text"), ("campaign", "text"),
+    ("impressions", "int64"), ("clicks", "int64"), ("spend", "float64"), ("attributed_revenue", "float64"),
+))
+BUSINESS_SCHEMA = CsvSchema((
+    ("date", "date"), ("orders", "int64"), ("new_orders", "int64"), ("new_customers", "int64"),
+    ("total_revenue", "float64"), ("gross_profit", "float64"), ("cogs", "float64"),
+))
+
+
+class ChannelSource(NamedTuple):
+    channel: str
+    path: str
+    # (source column, normalized column) pairs; a tuple so sources stay hashable
+    rename: Tuple[Tuple[str, str], ...]
+    date_format: str = DATE_FORMAT
+
+
+class SourceMark(NamedTuple):
+    """How much of a channel file a dataset version read, so the next one can read only what was appended."""
+
+    source: ChannelSource
+    size: int  # bytes read
+    digest: str  # blake2b of those bytes
+    complete: bool  # ended on a line break, so appended bytes start a new row
+
+
+def _source(channel: str, path: Path, rename: dict | None = None, date_format: str | None = None) -> ChannelSource:
+    mapping = {**DEFAULT_RENAME_MAP, **(rename or {})}
+    return ChannelSource(channel, str(path), tuple(sorted(mapping.items())), date_format or DATE_FORMAT)
+
+
+def discover_channel_sources(data_dir: Path | None = None) -> list[ChannelSource]:
+    """List channel sources from the manifest, or by globbing *.csv in the data dir.
+
+    Manifest format (channels.json):
+        {"sources": [
+            {"channel": "Facebook", "path": "Facebook.csv"},
+            {"channel": "Bing", "path": "bing_export.csv", "rename": {"Cost": "spend"}},
+            {"glob": "dsp_*.csv", "rename": {"imps": "impressions"}, "date_format": "%m/%d/%Y"}
+        ]}
+    Entries with "glob" take the channel from "channel" if given, else each file's stem.
+    "date_format" (strftime codes, default %Y-%m-%d) is the format of the file's dates.
+    """
+    ddir = (data_dir or DATA_DIR)
+    manifest = ddir / MANIFEST_NAME
+    if not manifest.exists():
+        return [
+            _source(p.stem, p)
+            for p in sorted(ddir.glob("*.csv"))
+            if p.name.lower() != BUSINESS_FILE
+        ]
+    spec = json.loads(manifest.read_text())
+    entries = spec.get("sources", []) if isinstance(spec, dict) else spec
+    sources: list[ChannelSource] = []
+    for entry in entries:
+        rename = entry.get("rename") or {}
+        if "glob" in entry:
+            for p in sorted(ddir.glob(entry["glob"])):
+                sources.append(_source(entry.get("channel") or p.stem, p, rename, entry.get("date_format")))
+        elif "path" in entry:
+            p = ddir / entry["path"]
+            sources.append(_source(entry.get("channel") or p.stem, p, rename, entry.get("date_format")))
+    return sources
+
+
+def _watched_files(data_dir: Path) -> list[Path]:
+    """Every file a dataset version is read from: manifest, business file and channel sources."""
+    ddir = Path(data_dir)
+    return [ddir / MANIFEST_NAME, ddir / BUSINESS_FILE] + [Path(s.path) for s in discover_channel_sources(ddir)]
+
+
+def _buffer(source: Path | bytes):
+    return io.BytesIO(source) if isinstance(source, bytes) else str(source)
+
+
+def _header(source: Path | bytes) -> list[str]:
+    if isinstance(source, bytes):
+        first = io.BytesIO(source).readline()
+    else:
+        with open(source, "rb") as f:
+            first = f.readline()
+    return next(csv.reader([first.decode("utf-8-sig")]), [])
+
+
+def _typed_columns(df: pd.DataFrame, schema: CsvSchema, names: dict) -> pd.DataFrame:
+    kinds = dict(schema.columns)
+    out = {}
+    for header, name in names.items():
+        col = df[header]
+        if kinds[name] == "text":
+            # Per distinct value; a missing value has code -1, which picks the trailing "nan"
+            text = col.cat.categories.astype(str).str.strip().to_numpy(dtype=object)
+            out[name] = np.append(text, "nan")[col.cat.codes.to_numpy()]
+        else:
+            out[name] = col.to_numpy()
+    return pd.DataFrame(out, columns=[c for c, _ in schema.columns])
 
-def _read_marketing_csv(path: Path, channel: str) -> pd.DataFrame:
+
+def _read_typed(source: Path | bytes, schema: CsvSchema, rename: dict, block_bytes: int | None = None):
+    """Read a CSV that follows `schema` in one typed pass: only the declared columns, each
+    parsed straight to its type, dates with the schema's format.
+
+    Returns the columns under their normalized names (a frame, or an iterator of frames
+    of about `block_bytes` of CSV each); missing dates and numbers are left for the caller.
+    Raises ValueError when the file breaks the schema, with `block_bytes` only once the
+    offending block is reached.
+    """
+    header = _header(source)
+    kinds = dict(schema.columns)
+    names = {h: rename.get(h, h) for h in header if rename.get(h, h) in kinds}
+    if sorted(names.values()) != sorted(kinds) or len(set(header)) != len(header):
+        raise ValueError(f"columns {header} do not match the schema")
+    import pyarrow.csv as pacsv
+
+    convert = pacsv.ConvertOptions(
+        column_types={h: _ARROW_TYPES[kinds[n]] for h, n in names.items()},
+        include_columns=list(names),
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+        timestamp_parsers=[schema.date_format],
+    )
+    if block_bytes is None:
+        table = pacsv.read_csv(_buffer(source), convert_options=convert)
+        return _typed_columns(table.to_pandas(), schema, names)
+    reader = pacsv.open_csv(
+        _buffer(source), convert_options=convert, read_options=pacsv.ReadOptions(block_size=block_bytes)
+    )
+    return (_typed_columns(pa.Table.from_batches([b]).to_pandas(), schema, names) for b in reader)
+
+
+def _finish_marketing(
+    df: pd.DataFrame, channel: str, validator: validation.IngestValidator | None = None
+) -> pd.DataFrame:
+    """_normalize_marketing for a frame from _read_typed: only missing values are left to handle."""
+    for col in ["date"] + MARKETING_METRICS:
+        missing = df[col].isna()
+        if validator is not None:
+            validator.parsed(channel, col, int(missing.sum()), 0)
+        if col != "date" and missing.any():
+            df[col] = df[col].fillna(0)
+    df["channel"] = str(channel).strip()
+    df = df.dropna(subset=["date"]).reset_index(drop=True)[MARKETING_COLUMNS]
+    if validator is not None:
+        validator.add(df, channel)
+    return df
+
+
+def _read_marketing_csv(
+    path: Path,
+    channel: str,
+    rename_map: dict | None = None,
+    validator: validation.IngestValidator | None = None,
+    span: Tuple[int, int] | None = None,
+    date_format: str = DATE_FORMAT,
+) -> pd.DataFrame:
     """Read a single channel CSV and standardize schema.
 
     Incoming columns: date, tactic, state, campaign, impression, clicks, spend, attributed revenue
     Standardized: date, channel, tactic, state, campaign, impressions, clicks, spend, attributed_revenue
+    With `span` = (start, stop), only those bytes are parsed, under the file's header line;
+    `start` must be 0 or the start of a line.
+    """
+    source: Path | bytes = path
+    if span is not None:
+        start, stop = span
+        with open(path, "rb") as f:
+            header = f.readline() if start else b""
+            f.seek(start)
+            source = header + f.read(stop - start)
+    schema = MARKETING_SCHEMA._replace(date_format=date_format)
+    try:
+        df = _read_typed(source, schema, rename_map or DEFAULT_RENAME_MAP)
+    except ValueError:
+        return _normalize_marketing(pd.read_csv(_buffer(source)), channel, rename_map, validator)
+    return _finish_marketing(df, channel, validator)
+
+
+def _marketing_chunks(
+    src: ChannelSource, validator: validation.IngestValidator | None = None, block_bytes: int = CSV_BLOCK_BYTES
+) -> Iterator[pd.DataFrame]:
+    """Normalized chunks of one channel file, for streaming into the disk store.
+
+    Typed while the file follows the schema; from the first block that breaks it, the
+    rest of the file is read the slow way, store.CHUNK_ROWS rows at a time.
+    """
+    rename = dict(src.rename)
+    done = 0
+    try:
+        for df in _read_typed(Path(src.path), MARKETING_SCHEMA._replace(date_format=src.date_format), rename, block_bytes):
+            done += len(df)
+            yield _finish_marketing(df, src.channel, validator)
+        return
+    except ValueError:
+        pass
+    for chunk in pd.read_csv(src.path, chunksize=store.CHUNK_ROWS, skiprows=range(1, done + 1)):
+        yield _normalize_marketing(chunk, src.channel, rename, validator)
+
+
+def _normalize_marketing(
+    df: pd.DataFrame, channel: str, rename_map: dict | None = None, validator: validation.IngestValidator | None = None
+) -> pd.DataFrame:
+    """Standardize a raw channel frame (or a chunk of one) to the marketing schema.
+
+    With a `validator`, values coerced to 0, dropped rows and the kept rows are reported to it.
     """
-    df = pd.read_csv(path)
     # Rename to normalized schema
-    rename_map = {
-        "impression": "impressions",
-        "attributed revenue": "attributed_revenue",
-    }
-    df = df.rename(columns=rename_map)
+    df = df.rename(columns=rename_map or DEFAULT_RENAME_MAP)
 
     # Add channel and ensure presence/order of columns
     df["channel"] = channel
-    expected_cols = [
-        "date",
-        "channel",
-        "tactic",
-        "state",
-        "campaign",
-        "impressions",
-        "clicks",
-        "spend",
-        "attributed_revenue",
-    ]
+    expected_cols = MARKETING_COLUMNS
     # Keep only expected columns if extras exist
     df = df[[c for c in expected_cols if c in df.columns] + [c for c in df.columns if c not in expected_cols]]
 
     # Types
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    for col in ["impressions", "clicks", "spend", "attributed_revenue"]:
+    dates = pd.to_datetime(df["date"], errors="coerce")
+    if validator is not None:
+        validator.parsed(channel, "date", *validation.coercion_counts(df["date"], dates))
+    df["date"] = dates
+    for col in MARKETING_METRICS:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+            values = pd.to_numeric(df[col], errors="coerce")
+            if validator is not None:
+                validator.parsed(channel, col, *validation.coercion_counts(df[col], values))
+            df[col] = values.fillna(0)
     # Clean strings (strip)
     for col in ["tactic", "state", "campaign", "channel"]:
         if col in df.columns:
             df[col] = df[col].astype(str).str.strip()
     # Drop rows with invalid dates
-    df = df.dropna(subset=["date"]).reset_index(drop=True)
-    return df[expected_cols]
+    df = df.dropna(subset=["date"]).reset_index(drop=True)[expected_cols]
+    if validator is not None:
+        validator.add(df, channel)
+    return df
 
 
-def load_marketing_data(data_dir: Path | None = None) -> pd.DataFrame:
-    """Load and combine Facebook, Google, TikTok CSVs into a unified DataFrame."""
-    ddir = (data_dir or DATA_DIR)
-    paths = {
-        "Facebook": ddir / "Facebook.csv",
-        "Google": ddir / "Google.csv",
-        "TikTok": ddir / "TikTok.csv",
-    }
-    # Compute mtimes and pass as cache keys
-    paths_with_mtimes: list[tuple[str, str, float]] = []
-    for ch, p in paths.items():
-        mtime = p.stat().st_mtime if p.exists() else 0.0
-        paths_with_mtimes.append((ch, str(p), mtime))
+def _read_sources(
+    sources: list[ChannelSource],
+    validator: validation.IngestValidator | None = None,
+    spans: Dict[ChannelSource, Tuple[int, int]] | None = None,
+) -> list[pd.DataFrame]:
+    """Parse channel files concurrently; the CSV parser releases the GIL for most of its work.
 
-    df = _cached_read_marketing(tuple(paths_with_mtimes))
-    return df
+    With `spans`, each source is parsed over its (start, stop) byte range only, and
+    sources without one (or with nothing in it) are skipped.
+    """
+    def _read(src: ChannelSource) -> pd.DataFrame | None:
+        p = Path(src.path)
+        if not p.exists():
+            return None
+        span = None
+        if spans is not None:
+            span = spans.get(src)
+            if span is None or (span[0] and span[0] == span[1]):
+                return None
+        return _read_marketing_csv(p, src.channel, dict(src.rename), validator, span, src.date_format)
 
+    workers = max(1, min(INGEST_WORKERS, len(sources)))
+    if workers == 1:
+        results = [_read(src) for src in sources]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+            results = list(pool.map(_read, sources))
+    return [df for df in results if df is not None]
 
-@st.cache_data(show_spinner=False)
-def _cached_read_marketing(paths_with_mtimes: tuple[tuple[str, str, float], ...]) -> pd.DataFrame:
-    frames: list[pd.DataFrame] = []
-    for channel, path_str, _mtime in paths_with_mtimes:
-        p = Path(path_str)
-        if p.exists():
-            frames.append(_read_marketing_csv(p, channel))
+
+def _source_mark(src: ChannelSource, prev: SourceMark | None) -> Tuple[SourceMark, int | None]:
+    """Hash a channel file; returns its mark and, when it only grew since `prev`, where the new bytes start."""
+    h = hashlib.blake2b(digest_size=16)
+    size = 0
+    prefix = h.hexdigest() if prev is not None and prev.size == 0 else None
+    tail = b""
+    with open(src.path, "rb") as f:
+        while True:
+            # Stop a block at the previous size, so the digest of that prefix can be read off
+            want = HASH_BLOCK_BYTES
+            if prev is not None and size < prev.size:
+                want = min(want, prev.size - size)
+            block = f.read(want)
+            if not block:
+                break
+            h.update(block)
+            size += len(block)
+            tail = block[-1:]
+            if prev is not None and size == prev.size:
+                prefix = h.hexdigest()
+    mark = SourceMark(src, size, h.hexdigest(), size == 0 or tail == b"\n")
+    appended = prev is not None and prev.complete and prefix == prev.digest
+    return mark, (prev.size if appended else None)
+
+
+def _mark_sources(
+    sources: list[ChannelSource], previous: tuple[SourceMark, ...] = ()
+) -> Tuple[tuple[SourceMark, ...], Dict[ChannelSource, Tuple[int, int]]] | None:
+    """Marks for the current channel files and the byte span of each to parse.
+
+    Given the previous version's marks, the spans cover only appended bytes (whole files
+    for new sources); returns None if a file the previous version read was removed,
+    shrank or changed, since its old rows cannot be taken back out of the aggregates.
+    """
+    prev = {m.source: m for m in previous}
+    marks, spans = [], {}
+    for src in sources:
+        if not Path(src.path).exists():
+            continue
+        mark, start = _source_mark(src, prev.get(src))
+        if src in prev and start is None:
+            return None
+        marks.append(mark)
+        spans[src] = (start or 0, mark.size)
+    if set(prev) - {m.source for m in marks}:
+        return None
+    return tuple(marks), spans
+
+
+def _combine(frames: list[pd.DataFrame]) -> pd.DataFrame:
     if not frames:
-        return pd.DataFrame(
-            columns=[
-                "date",
-                "channel",
-                "tactic",
-                "state",
-                "campaign",
-                "impressions",
-                "clicks",
-                "spend",
-                "attributed_revenue",
-            ]
-        )
+        return pd.DataFrame(columns=MARKETING_COLUMNS)
     df = pd.concat(frames, ignore_index=True)
     return df.sort_values(["date", "channel"]).reset_index(drop=True)
 
 
-def load_business_data(data_dir: Path | None = None) -> pd.DataFrame:
-    """Load business daily totals and standardize schema.
+def _append_rows(rows: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """`rows` followed by `new` (both as _combine returns them), still in date order."""
+    if new.empty:
+        return rows
+    if rows.empty:
+        return new
+    if new["date"].iloc[0] > rows["date"].iloc[-1]:
+        return pd.concat([rows, new], ignore_index=True)
+    return _combine([rows, new])
+
+
+def _read_business(path: Path) -> pd.DataFrame:
+    """Read business daily totals and standardize schema.
 
     Incoming columns: date,# of orders,# of new orders,new customers,total revenue,gross profit,COGS
     Standardized: date, orders, new_orders, new_customers, total_revenue, gross_profit, cogs
     """
-    ddir = (data_dir or DATA_DIR)
-    path = ddir / "business.csv"
     if not path.exists():
-        return pd.DataFrame(
-            columns=[
-                "date",
-                "orders",
-                "new_orders",
-                "new_customers",
-                "total_revenue",
-                "gross_profit",
-                "cogs",
-            ]
-        )
-    df = _cached_read_business(str(path), path.stat().st_mtime)
-    return df
+        return pd.DataFrame(columns=BUSINESS_COLUMNS)
+    try:
+        df = _read_typed(path, BUSINESS_SCHEMA, BUSINESS_RENAME_MAP)
+        df = df.fillna({col: 0 for col in BUSINESS_COLUMNS[1:]})
+    except ValueError:
+        df = pd.read_csv(path).rename(columns=BUSINESS_RENAME_MAP)
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        for col in BUSINESS_COLUMNS[1:]:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    df = df.dropna(subset=["date"]).reset_index(drop=True)
+    return df[BUSINESS_COLUMNS]
 
 
-@st.cache_data(show_spinner=False)
-def _cached_read_business(path_str: str, mtime: float) -> pd.DataFrame:
-    path = Path(path_str)
-    if not path.exists():
-        return pd.DataFrame(
-            columns=[
-                "date",
-                "orders",
-                "new_orders",
-                "new_customers",
-                "total_revenue",
-                "gross_profit",
-                "cogs",
-            ]
-        )
-    df = pd.read_csv(path)
-    rename_map = {
-        "# of orders": "orders",
-        "# of new orders": "new_orders",
-        "new customers": "new_customers",
-        "total revenue": "total_revenue",
-        "gross profit": "gross_profit",
-        "COGS": "cogs",
-    }
-    df = df.rename(columns=rename_map)
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    for col in ["orders", "new_orders", "new_customers", "total_revenue", "gross_profit", "cogs"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-    df = df.dropna(subset=["date"]).reset_index(drop=True)
-    expected_cols = ["date", "orders", "new_orders", "new_customers", "total_revenue", "gross_profit", "cogs"]
-    return df[expected_cols]
+def build_catalog(marketing_df: pd.DataFrame) -> pd.DataFrame:
+    """Per-dimension value catalog: distinct values with row counts, date coverage and spend.
 
+    Columns: dimension, value, rows, spend, first_date, last_date. Built once per dataset
+    version so drawing the sidebar never scans the marketing rows.
+    """
+    frames: list[pd.DataFrame] = []
+    if marketing_df is not None and not marketing_df.empty:
+        for dim in CATALOG_DIMENSIONS:
+            g = marketing_df.groupby(dim, as_index=False).agg(
+                rows=("date", "size"),
+                spend=("spend", "sum"),
+                first_date=("date", "min"),
+                last_date=("date", "max"),
+            )
+            frames.append(g.rename(columns={dim: "value"}).assign(dimension=dim))
+    if not frames:
+        return pd.DataFrame(columns=CATALOG_COLUMNS)
+    return _order_catalog(pd.concat(frames, ignore_index=True))
 
-def get_available_filters(marketing_df: pd.DataFrame | None = None) -> Dict[str, list]:
-    """Compute unique lists for filters from the marketing dataframe."""
-    if marketing_df is None or marketing_df.empty:
-        return {"channels": [], "tactics": [], "states": [], "campaigns": []}
-    return {
-        "channels": sorted(marketing_df["channel"].dropna().unique().tolist()),
-        "tactics": sorted(marketing_df["tactic"].dropna().unique().tolist()),
-        "states": sorted(marketing_df["state"].dropna().unique().tolist()),
-        "campaigns": sorted(marketing_df["campaign"].dropna().unique().tolist()),
-    }
+
+def _order_catalog(catalog: pd.DataFrame) -> pd.DataFrame:
+    order = {d: i for i, d in enumerate(CATALOG_DIMENSIONS)}
+    catalog = catalog.assign(_dim=catalog["dimension"].map(order)).sort_values(["_dim", "value"])
+    return catalog[CATALOG_COLUMNS].reset_index(drop=True)
+
+
+def get_available_filters(marketing_df: pd.DataFrame | None = None, order: str = "name") -> Dict[str, list]:
+    """Filter option lists per dimension, read from the dataset's dimension catalog.
+
+    order="name" sorts options alphabetically; order="spend" puts the largest spenders first.
+    Passing marketing_df builds a catalog for that frame instead of the current dataset.
+    """
+    catalog = get_dataset().catalog if marketing_df is None else build_catalog(marketing_df)
+    out: Dict[str, list] = {}
+    for dim in CATALOG_DIMENSIONS:
+        sub = catalog[catalog["dimension"] == dim]
+        if order == "spend":
+            sub = sub.sort_values(["spend", "value"], ascending=[False, True])
+        out[f"{dim}s"] = sub["value"].tolist()
+    return out
 
 
 def aggregate_marketing_daily(marketing_df: pd.DataFrame) -> pd.DataFrame:
@@ -199,12 +545,638 @@ def aggregate_marketing_daily(marketing_df: pd.DataFrame) -> pd.DataFrame:
     return grp
 
 
+def marketing_mask(marketing_df: pd.DataFrame, filters: dict | None) -> np.ndarray:
+    """Boolean row mask for the sidebar filters (channels, tactics, states, date_range)."""
+    mask = np.ones(len(marketing_df), dtype=bool)
+    for key, col in (("channels", "channel"), ("tactics", "tactic"), ("states", "state")):
+        vals = (filters or {}).get(key) or []
+        if vals:
+            mask &= marketing_df[col].isin(vals).to_numpy()
+    date_range = (filters or {}).get("date_range") or []
+    if len(date_range) == 2:
+        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
+        dates = marketing_df["date"]
+        mask &= ((dates >= start) & (dates <= end)).to_numpy()
+    return mask
+
+
+def filter_marketing(marketing_df: pd.DataFrame, filters: dict | None) -> pd.DataFrame:
+    """Apply the sidebar filters (channels, tactics, states, date_range) to marketing rows."""
+    if marketing_df is None or marketing_df.empty:
+        return marketing_df
+    return marketing_df[marketing_mask(marketing_df, filters)]
+
+
+def aggregate_marketing(marketing_df: pd.DataFrame, by: Iterable[str], filters: dict | None = None) -> pd.DataFrame:
+    """Sum marketing metrics (plus a `rows` count) grouped by `by` after applying filters.
+
+    In-memory counterpart of store.aggregate; an empty `by` returns a single totals row.
+    """
+    by = list(by)
+    out = filter_marketing(marketing_df, filters)
+    if out is None or out.empty:
+        if by:
+            return pd.DataFrame(columns=by + MARKETING_METRICS + ["rows"])
+        return pd.DataFrame([{**{c: 0.0 for c in MARKETING_METRICS}, "rows": 0}])
+    if not by:
+        totals = {c: float(out[c].sum()) for c in MARKETING_METRICS}
+        return pd.DataFrame([{**totals, "rows": len(out)}])
+    grp = out.groupby(by, as_index=False).agg(
+        **{c: (c, "sum") for c in MARKETING_METRICS},
+        rows=("date", "size"),
+    )
+    return grp.sort_values(by).reset_index(drop=True)
+
+
+def query_marketing(by: Iterable[str], filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Aggregate marketing metrics from whichever storage mode is active.
+
+    Views should go through this rather than grouping raw rows so that disk mode never
+    has to materialize the full history.
+    """
+    return _query(get_dataset(data_dir), by, filters)
+
+
+def iter_marketing_rows(
+    filters: dict | None = None, chunk_rows: int = 100_000, data_dir: Path | None = None
+) -> Iterator[pd.DataFrame]:
+    """Filtered marketing rows as consecutive frames of at most `chunk_rows` rows.
+
+    Only one chunk is copied at a time, so a caller writing them out (see export.py)
+    never holds a second full copy of the rows. Always yields at least one frame, which
+    is empty when nothing matches.
+    """
+    ds = get_dataset(data_dir)
+    if STORAGE_MODE == "disk":
+        yield from store.iter_rows(ds.store_path, filters, chunk_rows)
+        return
+    m = ds.marketing
+    idx = np.flatnonzero(marketing_mask(m, filters)) if not m.empty else np.zeros(0, dtype=np.intp)
+    if not len(idx):
+        yield m.iloc[:0]
+        return
+    for i in range(0, len(idx), chunk_rows):
+        yield m.iloc[idx[i:i + chunk_rows]]
+
+
+def _query(ds: Dataset, by: Iterable[str], filters: dict | None) -> pd.DataFrame:
+    by = list(by)
+    # Groupings and filters a materialized table covers never touch the rows
+    hit = materialized.lookup(ds.materialized, by, filters)
+    if hit is not None:
+        return hit
+    if STORAGE_MODE == "disk":
+        return store.aggregate(ds.store_path, by, filters)
+    return aggregate_marketing(ds.marketing, by, filters)
+
+
+def filter_signature(filters: dict | None, catalog: pd.DataFrame | None = None) -> tuple:
+    """Hashable (start, end, channels, tactics, states) key for a filter set.
+
+    Dates become ISO strings; categorical selections are sorted, and a selection that
+    covers every catalog value collapses to () since it filters nothing.
+    """
+    f = filters or {}
+    date_range = f.get("date_range") or []
+    if len(date_range) == 2:
+        start, end = (pd.to_datetime(d).date().isoformat() for d in date_range)
+    else:
+        start = end = None
+    sig: list = [start, end]
+    for key, dim in (("channels", "channel"), ("tactics", "tactic"), ("states", "state")):
+        vals = tuple(sorted(set(f.get(key) or [])))
+        if vals and catalog is not None:
+            known = catalog.loc[catalog["dimension"] == dim, "value"]
+            if len(vals) >= len(known) and set(known).issubset(vals):
+                vals = ()
+        sig.append(vals)
+    return tuple(sig)
+
+
+def _filters_from_signature(sig: tuple) -> dict:
+    start, end, channels, tactics, states = sig
+    return {
+        "channels": list(channels),
+        "tactics": list(tactics),
+        "states": list(states),
+        "date_range": [start, end] if start and end else [],
+    }
+
+
+_memo: "OrderedDict[tuple, object]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _memoized(key: tuple, compute):
+    """Bounded LRU shared by all sessions; keys must include the dataset version."""
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    out = compute()
+    with _memo_lock:
+        _memo[key] = out
+        _memo.move_to_end(key)
+        while len(_memo) > BLENDED_CACHE_SIZE:
+            _memo.popitem(last=False)
+    return out
+
+
+def blended_kpis(filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """compute_blended_kpis for the filtered marketing daily totals joined with business data.
+
+    Memoized per (data dir, dataset version, filter signature) in a bounded LRU shared by
+    all sessions, so Summary, Trends and Profit reuse one computation for the same filters.
+    The returned frame is shared: copy before mutating.
+    """
+    ds = get_dataset(data_dir)
+    sig = filter_signature(filters, ds.catalog)
+
+    def compute() -> pd.DataFrame:
+        m_daily = _query(ds, ["date"], _filters_from_signature(sig))
+        if m_daily.empty or ds.business_days is None:
+            return pd.DataFrame(columns=BLENDED_COLUMNS)
+        # Business arrays were laid out at build time; only the filtered spend is scattered here
+        return blend_daily(daily_arrays(m_daily, ["spend"]), ds.business_days)
+
+    return _memoized(("blended", str(data_dir or DATA_DIR), ds.version) + sig, compute)
+
+
+def _channel_spend_matrix(ds: Dataset, filters: dict | None) -> Tuple[list[str], np.ndarray, DailyArrays] | None:
+    """Per-channel daily spend laid out on the business calendar, over the days both cover.
+
+    Returns (channel names, spend of shape (channels, days), business DailyArrays window),
+    or None when there is no marketing or business data.
+    """
+    ch = _query(ds, ["date", "channel"], filters)
+    bd = ds.business_days
+    if ch.empty or bd is None:
+        return None
+    bd = bd.window(ch["date"].min().to_datetime64(), ch["date"].max().to_datetime64())
+    if bd.days == 0:
+        return None
+    off = (ch["date"].to_numpy().astype("datetime64[D]") - bd.start).astype(np.int64)
+    keep = (off >= 0) & (off < bd.days)
+    codes, names = pd.factorize(ch["channel"], sort=True)
+    spend = np.zeros((len(names), bd.days))
+    np.add.at(spend, (codes[keep], off[keep]), ch["spend"].to_numpy(dtype=float)[keep])
+    return list(names), spend, bd
+
+
+def lag_correlations(filters: dict | None = None, max_lag: int = MAX_LAG, data_dir: Path | None = None) -> pd.DataFrame:
+    """Correlation of spend with business revenue `lag` days later, for lags 0..max_lag.
+
+    Long frame with columns series ("Total" or a channel), lag, corr. Spend follows the
+    filters; revenue is the business total over the same days. Memoized like blended_kpis.
+    """
+    ds = get_dataset(data_dir)
+    sig = filter_signature(filters, ds.catalog)
+
+    def compute() -> pd.DataFrame:
+        aligned = _channel_spend_matrix(ds, _filters_from_signature(sig))
+        if aligned is None:
+            return pd.DataFrame(columns=["series", "lag", "corr"])
+        names, spend, bd = aligned
+        spend = np.vstack([spend.sum(axis=0), spend])
+        corr = lag_correlation(spend, bd.values["total_revenue"], max_lag)
+        lags = np.arange(corr.shape[1])
+        return pd.DataFrame({
+            "series": np.repeat(["Total"] + names, len(lags)),
+            "lag": np.tile(lags, corr.shape[0]),
+            "corr": corr.ravel(),
+        })
+
+    return _memoized(("lags", str(data_dir or DATA_DIR), ds.version, max_lag) + sig, compute)
+
+
+def media_mix_model(filters: dict | None = None, data_dir: Path | None = None) -> MMMResult | None:
+    """Adstock + ridge media-mix model of business revenue on per-channel spend (see mmm.fit_mmm).
+
+    Only the date range applies: business revenue is a total, so every channel stays in
+    the model. Memoized per dataset version and date range; None if there is too little data.
+    """
+    ds = get_dataset(data_dir)
+    start, end = filter_signature(filters)[:2]
+
+    def compute() -> MMMResult | None:
+        from mmm import fit_mmm
+
+        aligned = _channel_spend_matrix(ds, {"date_range": [start, end] if start and end else []})
+        if aligned is None:
+            return None
+        names, spend, bd = aligned
+        present = bd.present
+        if present.sum() < 30:
+            return None
+        dates = pd.date_range(bd.start, periods=bd.days, freq="D")[present]
+        # Adstock runs over every calendar day; only days with business data are regressed
+        return fit_mmm(dates, spend, names, bd.values["total_revenue"][present], observed=present)
+
+    return _memoized(("mmm", str(data_dir or DATA_DIR), ds.version, start, end), compute)
+
+
+def response_curves(level: str = "Channel", data_dir: Path | None = None) -> pd.DataFrame:
+    """Spend-to-attributed-revenue curves for every group at a CURVE_LEVELS level.
+
+    Fitted on the full daily history, once per dataset version (see curves.fit_response_curves).
+    The returned frame is shared: copy before mutating.
+    """
+    ds = get_dataset(data_dir)
+    keys = CURVE_LEVELS[level]
+
+    def compute() -> pd.DataFrame:
+        return fit_response_curves(_query(ds, ["date"] + keys, None), keys)
+
+    return _memoized(("curves", str(data_dir or DATA_DIR), ds.version, level), compute)
+
+
+def recent_gross_margin(days: int = RECENT_DAYS, data_dir: Path | None = None) -> float:
+    """Gross profit / total revenue over the last `days` days of business data (0 if none)."""
+    business = get_dataset(data_dir).business
+    if business.empty:
+        return 0.0
+    recent = business[business["date"] > business["date"].max() - pd.Timedelta(days=days)]
+    revenue = float(recent["total_revenue"].sum())
+    return float(recent["gross_profit"].sum()) / revenue if revenue else 0.0
+
+
+class Rollup(NamedTuple):
+    """Period totals at one grain; `date` is the period start, `period_end` its last day."""
+
+    blended: pd.DataFrame  # spend joined with business totals, over days present in both
+    by_channel: pd.DataFrame  # marketing metrics per channel
+
+
+def _period_bounds(dates: pd.Series, freq: str) -> Tuple[pd.Series, pd.Series]:
+    periods = dates.dt.to_period(freq)
+    return periods.dt.start_time, periods.dt.end_time.dt.normalize()
+
+
+def _rollup(daily: pd.DataFrame, keys: list[str], freq: str) -> pd.DataFrame:
+    """Sum a daily frame into calendar periods, keeping `keys` as extra group columns."""
+    metrics = [c for c in daily.columns if c not in ["date"] + keys]
+    if daily.empty:
+        return pd.DataFrame(columns=["date", "period_end"] + keys + metrics)
+    start, end = _period_bounds(daily["date"], freq)
+    return (
+        daily.assign(date=start, period_end=end)
+        .groupby(["date", "period_end"] + keys, as_index=False, sort=True)[metrics]
+        .sum()
+    )
+
+
+def build_rollups(marketing_daily: pd.DataFrame, channel_daily: pd.DataFrame, business: pd.DataFrame) -> Dict[str, Rollup]:
+    """Week/month/quarter rollups of the blended daily totals and the per-channel series."""
+    blended_daily = marketing_daily[["date", "spend"]].merge(business[["date"] + BUSINESS_DAILY_COLUMNS], on="date")
+    return {
+        grain: Rollup(_rollup(blended_daily, [], freq), _rollup(channel_daily, ["channel"], freq))
+        for grain, freq in ROLLUP_GRAINS.items()
+    }
+
+
+def _overlapping(df: pd.DataFrame, start: str | None, end: str | None) -> pd.DataFrame:
+    # Whole periods are kept, so edge periods can include days outside [start, end]
+    if start and end:
+        df = df[(df["period_end"] >= pd.Timestamp(start)) & (df["date"] <= pd.Timestamp(end))]
+    return df.reset_index(drop=True)
+
+
+def blended_rollup(grain: str, filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Blended KPIs per period (same columns as blended_kpis plus period_end and business totals).
+
+    Only the date range is applied, like the daily blended view on Trends and Profit.
+    """
+    ds = get_dataset(data_dir)
+    start, end = filter_signature(filters)[:2]
+    totals = _overlapping(ds.rollups[grain].blended, start, end)
+    return pd.concat([totals, blended_ratios(totals)], axis=1)
+
+
+def channel_rollup(grain: str, filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Marketing metrics per channel and period for the given filters.
+
+    Date and channel filters are served from the prebuilt rollup. Tactic or state filters
+    need a query, widened to whole periods so results line up with the prebuilt path.
+    """
+    ds = get_dataset(data_dir)
+    start, end, channels, tactics, states = filter_signature(filters, ds.catalog)
+    if not tactics and not states:
+        df = ds.rollups[grain].by_channel
+        if channels:
+            df = df[df["channel"].isin(channels)]
+        return _overlapping(df, start, end)
+    freq = ROLLUP_GRAINS[grain]
+    date_range = []
+    if start and end:
+        lo, _ = _period_bounds(pd.Series([pd.Timestamp(start)]), freq)
+        _, hi = _period_bounds(pd.Series([pd.Timestamp(end)]), freq)
+        date_range = [lo.iloc[0], hi.iloc[0]]
+    query = {"channels": list(channels), "tactics": list(tactics), "states": list(states), "date_range": date_range}
+    daily = _query(ds, ["date", "channel"], query).drop(columns="rows")
+    return _rollup(daily, ["channel"], freq)
+
+
+class StatePeriods(NamedTuple):
+    """Dense period x state totals: row i is the period starting periods[i], column j is states[j]."""
+
+    periods: pd.DatetimeIndex
+    states: list[str]
+    spend: np.ndarray
+    attributed_revenue: np.ndarray
+    roas: np.ndarray  # NaN where a state had no spend that period
+
+
+def state_periods(grain: str, filters: dict | None = None, data_dir: Path | None = None) -> StatePeriods:
+    """Spend, attributed revenue and ROAS per state and period at a ROLLUP_GRAINS grain.
+
+    One grouped query by date and state, scattered into (periods, states) matrices so the
+    animated map slices a row per frame. Memoized like blended_kpis; the arrays are shared.
+    """
+    ds = get_dataset(data_dir)
+    sig = filter_signature(filters, ds.catalog)
+
+    def compute() -> StatePeriods:
+        daily = _query(ds, ["date", "state"], _filters_from_signature(sig))
+        if daily.empty:
+            empty = np.zeros((0, 0))
+            return StatePeriods(pd.DatetimeIndex([]), [], empty, empty, empty)
+        start, _ = _period_bounds(daily["date"], ROLLUP_GRAINS[grain])
+        p_codes, periods = pd.factorize(start, sort=True)
+        s_codes, states = pd.factorize(daily["state"], sort=True)
+        shape = (len(periods), len(states))
+        spend, revenue = np.zeros(shape), np.zeros(shape)
+        np.add.at(spend, (p_codes, s_codes), daily["spend"].to_numpy(dtype=float))
+        np.add.at(revenue, (p_codes, s_codes), daily["attributed_revenue"].to_numpy(dtype=float))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            roas = np.where(spend > 0, revenue / spend, np.nan)
+        return StatePeriods(pd.DatetimeIndex(periods), list(states), spend, revenue, roas)
+
+    return _memoized(("state_periods", str(data_dir or DATA_DIR), ds.version, grain) + sig, compute)
+
+
+def marketing_date_bounds(data_dir: Path | None = None) -> Tuple[pd.Timestamp | None, pd.Timestamp | None]:
+    """(min date, max date) of the marketing history, or (None, None) when empty."""
+    catalog = get_dataset(data_dir).catalog
+    channels = catalog[catalog["dimension"] == "channel"]
+    if channels.empty:
+        return None, None
+    return channels["first_date"].min(), channels["last_date"].max()
+
+
+def validation_report(data_dir: Path | None = None) -> validation.ValidationReport:
+    """Checks recorded while the current dataset was ingested (see validation.py)."""
+    return get_dataset(data_dir).validation or validation.empty_report()
+
+
+def marketing_quality_stats(data_dir: Path | None = None) -> dict:
+    """Row count, date coverage and per-metric missing/zero counts for the Data Quality view.
+
+    Read from the ingest validation report and the daily aggregate; nothing is rescanned.
+    """
+    ds = get_dataset(data_dir)
+    report = validation_report(data_dir)
+    daily = ds.marketing_daily
+    missing = report.issues[report.issues["check"].isin(["missing value", "non-numeric"])]
+    return {
+        "rows": report.rows,
+        "min_date": daily["date"].min() if not daily.empty else None,
+        "max_date": daily["date"].max() if not daily.empty else None,
+        "nulls": missing.groupby("column")["rows"].sum().reindex(MARKETING_METRICS, fill_value=0).rename("nulls"),
+        "zeros": report.zeros.reindex(MARKETING_METRICS, fill_value=0),
+        "attributed_revenue": float(daily["attributed_revenue"].sum()) if not daily.empty else 0.0,
+    }
+
+
+def cpc_outliers(z: float = 3.0, data_dir: Path | None = None) -> pd.DataFrame | None:
+    """Campaign-day rows whose CPC is more than `z` std devs from the mean (rows with clicks > 0).
+
+    Returns None when there are no rows with clicks or the CPC spread is zero.
+    """
+    if STORAGE_MODE == "disk":
+        return store.cpc_outliers(ensure_store(data_dir), z)
+    m = load_marketing_data(data_dir)
+    valid = m[m["clicks"] > 0].copy()
+    if valid.empty:
+        return None
+    valid["cpc"] = valid["spend"] / valid["clicks"]
+    mean_cpc = valid["cpc"].mean()
+    std_cpc = valid["cpc"].std(ddof=0)
+    if std_cpc == 0 or pd.isna(std_cpc):
+        return None
+    valid["cpc_z"] = (valid["cpc"] - mean_cpc) / std_cpc
+    cols = ["date", "channel", "tactic", "state", "campaign", "clicks", "spend", "cpc", "cpc_z"]
+    return valid.loc[valid["cpc_z"].abs() > z, cols].reset_index(drop=True)
+
+
+def cost_percentiles(by: Iterable[str] = (), filters: dict | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Approximate CPC and CPM percentiles (p50/p90/p99) per `by` group for the given filters.
+
+    Merges the smallest sketch table built at ingest that covers the grouping and filters
+    (see sketches.GRAINS), so those cost a pass over bucket counts, not a sort of the rows.
+    A date range over the weekly campaign sketches takes its whole weeks from them and
+    sketches the rows of the edge days. Combinations no table covers (e.g. a state filter
+    on campaign rows) sketch the matching rows instead. Values are within
+    sketches.SKETCH_ACCURACY of the exact percentiles. Memoized like blended_kpis.
+    """
+    ds = get_dataset(data_dir)
+    sig = filter_signature(filters, ds.catalog)
+    by = list(by)
+
+    def compute() -> pd.DataFrame:
+        import sketches
+
+        f = _filters_from_signature(sig)
+        need = set(by) | materialized.active_columns(ds.materialized, f)
+        tables = ds.sketches or sketches.empty_sketches()
+        sk = sketches.covering(tables, need)
+        if sk is not None:
+            f = {k: v for k, v in f.items() if materialized.FILTER_COLUMNS.get(k) in need}
+            return sketches.quantiles(sk[marketing_mask(sk, f)] if f else sk, by)
+        weekly = sketches.covering(tables, need - {"date"} | {"week"}) if "date" in need else None
+        if weekly is None:
+            return sketches.quantiles(sketches.sketch(iter_marketing_rows(f, data_dir=data_dir), by), by)
+        daily = ds.materialized["daily"]
+        weeks, edges = (None, []) if daily.empty else sketches.split_range(
+            (daily["date"].iloc[0], daily["date"].iloc[-1]), *f["date_range"]
+        )
+        parts = [sketches.sketch(iter_marketing_rows({**f, "date_range": list(days)}, data_dir=data_dir), by) for days in edges]
+        if weeks is not None:
+            rest = {k: v for k, v in f.items() if materialized.FILTER_COLUMNS.get(k) in need - {"date"}}
+            mask = weekly["week"].between(*weeks).to_numpy() & (marketing_mask(weekly, rest) if rest else True)
+            parts.append(weekly.loc[mask, by + ["metric", "bucket", "count"]])
+        return sketches.quantiles(pd.concat(parts, ignore_index=True) if parts else sketches.empty_sketch(by), by)
+
+    return _memoized(("cost_pct", str(data_dir or DATA_DIR), ds.version, tuple(by)) + sig, compute)
+
+
+# Control-chart state per data directory, advanced to each new dataset version
+_anomaly_states: Dict[str, anomalies.ControlState] = {}
+_anomaly_lock = threading.Lock()
+
+
+def anomaly_alerts(days: int = 7, top: int | None = None, data_dir: Path | None = None) -> pd.DataFrame:
+    """Ranked EWMA/CUSUM alerts over every channel x campaign series (see anomalies.py).
+
+    The chart state is kept between calls, so a reload only processes the new days.
+    """
+    import anomalies
+
+    ds = get_dataset(data_dir)
+    key = str(data_dir or DATA_DIR)
+    with _anomaly_lock:
+        state = _anomaly_states.get(key)
+        if state is None or state.version != ds.version:
+            state = anomalies.update(state, _query(ds, ["date"] + anomalies.SERIES_KEYS, None))
+            state.version = ds.version
+            _anomaly_states[key] = state
+    return anomalies.alert_table(state, days, top)
+
+
+def _business_days(business: pd.DataFrame):
+    if business.empty or not set(BUSINESS_DAILY_COLUMNS) <= set(business.columns):
+        return None
+    return daily_arrays(business, BUSINESS_DAILY_COLUMNS)
+
+
+def build_dataset(data_dir: Path, version: int, fingerprint: str, previous: Dataset | None = None) -> Dataset:
+    """Ingest every source and prepare derived tables for one dataset version.
+
+    Called by the DatasetManager's refresher thread, off the request path (and inline
+    only for the very first version). In disk mode this also builds and indexes the store;
+    in memory mode the version is shared with other processes through shared.py, so
+    only the first process to see a fingerprint parses the files. Given the `previous`
+    version, files that were only appended to are read from where it stopped (see _ingest).
+    """
+    if STORAGE_MODE == "disk" or not SHARED_DATASET:
+        return _ingest(data_dir, version, fingerprint, previous)
+    import shared
+
+    def build() -> Tuple[Dict[str, pd.DataFrame], Dataset]:
+        ds = _ingest(data_dir, version, fingerprint, previous)
+        # The tables that grow with the history are mapped; the rest is small and pickled
+        frames = {
+            "marketing": ds.marketing,
+            **{f"materialized.{k}": v for k, v in ds.materialized.items()},
+            **{f"sketches.{k}": v for k, v in (ds.sketches or {}).items()},
+        }
+        return frames, replace(ds, marketing=ds.marketing.iloc[:0], materialized={}, sketches=None)
+
+    frames, ds = shared.build_once(data_dir, fingerprint, build)
+
+    def group(prefix: str) -> dict:
+        return {k[len(prefix):]: v for k, v in frames.items() if k.startswith(prefix)}
+
+    return replace(
+        ds, version=version, marketing=frames["marketing"], materialized=group("materialized."),
+        sketches=group("sketches.") or None,
+    )
+
+
+# Per data dir: (fingerprint, validator state) of the last version this process ingested,
+# so an append-only refresh can resume the duplicate-key checks
+_ingest_states: Dict[str, Tuple[str, validation.ValidatorState]] = {}
+
+
+def _ingest(data_dir: Path, version: int, fingerprint: str, previous: Dataset | None = None) -> Dataset:
+    """Build a dataset version from the files.
+
+    In memory mode, when every channel file the `previous` version read has only grown,
+    just the appended bytes are parsed: the new rows are appended to the previous rows and
+    merged into its materialized tables and sketches, so the work follows the new data.
+    Anything else (a file rewritten or removed, disk mode, no previous version) ingests
+    everything.
+    """
+    import sketches
+
+    business = _read_business(data_dir / BUSINESS_FILE)
+    business_days = _business_days(business)
+    sources = discover_channel_sources(data_dir)
+    marks: tuple[SourceMark, ...] = ()
+    if STORAGE_MODE == "disk":
+        validator = validation.IngestValidator()
+        # The report is kept in the store, so a process reusing the store (after a restart,
+        # or one that lost the race to build it) reads it back instead of seeing no rows
+        path, _ = store.build(
+            store.store_path(data_dir, fingerprint), sources, partial(_marketing_chunks, validator=validator),
+            extra=lambda: validation.report_tables(validator.report()),
+        )
+        totals, issues = (store.read_table(path, name) for name in ("validation_totals", "validation_issues"))
+        # Stores built before the report was kept: re-check the stored rows; what the
+        # normalizer coerced or dropped is no longer known
+        recheck = totals is None or issues is None
+        marketing = pd.DataFrame(columns=MARKETING_COLUMNS)
+        # One streaming pass over the store feeds both mergeable summaries
+        tables = materialized.build([])
+        cost_sketches = sketches.empty_sketches()
+        for chunk in store.iter_rows(path):
+            tables = materialized.merge(tables, chunk)
+            cost_sketches = sketches.combine(cost_sketches, sketches.build([chunk]))
+            if recheck:
+                for channel, rows in chunk.groupby("channel", sort=False):
+                    validator.add(rows, channel)
+        catalog = _order_catalog(store.dimension_catalog(path, CATALOG_DIMENSIONS))
+        report = validator.report() if recheck else validation.report_from_tables(totals, issues)
+        store_path = str(path)
+    else:
+        resume = None
+        state = _ingest_states.get(str(data_dir))
+        if previous is not None and state is not None and state[0] == previous.fingerprint and previous.sources:
+            resume = _mark_sources(sources, previous.sources)
+        if resume is not None:
+            marks, spans = resume
+            validator = validation.IngestValidator(state[1])
+            new = _combine(_read_sources(sources, validator, spans))
+            marketing = _append_rows(previous.marketing, new)
+            tables = materialized.merge(previous.materialized, new)
+            cost_sketches = sketches.combine(previous.sketches, sketches.build([new]))
+        else:
+            marks, spans = _mark_sources(sources)
+            validator = validation.IngestValidator()
+            marketing = _combine(_read_sources(sources, validator, spans))
+            tables = materialized.build([marketing])
+            cost_sketches = sketches.build([marketing])
+        catalog = _order_catalog(materialized.catalog(tables, CATALOG_DIMENSIONS))
+        _ingest_states[str(data_dir)] = (fingerprint, validator.state())
+        report = validator.report()
+        store_path = None
+    marketing_daily = tables["daily"][["date"] + MARKETING_METRICS]
+    channel_daily = tables["channel_daily"].drop(columns="rows")
+    rollups = build_rollups(marketing_daily, channel_daily, business)
+    if report.duplicate_rows:
+        dupes = store.duplicate_keys(store_path, validation.DUPLICATE_SAMPLE) if store_path else validation.duplicate_keys(marketing)
+        report = report._replace(duplicates=dupes)
+    return Dataset(
+        version, fingerprint, marketing, business, marketing_daily, catalog, store_path, time.time(),
+        business_days, rollups, report, cost_sketches, tables, marks,
+    )
+
+
+def get_dataset(data_dir: Path | None = None) -> Dataset:
+    """The dataset version currently being served; never waits on a background refresh."""
+    ddir = (data_dir or DATA_DIR)
+    return get_manager(str(ddir), build_dataset, _watched_files).current()
+
+
+def load_marketing_data(data_dir: Path | None = None) -> pd.DataFrame:
+    """Unified marketing rows from every discovered channel CSV (empty in disk mode)."""
+    return get_dataset(data_dir).marketing
+
+
+def load_business_data(data_dir: Path | None = None) -> pd.DataFrame:
+    """Business daily totals: date, orders, new_orders, new_customers, total_revenue, gross_profit, cogs."""
+    return get_dataset(data_dir).business
+
+
+def ensure_store(data_dir: Path | None = None) -> str:
+    """Path of the disk store backing the current dataset version (disk mode only)."""
+    return get_dataset(data_dir).store_path
+
+
 def load_all(data_dir: Path | None = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """Convenience loader returning (marketing_df, business_df, marketing_daily).
 
     marketing_daily is marketing aggregated by date, useful for blended metrics with business.
+    In disk mode marketing_df is empty; views query aggregates through query_marketing.
     """
-    m = load_marketing_data(data_dir)
-    b = load_business_data(data_dir)
-    md = aggregate_marketing_daily(m)
-    return m, b, md
+    ds = get_dataset(data_dir)
+    return ds.marketing, ds.business, ds.marketing_daily
@@ -0,0 +1,121 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+import threading
+from typing import Callable
+
+import pandas as pd
+
+from metrics import DailyArrays
+from validation import ValidationReport
+from watcher import DataDirWatcher, Files, get_watcher
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """One fully built, immutable version of the dashboard data.
+
+    Everything a rerun needs is prepared when the version is built, so serving a
+    request never triggers ingest. Frames are shared across sessions: treat them as read-only.
+    """
+
+    version: int
+    fingerprint: str
+    marketing: pd.DataFrame  # empty in disk storage mode
+    business: pd.DataFrame
+    marketing_daily: pd.DataFrame
+    catalog: pd.DataFrame  # see data.build_catalog
+    store_path: str | None = None
+    built_at: float = 0.0
+    business_days: DailyArrays | None = None  # business daily on a dense calendar, for blending
+    rollups: dict = field(default_factory=dict)  # grain -> data.Rollup (week/month/quarter totals)
+    validation: ValidationReport | None = None  # ingest checks, see validation.py
+    sketches: dict | None = None  # name -> CPC/CPM bucket counts per sketches.GRAINS group
+    materialized: dict = field(default_factory=dict)  # name -> aggregate table, see materialized.py
+    sources: tuple = ()  # data.SourceMark per channel file read, for append-only refreshes
+
+
+# (data dir, version, fingerprint, previous version or None) -> new version
+Builder = Callable[[Path, int, str, "Dataset | None"], Dataset]
+
+
+class DatasetManager:
+    """Double-buffered holder of the current Dataset for one data directory.
+
+    Sessions read `current()`, which is a plain attribute read once the first version
+    exists. When the watcher reports a change, the next version is built on a background
+    thread while the previous one keeps being served, then swapped in with a single
+    reference assignment. Changes that arrive mid-build are coalesced into one more build.
+    """
+
+    def __init__(self, data_dir: Path, builder: Builder, watcher: DataDirWatcher):
+        self.data_dir = Path(data_dir)
+        self.watcher = watcher
+        self.last_error: Exception | None = None
+        self._builder = builder
+        self._current: Dataset | None = None
+        self._pending: int | None = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        watcher.subscribe(self._on_change)
+
+    @property
+    def refreshing(self) -> bool:
+        return self._running
+
+    def current(self) -> Dataset:
+        ds = self._current
+        if ds is not None:
+            return ds
+        # Cold start: there is nothing to serve yet, so the first caller builds inline
+        with self._init_lock:
+            if self._current is None:
+                self._swap(self._build(self.watcher.version))
+            return self._current
+
+    def _build(self, version: int) -> Dataset:
+        return self._builder(self.data_dir, version, self.watcher.fingerprint, self._current)
+
+    def _swap(self, ds: Dataset) -> None:
+        # Never let a slower, older build replace a newer one
+        with self._lock:
+            if self._current is None or ds.version >= self._current.version:
+                self._current = ds
+
+    def _on_change(self, version: int) -> None:
+        with self._lock:
+            self._pending = version
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._refresh_loop, name="dataset-refresh", daemon=True).start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            with self._lock:
+                version, self._pending = self._pending, None
+                if version is None:
+                    self._running = False
+                    return
+            try:
+                ds = self._build(version)
+            except Exception as exc:
+                # Keep serving the previous version; the next change retries
+                self.last_error = exc
+                continue
+            self.last_error = None
+            self._swap(ds)
+
+
+_managers: dict[str, DatasetManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(data_dir: str, builder: Builder, files: Files | None = None) -> DatasetManager:
+    """One manager per data directory per process, wired to that directory's watcher (see get_watcher)."""
+    with _managers_lock:
+        m = _managers.get(data_dir)
+        if m is None:
+            m = _managers[data_dir] = DatasetManager(Path(data_dir), builder, get_watcher(data_dir, files))
+        return m
@@ -0,0 +1,132 @@
+from __future__ import annotations
+from pathlib import Path
+import io
+import os
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+
+import aggregates
+import data as data_mod
+
+# Streaming export of the filtered rows and the page aggregates. Every table is produced
+# as a generator of frames and encoded chunk by chunk (CSV text, or one Parquet row group
+# per chunk), so writing out millions of rows holds one chunk at a time rather than a
+# second copy of the whole frame.
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "100000"))
+FORMATS = ("csv", "parquet")
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+class Export(NamedTuple):
+    label: str
+    frames: Callable[[dict | None, Path | None, int], Iterator[pd.DataFrame]]
+
+
+def _chunks(frame: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    yield frame.iloc[:chunk_rows]
+    for i in range(chunk_rows, len(frame), chunk_rows):
+        yield frame.iloc[i:i + chunk_rows]
+
+
+def _aggregate(fn: Callable[[dict | None, Path | None], pd.DataFrame]) -> Callable[..., Iterator[pd.DataFrame]]:
+    def frames(filters: dict | None, data_dir: Path | None, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        return _chunks(fn(filters, data_dir), chunk_rows)
+
+    return frames
+
+
+EXPORTS = {
+    "rows": Export("Filtered rows", lambda f, d, n: data_mod.iter_marketing_rows(f, n, d)),
+    "kpis": Export("KPIs (Executive Summary)", _aggregate(lambda f, d: pd.DataFrame([aggregates.kpis(f, d)]))),
+    "channels": Export("Channels (Executive Summary)", _aggregate(aggregates.channel_breakdown)),
+    "campaigns": Export("Campaigns (Drilldown)", _aggregate(aggregates.campaign_table)),
+    "daily_channels": Export("Daily by channel (Trends)", _aggregate(aggregates.daily_channels)),
+    "blended": Export("Blended daily (Profit)", _aggregate(aggregates.blended_daily)),
+    "geo_tactic": Export("State x tactic (Geo & Tactic)", _aggregate(aggregates.geo_tactic_table)),
+}
+
+
+def csv_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for df in frames:
+        yield df.to_csv(index=False, header=header, date_format="%Y-%m-%d").encode()
+        header = False
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink that hands back what was written since the last drain.
+
+    tell() keeps counting across drains, so the Parquet footer offsets stay right.
+    """
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def parquet_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """One Parquet file as byte chunks: a row group per frame, then the footer."""
+    import pyarrow.parquet as pq  # only once a Parquet export is asked for
+
+    sink = _Drain()
+    writer = None
+    schema = None
+    for df in frames:
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if writer is None:
+            schema = table.schema
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+
+def stream(
+    name: str,
+    fmt: str,
+    filters: dict | None = None,
+    data_dir: Path | None = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """Encoded chunks of export `name` (a key of EXPORTS) in format `fmt` (csv or parquet)."""
+    if name not in EXPORTS:
+        raise ValueError(f"Unknown export {name!r}; expected one of {sorted(EXPORTS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+    frames = EXPORTS[name].frames(filters, data_dir, chunk_rows)
+    return csv_chunks(frames) if fmt == "csv" else parquet_chunks(frames)
+
+
+def write_file(path: Path, name: str, fmt: str, filters: dict | None = None, data_dir: Path | None = None) -> int:
+    """Stream an export into `path`; returns the bytes written."""
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in stream(name, fmt, filters, data_dir):
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def file_name(name: str, fmt: str) -> str:
+    return f"{name}.{fmt}"
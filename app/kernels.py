@@ -0,0 +1,58 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Ratio metrics as (numerator, denominator, scale). A zero denominator yields 0.
+RATIO_METRICS: Dict[str, Tuple[str, str, float]] = {
+    "ctr": ("clicks", "impressions", 1.0),
+    "cpc": ("spend", "clicks", 1.0),
+    "cpm": ("spend", "impressions", 1000.0),
+    "roas": ("attributed_revenue", "spend", 1.0),
+    "mer": ("total_revenue", "spend", 1.0),
+    "cac": ("spend", "new_customers", 1.0),
+    "aov": ("total_revenue", "orders", 1.0),
+    "margin": ("gross_profit", "total_revenue", 1.0),
+}
+# Metrics added to marketing frames by metrics.compute_derived_metrics
+MARKETING_RATIOS = ("ctr", "cpc", "cpm", "roas")
+
+
+def ratio_into(numer: np.ndarray, denom: np.ndarray, out: np.ndarray, scale: float = 1.0,
+               mask: np.ndarray | None = None) -> np.ndarray:
+    """out = scale * numer / denom where denom != 0, else 0, without temporaries.
+
+    `mask` is an optional bool buffer of the same length reused for the zero test.
+    Inputs are read as-is (no astype copies); the result is cast into out's dtype.
+    """
+    mask = np.not_equal(denom, 0, out=mask)
+    out.fill(0)
+    np.divide(numer, denom, out=out, where=mask)
+    if scale != 1.0:
+        np.multiply(out, scale, out=out)
+    return out
+
+
+def available_ratios(columns: Iterable[str], metrics: Iterable[str] | None = None) -> list[str]:
+    """Ratio metrics (in RATIO_METRICS order) whose inputs are all in `columns`."""
+    cols = set(columns)
+    wanted = RATIO_METRICS if metrics is None else set(metrics)
+    return [m for m, (n, d, _) in RATIO_METRICS.items() if m in wanted and n in cols and d in cols]
+
+
+def ratio_metrics(df: pd.DataFrame, metrics: Iterable[str] | None = None, dtype=np.float64) -> pd.DataFrame:
+    """Ratio metrics for every row of `df`, indexed like `df`.
+
+    Only metrics whose inputs are present are computed (all of RATIO_METRICS by default).
+    Results are written into one preallocated (n_metrics, n_rows) block of `dtype`.
+    """
+    names = available_ratios(df.columns, metrics)
+    n = len(df)
+    block = np.empty((len(names), n), dtype=dtype)
+    mask = np.empty(n, dtype=bool)
+    for row, name in zip(block, names):
+        numer, denom, scale = RATIO_METRICS[name]
+        ratio_into(df[numer].to_numpy(), df[denom].to_numpy(), row, scale, mask)
+    # block.T is a view whose transpose is the block itself, so pandas can adopt it without copying
+    return pd.DataFrame(block.T, index=df.index, columns=names, copy=False)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import numpy as np
+
+# Longest spend-to-revenue delay (days) scanned by the lag analysis
+MAX_LAG = 60
+# Fewest overlapping days a lag needs; longer lags are dropped for short histories
+MIN_OVERLAP = 28
+
+
+def _fft_size(n: int) -> int:
+    # Power of two with room for linear (not circular) correlation
+    return 1 << (2 * n - 1).bit_length()
+
+
+def lag_correlation(
+    spend: np.ndarray, revenue: np.ndarray, max_lag: int = MAX_LAG, min_overlap: int = MIN_OVERLAP
+) -> np.ndarray:
+    """Pearson correlation of spend[t] with revenue[t + k] for k = 0..max_lag.
+
+    `spend` is one daily series or a 2-D stack of them (one per row); `revenue` is a
+    single daily series on the same calendar. Each lag is correlated over its own overlap
+    (n - k days), and lags leaving fewer than `min_overlap` days are not returned, so
+    the result can have fewer than max_lag + 1 columns. The cross products for all lags come from one FFT, and the
+    per-window sums come from cumulative sums, so the cost is O(n log n) however many
+    lags are scanned. Lags where either window is constant get 0.
+    """
+    x = np.atleast_2d(np.asarray(spend, dtype=float))
+    y = np.asarray(revenue, dtype=float)
+    n = y.shape[-1]
+    max_lag = min(max_lag, n - max(min_overlap, 2))
+    if max_lag < 0:
+        out = np.zeros((x.shape[0], 0))
+        return out[0] if np.ndim(spend) == 1 else out
+    # Correlation is shift-invariant; centring keeps the sums below well conditioned
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean()
+
+    nfft = _fft_size(n)
+    cross = np.fft.irfft(np.conj(np.fft.rfft(x, nfft)) * np.fft.rfft(y, nfft), nfft)[:, : max_lag + 1]
+
+    lags = np.arange(max_lag + 1)
+    m = n - lags
+    # x window is x[:n-k]; y window is y[k:]
+    cx = np.concatenate([np.zeros((x.shape[0], 1)), np.cumsum(x, axis=1)], axis=1)[:, m]
+    cxx = np.concatenate([np.zeros((x.shape[0], 1)), np.cumsum(x * x, axis=1)], axis=1)[:, m]
+    cy = np.concatenate([[0.0], np.cumsum(y)])
+    cyy = np.concatenate([[0.0], np.cumsum(y * y)])
+    sy = cy[-1] - cy[lags]
+    syy = cyy[-1] - cyy[lags]
+
+    cov = cross - cx * sy / m
+    var_x = cxx - cx * cx / m
+    var_y = syy - sy * sy / m
+    # Treat windows whose variance is lost in rounding as constant
+    ok = (var_x > 1e-12 * cxx[:, :1]) & (var_y > 1e-12 * cyy[-1])
+    out = np.zeros_like(cov)
+    np.divide(cov, np.sqrt(np.abs(var_x * var_y)), out=out, where=ok)
+    return out[0] if np.ndim(spend) == 1 else out
+
+
+def best_lag(corr: np.ndarray) -> int:
+    """Lag (index) with the highest correlation."""
+    return int(np.argmax(corr)) if len(corr) else 0
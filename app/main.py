@@ -1,9 +1,11 @@
 import streamlit as st
-from views import summary, drilldown, trends, data_quality, profit, geo_tactic
 from datetime import timedelta, date, datetime
+from pathlib import Path
+import importlib
+import sys
 import pandas as pd
 import data as data_mod
-from theme import apply_theme
+from theme import apply_theme, apply_plotly_theme
 
 st.set_page_config(
     page_title="Marketing Intelligence Dashboard",
@@ -12,6 +14,21 @@ st.set_page_config(
 )
 
 
+# Navigation order -> view module. Views are imported when their page is first shown,
+# so Plotly (and each page's modelling code) only loads once a page needs it.
+PAGES = {
+    "Executive Summary": "summary",
+    "Drilldown": "drilldown",
+    "Trends": "trends",
+    "Profit": "profit",
+    "Geo & Tactic": "geo_tactic",
+    "Response Curves": "response_curves",
+    "Budget Optimizer": "budget",
+    "Media Mix": "media_mix",
+    "Data Quality": "data_quality",
+}
+
+
 def _parse_csv_list(val):
     if not val:
         return []
@@ -69,7 +86,7 @@ def _update_query_params(cur: dict):
             pass
 
 
-def sidebar_nav(marketing_df):
+def sidebar_nav():
     # Navigation section with enhanced styling
     st.sidebar.markdown(
         """
@@ -80,14 +97,13 @@ def sidebar_nav(marketing_df):
         unsafe_allow_html=True,
     )
     # Theme CSS is now injected globally in main()
-    page = st.sidebar.radio("Go to", ["Executive Summary", "Drilldown", "Trends", "Profit", "Geo & Tactic", "Data Quality"], label_visibility="collapsed") 
+    page = st.sidebar.radio("Go to", list(PAGES), label_visibility="collapsed")
     
     # Clear divider between Navigation and Filters
     st.sidebar.markdown('<div class="oct-section-divider"></div>', unsafe_allow_html=True)
     
     # Filters section with enhanced styling
     filters = {}
-    filt_opts = data_mod.get_available_filters(marketing_df)
     st.sidebar.markdown(
         """
         <div class="oct-section-header oct-filter-section">
@@ -96,6 +112,12 @@ def sidebar_nav(marketing_df):
         """,
         unsafe_allow_html=True,
     )
+    # Options come from the precomputed dimension catalog, so ordering by spend is free
+    sort_by_spend = st.sidebar.checkbox("Sort options by spend", value=False, key="filter_sort_by_spend")
+    filt_opts = data_mod.get_available_filters(order="spend" if sort_by_spend else "name")
+    # Batch mode stages checkbox edits in a form and applies them in a single rerun
+    batch_mode = st.sidebar.checkbox("Batch filter edits", value=False, key="filter_batch_mode")
+    group_container = st.sidebar.form("filter_form", border=False) if batch_mode else st.sidebar
     # Query params (if any)
     try:
         qp = st.query_params
@@ -112,21 +134,21 @@ def sidebar_nav(marketing_df):
     def checkbox_group(label: str, options: list[str], qp_default: list[str], group_key: str) -> list[str]:
         options = options or []
         # Wrap each checkbox group in a container so we can style spacing tightly via CSS
-        st.sidebar.markdown('<div class="oct-filter-group">', unsafe_allow_html=True)
-        st.sidebar.markdown(f"#### {label}")
+        group_container.markdown('<div class="oct-filter-group">', unsafe_allow_html=True)
+        group_container.markdown(f"#### {label}")
         # Determine base selection: session -> query params -> all
         prev_sel = st.session_state.get(group_key)
         base_sel = [o for o in (prev_sel if isinstance(prev_sel, list) else (qp_default or options)) if o in options]
         selected: list[str] = []
         for opt in options:
             opt_key = f"chk_{group_key}_{opt}"
-            checked = st.sidebar.checkbox(opt, value=(opt in base_sel), key=opt_key)
+            checked = group_container.checkbox(opt, value=(opt in base_sel), key=opt_key)
             if checked:
                 selected.append(opt)
         # Persist group selection for reset/share and URL sync
         st.session_state[group_key] = selected
         # Close the filter group wrapper
-        st.sidebar.markdown('</div>', unsafe_allow_html=True)
+        group_container.markdown('</div>', unsafe_allow_html=True)
         return selected
 
     channels = checkbox_group(
@@ -135,27 +157,29 @@ def sidebar_nav(marketing_df):
         qp_default=qp_channels,
         group_key="filter_channels",
     )
-    st.sidebar.markdown('<div class="oct-filter-divider"></div>', unsafe_allow_html=True)
+    group_container.markdown('<div class="oct-filter-divider"></div>', unsafe_allow_html=True)
     tactics = checkbox_group(
         "Tactic",
         options=filt_opts.get("tactics", []),
         qp_default=qp_tactics,
         group_key="filter_tactics",
     )
-    st.sidebar.markdown('<div class="oct-filter-divider"></div>', unsafe_allow_html=True)
+    group_container.markdown('<div class="oct-filter-divider"></div>', unsafe_allow_html=True)
     states = checkbox_group(
         "State",
         options=filt_opts.get("states", []),
         qp_default=qp_states,
         group_key="filter_states",
     )
+    if batch_mode:
+        group_container.caption("Selections take effect when you apply them.")
+        group_container.form_submit_button("Apply filters", type="primary", use_container_width=True)
     
     # Add divider before date section
     st.sidebar.markdown('<div class="oct-filter-divider"></div>', unsafe_allow_html=True)
     
     # Default last 60 days if available
-    min_date = marketing_df["date"].min() if not marketing_df.empty else None
-    max_date = marketing_df["date"].max() if not marketing_df.empty else None
+    min_date, max_date = data_mod.marketing_date_bounds()
     # Apply any pending preset before creating the date_input widget
     if "_pending_date_range" in st.session_state:
         # Set the widget value prior to instantiation to avoid Streamlit API exceptions
@@ -334,7 +358,27 @@ def _apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
     return out
 
 
-# Export center removed per request
+def export_panel(filters: dict):
+    # Files are streamed to a temp file chunk by chunk, then offered for download on that
+    # rerun only: the download button holds the whole file in memory while it is shown
+    import tempfile
+    import export
+
+    with st.sidebar.expander("Export data"):
+        name = st.selectbox("Table", list(export.EXPORTS), format_func=lambda k: export.EXPORTS[k].label, key="export_table")
+        fmt = st.radio("Format", export.FORMATS, horizontal=True, key="export_format", format_func=str.upper)
+        if st.button("Prepare file", key="export_prepare", use_container_width=True):
+            with tempfile.TemporaryDirectory(prefix="export_") as tmp:
+                path = Path(tmp) / export.file_name(name, fmt)
+                export.write_file(path, name, fmt, filters)
+                with open(path, "rb") as f:
+                    st.download_button(
+                        f"Download {export.file_name(name, fmt)}", f, file_name=export.file_name(name, fmt),
+                        mime=export.MIME_TYPES[fmt], use_container_width=True,
+                    )
+            st.caption("Offered until your next interaction; prepare it again to download it later.")
+        else:
+            st.caption("Exports use the current filters. Larger than memory? Use the API's /export endpoint.")
 
 
 def main():
@@ -342,29 +386,25 @@ def main():
     css = apply_theme("Light")
     st.markdown(css, unsafe_allow_html=True)
     # Load data first
-    marketing_df, business_df, marketing_daily = data_mod.load_all()
+    # Raw marketing rows stay in the data layer; views request aggregates via data.query_marketing
+    _, business_df, marketing_daily = data_mod.load_all()
     # Store for other views
-    st.session_state["marketing_df"] = marketing_df
     st.session_state["business_df"] = business_df
     st.session_state["marketing_daily"] = marketing_daily
-    page, filters = sidebar_nav(marketing_df)
+    page, filters = sidebar_nav()
+    export_panel(filters)
     
     # Page title
     st.title("Marketing Intelligence Dashboard")
 
-    if page == "Executive Summary":
-        summary.render(filters, marketing_df, business_df, marketing_daily)
-    elif page == "Drilldown":
-        drilldown.render(filters)
-    elif page == "Trends":
-        trends.render(filters)
-    elif page == "Profit":
-        profit.render(filters)
-    elif page == "Geo & Tactic":
-        geo_tactic.render(filters)
-    elif page == "Data Quality":
-        data_quality.render()
-
+    view = importlib.import_module(f"views.{PAGES[page]}")
+    # Style charts once the first charting view has pulled Plotly in
+    if "plotly" in sys.modules:
+        apply_plotly_theme()
+    if page == "Data Quality":
+        view.render()
+    else:
+        view.render(filters)
 
 if __name__ == "__main__":
     main()
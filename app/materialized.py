@@ -0,0 +1,141 @@
+from __future__ import annotations
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+# Materialized aggregates of the marketing rows, one set per dataset version. When a new
+# version only appends rows, the appended rows are aggregated on their own and merged into
+# the previous version's tables, so a refresh costs in proportion to the new data rather
+# than the full history. Queries whose grouping and filters a table covers are answered
+# from the smallest such table (see lookup) instead of grouping the rows again.
+
+METRICS = ["impressions", "clicks", "spend", "attributed_revenue"]
+# name -> group keys; tables without a date keep each group's first and last date instead
+TABLES = {
+    "daily": ["date"],
+    "channel_daily": ["date", "channel"],
+    "campaigns": ["channel", "tactic", "state", "campaign"],
+    "states": ["state"],
+}
+# Sidebar filter key -> the column it needs in a table
+FILTER_COLUMNS = {"channels": "channel", "tactics": "tactic", "states": "state", "date_range": "date"}
+
+Tables = Dict[str, pd.DataFrame]
+
+
+def _columns(keys: list[str]) -> list[str]:
+    extra = [] if "date" in keys else ["first_date", "last_date"]
+    return keys + METRICS + ["rows"] + extra
+
+
+def _empty(keys: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        c: pd.Series(dtype="datetime64[ns]" if c in ("date", "first_date", "last_date")
+                     else np.int64 if c == "rows" else float if c in METRICS else object)
+        for c in _columns(keys)
+    })
+
+
+def aggregate(rows: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """One table's partial sums over `rows` (marketing schema), sorted by `keys`."""
+    if rows.empty:
+        return _empty(keys)
+    spec = {**{c: (c, "sum") for c in METRICS}, "rows": ("spend", "size")}
+    if "date" not in keys:
+        spec.update(first_date=("date", "min"), last_date=("date", "max"))
+    return rows.groupby(keys, as_index=False, sort=True).agg(**spec)[_columns(keys)]
+
+
+def _reduce(parts: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    spec = {**{c: "sum" for c in METRICS}, "rows": "sum"}
+    if "date" not in keys:
+        spec.update(first_date="min", last_date="max")
+    return parts.groupby(keys, as_index=False, sort=True).agg(spec)[_columns(keys)]
+
+
+def merge_table(old: pd.DataFrame, new: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """Merge partial sums `new` into `old`; both sorted by `keys`, and so is the result.
+
+    Days after the last one already held are appended as they are; anything else
+    (late rows for a known day, any non-daily table) re-reduces the two tables, which
+    are small next to the rows they summarize.
+    """
+    if new.empty:
+        return old
+    if old.empty:
+        return new
+    if keys[0] == "date" and new["date"].iloc[0] > old["date"].iloc[-1]:
+        return pd.concat([old, new], ignore_index=True)
+    return _reduce(pd.concat([old, new], ignore_index=True), keys)
+
+
+def build(frames: Iterable[pd.DataFrame]) -> Tables:
+    """Every TABLES table from marketing rows, given whole or in chunks (e.g. store.iter_rows)."""
+    tables = {name: _empty(keys) for name, keys in TABLES.items()}
+    for rows in frames:
+        tables = merge(tables, rows)
+    return tables
+
+
+def merge(tables: Tables, rows: pd.DataFrame) -> Tables:
+    """New tables with `rows` (e.g. the rows a refresh appended) added; `tables` is left as is."""
+    if rows.empty:
+        return dict(tables)
+    return {name: merge_table(tables[name], aggregate(rows, keys), keys) for name, keys in TABLES.items()}
+
+
+def catalog(tables: Tables, dimensions: list[str]) -> pd.DataFrame:
+    """Per-dimension value catalog (see data.build_catalog) from the campaigns table."""
+    camp = tables["campaigns"]
+    if camp.empty:
+        return pd.DataFrame(columns=["dimension", "value", "rows", "spend", "first_date", "last_date"])
+    frames = [
+        camp.groupby(dim, as_index=False)
+        .agg(rows=("rows", "sum"), spend=("spend", "sum"), first_date=("first_date", "min"), last_date=("last_date", "max"))
+        .rename(columns={dim: "value"})
+        .assign(dimension=dim)
+        for dim in dimensions
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def active_columns(tables: Tables, filters: dict | None) -> set[str]:
+    """Columns the filters actually restrict; a date range covering every day restricts nothing."""
+    cols = {FILTER_COLUMNS[k] for k in ("channels", "tactics", "states") if (filters or {}).get(k)}
+    dr = (filters or {}).get("date_range") or []
+    if len(dr) == 2:
+        daily = tables.get("daily")
+        start, end = pd.to_datetime(dr[0]), pd.to_datetime(dr[1])
+        if daily is None or daily.empty or not (start <= daily["date"].iloc[0] and end >= daily["date"].iloc[-1]):
+            cols.add("date")
+    return cols
+
+
+def lookup(tables: Tables, by: list[str], filters: dict | None) -> pd.DataFrame | None:
+    """Marketing metrics grouped by `by` under `filters`, or None if no table covers them.
+
+    Same result as data.aggregate_marketing on the rows: `by` + METRICS + rows, sorted by `by`.
+    """
+    if not tables:
+        return None
+    need = set(by) | active_columns(tables, filters)
+    covering = [(name, keys) for name, keys in TABLES.items() if need <= set(keys)]
+    if not covering:
+        return None
+    name, keys = min(covering, key=lambda nk: len(tables[nk[0]]))
+    table = tables[name]
+    f = {k: v for k, v in (filters or {}).items() if FILTER_COLUMNS.get(k) in need}
+    if f:
+        import data as data_mod  # deferred: data imports this module
+
+        table = table[data_mod.marketing_mask(table, f)]
+    cols = METRICS + ["rows"]
+    if not by:
+        totals = {c: float(table[c].sum()) for c in METRICS}
+        return pd.DataFrame([{**totals, "rows": int(table["rows"].sum())}])
+    if table.empty:
+        return pd.DataFrame(columns=by + cols)
+    if list(by) == keys:
+        return table[by + cols].reset_index(drop=True)
+    return table.groupby(by, as_index=False, sort=True)[cols].sum()
@@ -1,36 +1,144 @@
+from typing import Dict, NamedTuple
+
 import numpy as np
 import pandas as pd
 
-
-def safe_divide(numer: pd.Series, denom: pd.Series) -> pd.Series:
-    denom = denom.astype(float)
-    numer = numer.astype(float)
-    return pd.Series(np.where(denom == 0, 0.0, numer / denom))
+from kernels import MARKETING_RATIOS, ratio_into, ratio_metrics
 
 
-essential_cols = {
-    "ctr": ("clicks", "impressions"),
-    "cpc": ("spend", "clicks"),
-    "cpm": ("spend", "impressions"),
-    "roas": ("attributed_revenue", "spend"),
-}
+def safe_divide(numer: pd.Series, denom: pd.Series) -> pd.Series:
+    """numer / denom with 0 where denom is 0, indexed like `numer`."""
+    out = np.empty(len(numer), dtype=float)
+    return pd.Series(ratio_into(numer.to_numpy(), denom.to_numpy(), out), index=numer.index)
 
 
-def compute_derived_metrics(df: pd.DataFrame) -> pd.DataFrame:
+def compute_derived_metrics(df: pd.DataFrame, dtype=np.float64) -> pd.DataFrame:
+    """Copy of `df` with CTR, CPC, CPM and ROAS added for whichever inputs are present."""
     if df is None or df.empty:
         return df
+    ratios = ratio_metrics(df, MARKETING_RATIOS, dtype=dtype)
     out = df.copy()
-    if {"clicks", "impressions"}.issubset(out.columns):
-        out["ctr"] = safe_divide(out["clicks"], out["impressions"]).astype(float)
-    if {"spend", "clicks"}.issubset(out.columns):
-        out["cpc"] = safe_divide(out["spend"], out["clicks"]).astype(float)
-    if {"spend", "impressions"}.issubset(out.columns):
-        out["cpm"] = (1000.0 * safe_divide(out["spend"], out["impressions"]).astype(float))
-    if {"attributed_revenue", "spend"}.issubset(out.columns):
-        out["roas"] = safe_divide(out["attributed_revenue"], out["spend"]).astype(float)
+    out[ratios.columns] = ratios
+    return out
+
+
+BLENDED_COLUMNS = [
+    "date",
+    "spend",
+    "total_revenue",
+    "mer",
+    "blended_cac",
+    "aov",
+    "gross_margin_pct",
+    "contribution_after_ads",
+    "profit_roas",
+]
+BUSINESS_DAILY_COLUMNS = ["total_revenue", "new_customers", "orders", "gross_profit"]
+
+
+class DailyArrays(NamedTuple):
+    """Daily metrics on a dense calendar: values[col][i] is the total for day start + i.
+
+    `present` marks days that had at least one input row, so joins can still behave
+    like an inner merge on date while being plain offset arithmetic.
+    """
+
+    start: np.datetime64
+    present: np.ndarray
+    values: Dict[str, np.ndarray]
+
+    @property
+    def days(self) -> int:
+        return len(self.present)
+
+    def window(self, first: np.datetime64, last: np.datetime64) -> "DailyArrays":
+        """Slice to the inclusive day window [first, last] (clipped to the calendar)."""
+        lo = max(int((np.datetime64(first, "D") - self.start).astype(np.int64)), 0)
+        hi = min(int((np.datetime64(last, "D") - self.start).astype(np.int64)) + 1, self.days)
+        hi = max(hi, lo)
+        return DailyArrays(
+            self.start + np.timedelta64(lo, "D"),
+            self.present[lo:hi],
+            {c: v[lo:hi] for c, v in self.values.items()},
+        )
+
+
+def daily_arrays(df: pd.DataFrame, cols: list[str]) -> DailyArrays:
+    """Scatter a frame with a `date` column onto a dense day calendar spanning its dates.
+
+    Rows sharing a date are summed; rows without a date are dropped.
+    """
+    day = df["date"].to_numpy().astype("datetime64[D]")
+    ok = ~np.isnat(day)
+    day = day[ok]
+    start = day.min()
+    off = (day - start).astype(np.int64)
+    days = int(off.max()) + 1
+    present = np.zeros(days, dtype=bool)
+    present[off] = True
+    values = {c: np.bincount(off, weights=df[c].to_numpy(dtype=float)[ok], minlength=days) for c in cols}
+    return DailyArrays(start, present, values)
+
+
+def blend_daily(marketing: DailyArrays, business: DailyArrays) -> pd.DataFrame:
+    """Blended KPIs over the days present in both calendars (see compute_blended_kpis).
+
+    The overlap is found with offset arithmetic on the two calendars, so there is no
+    hash join. Derived KPIs are written into one preallocated block (see kernels.ratio_into).
+    """
+    first = max(marketing.start, business.start)
+    last = min(marketing.start + np.timedelta64(marketing.days - 1, "D"),
+               business.start + np.timedelta64(business.days - 1, "D"))
+    if last < first:
+        return pd.DataFrame(columns=BLENDED_COLUMNS)
+    m = marketing.window(first, last)
+    b = business.window(first, last)
+    idx = np.flatnonzero(m.present & b.present)
+    n = len(idx)
+
+    block = np.zeros((8, n))
+    spend, total_rev, mer, blended_cac, aov, gross_margin_pct, contribution_after_ads, profit_roas = block
+    np.take(m.values["spend"], idx, out=spend)
+    np.take(b.values["total_revenue"], idx, out=total_rev)
+    new_cust = b.values["new_customers"][idx]
+    orders = b.values["orders"][idx]
+    gross_profit = b.values["gross_profit"][idx]
+
+    mask = np.empty(n, dtype=bool)
+    ratio_into(total_rev, spend, mer, mask=mask)
+    ratio_into(spend, new_cust, blended_cac, mask=mask)
+    ratio_into(total_rev, orders, aov, mask=mask)
+    ratio_into(gross_profit, total_rev, gross_margin_pct, mask=mask)
+    np.subtract(gross_profit, spend, out=contribution_after_ads)
+    ratio_into(gross_profit, spend, profit_roas, mask=mask)
+
+    dates = (first + idx.astype("timedelta64[D]")).astype("datetime64[ns]")
+    out = pd.DataFrame(dict(zip(BLENDED_COLUMNS[1:], block)))
+    out.insert(0, "date", dates)
     return out
 
 
+def blended_ratios(totals: pd.DataFrame) -> pd.DataFrame:
+    """Blended KPI columns (mer ... profit_roas) from summed spend and business totals.
+
+    Used for period rollups, where ratios must be taken of the period sums.
+    """
+    n = len(totals)
+    spend, total_rev, new_cust, orders, gross_profit = (
+        totals[c].to_numpy(dtype=float) for c in ["spend"] + BUSINESS_DAILY_COLUMNS
+    )
+    block = np.zeros((6, n))
+    mer, blended_cac, aov, gross_margin_pct, contribution_after_ads, profit_roas = block
+    mask = np.empty(n, dtype=bool)
+    ratio_into(total_rev, spend, mer, mask=mask)
+    ratio_into(spend, new_cust, blended_cac, mask=mask)
+    ratio_into(total_rev, orders, aov, mask=mask)
+    ratio_into(gross_profit, total_rev, gross_margin_pct, mask=mask)
+    np.subtract(gross_profit, spend, out=contribution_after_ads)
+    ratio_into(gross_profit, spend, profit_roas, mask=mask)
+    return pd.DataFrame(block.T, index=totals.index, columns=BLENDED_COLUMNS[3:], copy=False)
+
+
 def compute_blended_kpis(marketing_daily: pd.DataFrame, business_daily: pd.DataFrame) -> pd.DataFrame:
     """Join marketing daily totals with business daily to compute blended KPIs.
 
@@ -38,47 +146,8 @@ def compute_blended_kpis(marketing_daily: pd.DataFrame, business_daily: pd.DataF
     aov, gross_margin_pct, contribution_after_ads, profit_roas.
     """
     if marketing_daily is None or marketing_daily.empty or business_daily is None or business_daily.empty:
-        cols = [
-            "date",
-            "spend",
-            "total_revenue",
-            "mer",
-            "blended_cac",
-            "aov",
-            "gross_margin_pct",
-            "contribution_after_ads",
-            "profit_roas",
-        ]
-        return pd.DataFrame(columns=cols)
-
-    md = marketing_daily.rename(columns={"spend": "spend"}).copy()
-    bd = business_daily.copy()
-    df = pd.merge(md, bd, on="date", how="inner")
-
-    spend = df["spend"].astype(float)
-    total_rev = df["total_revenue"].astype(float)
-    new_cust = df["new_customers"].astype(float)
-    orders = df["orders"].astype(float)
-    gross_profit = df["gross_profit"].astype(float)
-
-    mer = safe_divide(total_rev, spend)
-    blended_cac = safe_divide(spend, new_cust)
-    aov = safe_divide(total_rev, orders)
-    gross_margin_pct = safe_divide(gross_profit, total_rev)
-    contribution_after_ads = gross_profit - spend
-    profit_roas = safe_divide(gross_profit, spend)
-
-    out = pd.DataFrame(
-        {
-            "date": df["date"],
-            "spend": spend,
-            "total_revenue": total_rev,
-            "mer": mer,
-            "blended_cac": blended_cac,
-            "aov": aov,
-            "gross_margin_pct": gross_margin_pct,
-            "contribution_after_ads": contribution_after_ads,
-            "profit_roas": profit_roas,
-        }
+        return pd.DataFrame(columns=BLENDED_COLUMNS)
+    return blend_daily(
+        daily_arrays(marketing_daily, ["spend"]),
+        daily_arrays(business_daily, BUSINESS_DAILY_COLUMNS),
     )
-    return out.sort_values("date").reset_index(drop=True)
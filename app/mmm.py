@@ -0,0 +1,167 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+import os
+from typing import NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Lightweight media-mix model: business revenue regressed (ridge) on geometrically
+# adstocked per-channel spend. Decay per channel and the ridge strength are chosen on a
+# time-ordered holdout by evaluating the whole grid with batched linear algebra.
+
+DECAYS = (0.0, 0.2, 0.4, 0.6, 0.8)
+# Ridge strengths for standardized features, scaled by the number of training days
+ALPHAS = (0.001, 0.01, 0.1, 1.0)
+# Share of the most recent days held out to score the grid
+HOLDOUT = 0.2
+# Decay combinations beyond this are sampled rather than enumerated (grid is DECAYS ** channels)
+MAX_COMBOS = 20_000
+# Combinations per batched solve; chunks are spread over the worker pool
+CHUNK_COMBOS = 512
+# Threads evaluating grid chunks; numpy releases the GIL inside the batched solves
+WORKERS = int(os.environ.get("MMM_WORKERS", str(os.cpu_count() or 1)))
+
+
+class MMMResult(NamedTuple):
+    channels: list[str]
+    decay: dict[str, float]
+    alpha: float
+    intercept: float
+    coef: dict[str, float]  # revenue per unit of adstocked spend
+    r2: float  # in-sample, after refitting on every day
+    holdout_r2: float  # of the chosen grid point, on the held-out days
+    fitted: pd.DataFrame  # date, revenue, fitted, baseline and one contribution column per channel
+    summary: pd.DataFrame  # channel, decay, spend, contribution, share, roi
+    grid: pd.DataFrame  # one row per evaluated (decay combo, alpha) with its holdout error
+
+
+def adstock(spend: np.ndarray, decays: Sequence[float]) -> np.ndarray:
+    """Geometric adstock a[t] = x[t] + d * a[t-1] of each row of `spend` for every decay.
+
+    Returns (channels, len(decays), days). The recursion is evaluated as one FFT
+    convolution with d**lag kernels, truncated once d**lag drops below 1e-9.
+    """
+    x = np.atleast_2d(np.asarray(spend, dtype=float))
+    n = x.shape[1]
+    d = np.asarray(decays, dtype=float)
+    longest = max((int(np.ceil(np.log(1e-9) / np.log(v))) for v in d if 0 < v < 1), default=1)
+    lags = np.arange(min(max(longest, 1), n))
+    kernel = np.power(d[:, None], lags[None, :])
+    nfft = 1 << (n + len(lags) - 1).bit_length()
+    conv = np.fft.irfft(np.fft.rfft(x, nfft)[:, None, :] * np.fft.rfft(kernel, nfft)[None, :, :], nfft)
+    return conv[:, :, :n]
+
+
+def _combos(n_channels: int, n_decays: int, seed: int = 0) -> np.ndarray:
+    """Decay-index combinations (one column per channel), sampled if the grid is too large."""
+    total = n_decays**n_channels
+    if total <= MAX_COMBOS:
+        return np.array(list(product(range(n_decays), repeat=n_channels)), dtype=np.intp).reshape(total, n_channels)
+    rng = np.random.default_rng(seed)
+    return np.unique(rng.integers(0, n_decays, (MAX_COMBOS, n_channels)), axis=0)
+
+
+def _score_chunk(stock: np.ndarray, combos: np.ndarray, y: np.ndarray, train: int, alphas: np.ndarray) -> np.ndarray:
+    """Holdout SSE for each (combo, alpha): ridge on the first `train` days, scored on the rest."""
+    ch = np.arange(stock.shape[0])
+    X = stock[ch[None, :], combos].transpose(0, 2, 1)  # (combos, days, channels)
+    Xt, Xh = X[:, :train], X[:, train:]
+    mu = Xt.mean(axis=1, keepdims=True)
+    Xt = Xt - mu
+    yt = y[:train] - y[:train].mean()
+    xtx = np.einsum("btc,btd->bcd", Xt, Xt)
+    xty = np.einsum("btc,t->bc", Xt, yt)
+    eye = np.eye(X.shape[2])
+    sse = np.empty((len(combos), len(alphas)))
+    for j, alpha in enumerate(alphas):
+        beta = np.linalg.solve(xtx + alpha * train * eye, xty[..., None])[..., 0]
+        pred = y[:train].mean() + np.einsum("btc,bc->bt", Xh - mu, beta)
+        sse[:, j] = ((pred - y[train:]) ** 2).sum(axis=1)
+    return sse
+
+
+def _ridge(X: np.ndarray, y: np.ndarray, alpha: float) -> tuple[float, np.ndarray]:
+    mu = X.mean(axis=0)
+    Xc = X - mu
+    beta = np.linalg.solve(Xc.T @ Xc + alpha * len(y) * np.eye(X.shape[1]), Xc.T @ (y - y.mean()))
+    return float(y.mean() - mu @ beta), beta
+
+
+def fit_mmm(
+    dates: pd.DatetimeIndex,
+    spend: np.ndarray,
+    channels: Sequence[str],
+    revenue: np.ndarray,
+    decays: Sequence[float] = DECAYS,
+    alphas: Sequence[float] = ALPHAS,
+    holdout: float = HOLDOUT,
+    workers: int = WORKERS,
+    observed: np.ndarray | None = None,
+) -> MMMResult:
+    """Grid-search adstock decays and ridge strength, then refit the winner on every day.
+
+    `spend` is (channels, days) on a dense daily calendar, so carry-over decays per
+    calendar day. `dates` and `revenue` are the days of it marked in the boolean
+    `observed` (every day by default); only those are regressed.
+    """
+    channels = list(channels)
+    y = np.asarray(revenue, dtype=float)
+    n = len(y)
+    train = max(int(round(n * (1 - holdout))), 2)
+    if train >= n - 1:
+        raise ValueError(f"Need more history for a holdout: {n} days")
+
+    spend = np.asarray(spend, dtype=float)
+    if observed is not None:
+        stock = adstock(spend, decays)[:, :, observed]
+        spend = spend[:, observed]
+    else:
+        stock = adstock(spend, decays)
+    # Standardize each adstocked series on the training window so one alpha grid fits all
+    scale = stock[:, :, :train].std(axis=2)
+    scale[scale == 0] = 1.0
+    stock_z = stock / scale[:, :, None]
+
+    combos = _combos(len(channels), len(decays))
+    alphas_arr = np.asarray(alphas, dtype=float)
+    chunks = [combos[i:i + CHUNK_COMBOS] for i in range(0, len(combos), CHUNK_COMBOS)]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        sse = np.concatenate(list(pool.map(lambda c: _score_chunk(stock_z, c, y, train, alphas_arr), chunks)))
+
+    b, a = np.unravel_index(np.argmin(sse), sse.shape)
+    sst_hold = ((y[train:] - y[train:].mean()) ** 2).sum()
+    holdout_r2 = float(1 - sse[b, a] / sst_hold) if sst_hold > 0 else 0.0
+
+    ch = np.arange(len(channels))
+    X_z = stock_z[ch, combos[b]].T  # (days, channels)
+    intercept, beta_z = _ridge(X_z, y, alphas_arr[a])
+    beta = beta_z / scale[ch, combos[b]]
+    X = stock[ch, combos[b]].T
+    contrib = X * beta
+    fitted = intercept + contrib.sum(axis=1)
+    sst = ((y - y.mean()) ** 2).sum()
+    r2 = float(1 - ((y - fitted) ** 2).sum() / sst) if sst > 0 else 0.0
+
+    decay = {c: float(decays[i]) for c, i in zip(channels, combos[b])}
+    fitted_df = pd.DataFrame({"date": dates, "revenue": y, "fitted": fitted, "baseline": intercept})
+    for i, c in enumerate(channels):
+        fitted_df[c] = contrib[:, i]
+    total_spend = spend.sum(axis=1)
+    total_contrib = contrib.sum(axis=0)
+    roi = np.zeros(len(channels))
+    np.divide(total_contrib, total_spend, out=roi, where=total_spend > 0)
+    summary = pd.DataFrame({
+        "channel": channels,
+        "decay": [decay[c] for c in channels],
+        "spend": total_spend,
+        "contribution": total_contrib,
+        "share": total_contrib / y.sum() if y.sum() else 0.0,
+        "roi": roi,
+    })
+    grid = pd.DataFrame(np.asarray(decays)[combos].repeat(len(alphas_arr), axis=0), columns=[f"decay_{c}" for c in channels])
+    grid["alpha"] = np.tile(alphas_arr, len(combos))
+    grid["holdout_sse"] = sse.ravel()
+    return MMMResult(channels, decay, float(alphas_arr[a]), intercept, dict(zip(channels, beta.tolist())), r2, holdout_r2,
+                     fitted_df, summary, grid)
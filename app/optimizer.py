@@ -0,0 +1,113 @@
+from __future__ import annotations
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from curves import CURVE_COLUMNS, CurveParams, curve_params, curve_slope, curve_value, peak_slope_spend
+
+# Budget reallocation over fitted response curves (see curves.py). The objective is
+#   sum_i w * R_i(s_i) - c * s_i   subject to   sum_i s_i <= budget,  lo_i <= s_i <= hi_i
+# with w = 1, c = 0 for revenue and w = gross margin, c = 1 for contribution after ads.
+# At the optimum every funded group has the same marginal return w * R_i'(s_i) = lambda,
+# so the solver bisects on lambda and, for each candidate, finds every group's spend at
+# once with a vectorized inner bisection on the diminishing part of its curve.
+
+OBJECTIVES = ("revenue", "contribution")
+# Bisection steps for the outer (lambda) and inner (per-group spend) searches
+ITERATIONS = 40
+
+
+class Allocation(NamedTuple):
+    table: pd.DataFrame  # input keys + spend, optimal_spend, change, revenue, optimal_revenue, marginal_roas
+    budget: float  # budget actually allocated (may be below the requested one, see allocate)
+    current_revenue: float
+    optimal_revenue: float
+    current_contribution: float
+    optimal_contribution: float
+
+
+def _spend_at(p: CurveParams, w: float, lam: float, lo: np.ndarray, hi: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """Each group's best spend in [lo, hi] when a unit of spend costs `lam`."""
+    a = np.minimum(np.maximum(lo, start), hi)
+    b = hi
+    slope_b = w * curve_slope(p, b)
+    s = np.where(slope_b >= lam, b, a)
+    todo = (w * curve_slope(p, a) > lam) & (slope_b < lam)
+    # Bisection on the decreasing part of the slope, all groups at once
+    left, right = a.copy(), b.copy()
+    for _ in range(ITERATIONS):
+        mid = 0.5 * (left + right)
+        above = w * curve_slope(p, mid) > lam
+        left = np.where(todo & above, mid, left)
+        right = np.where(todo & ~above, mid, right)
+    s = np.where(todo, 0.5 * (left + right), s)
+    # S-shaped curves can do better staying at the lower bound than climbing the hump
+    gain = w * (curve_value(p, s) - curve_value(p, lo)) - lam * (s - lo)
+    return np.where(gain > 0, s, lo)
+
+
+def allocate(
+    fits: pd.DataFrame,
+    budget: float,
+    objective: str = "revenue",
+    margin: float = 1.0,
+    lo: np.ndarray | None = None,
+    hi: np.ndarray | None = None,
+) -> Allocation:
+    """Split `budget` (daily spend) across the groups in `fits` to maximize the objective.
+
+    `lo`/`hi` bound each group's spend (default: 0 to twice its current spend). The budget
+    is clipped to what the bounds allow; for the contribution objective it is an upper
+    limit, and spend stops where another dollar would return less than a dollar of
+    gross profit.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; expected one of {OBJECTIVES}")
+    p = curve_params(fits)
+    current = fits["spend"].to_numpy(dtype=float)
+    lo = np.zeros(len(fits)) if lo is None else np.asarray(lo, dtype=float)
+    hi = 2.0 * current if hi is None else np.maximum(np.asarray(hi, dtype=float), lo)
+    w, cost = (1.0, 0.0) if objective == "revenue" else (float(margin), 1.0)
+    budget = float(np.clip(budget, lo.sum(), hi.sum()))
+    start = peak_slope_spend(p)
+
+    lam_lo = cost
+    s = _spend_at(p, w, lam_lo, lo, hi, start)
+    if s.sum() > budget:
+        # Raise the price of spend until the groups fit in the budget
+        lam_hi = max(float((w * curve_slope(p, np.maximum(lo, start))).max()), lam_lo) * 2 + 1.0
+        for _ in range(ITERATIONS):
+            lam = 0.5 * (lam_lo + lam_hi)
+            if _spend_at(p, w, lam, lo, hi, start).sum() > budget:
+                lam_lo = lam
+            else:
+                lam_hi = lam
+        s = _spend_at(p, w, lam_hi, lo, hi, start)
+        # Jumps from S-shaped curves can leave budget unspent; top up the best remaining slopes
+        room = budget - s.sum()
+        if room > 1e-9 * max(budget, 1.0):
+            head = np.maximum(hi - s, 0.0)
+            order = np.argsort(-(w * curve_slope(p, s)))
+            fill = np.clip(room - np.concatenate([[0.0], np.cumsum(head[order])[:-1]]), 0.0, head[order])
+            s[order] += fill
+
+    rev_now = curve_value(p, current)
+    rev_opt = curve_value(p, s)
+    keys = [c for c in fits.columns if c not in CURVE_COLUMNS]
+    table = fits[keys].assign(
+        spend=current,
+        optimal_spend=s,
+        change=s - current,
+        revenue=rev_now,
+        optimal_revenue=rev_opt,
+        marginal_roas=curve_slope(p, s),
+    )
+    return Allocation(
+        table,
+        float(s.sum()),
+        float(rev_now.sum()),
+        float(rev_opt.sum()),
+        float(margin * rev_now.sum() - current.sum()),
+        float(margin * rev_opt.sum() - s.sum()),
+    )
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import pickle
+import time
+from typing import Callable, Dict, Iterator, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+try:  # advisory locks between server processes; without them concurrent cold starts may build twice
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+# Dataset shared between Streamlit server processes (memory storage mode). The first
+# process to build a dataset version writes its large tables (the normalized marketing
+# rows, the materialized aggregates, the sketches) to Arrow IPC files, keyed like the disk
+# store by the data-dir fingerprint, plus a small pickle of everything else. Every process,
+# the builder included, then memory-maps the Arrow files read-only: numeric and date
+# columns, and text columns as Arrow-backed pandas strings, are views of the shared page
+# cache, so another worker costs little resident memory and starts without parsing any CSV.
+
+ROOT = Path(__file__).resolve().parents[1]
+SHARED_DIR = Path(os.environ.get("DATA_SHARED_DIR") or (ROOT / ".shared")).expanduser()
+# Bump when the layout of the files changes, so old files are never mapped
+FORMAT = 6
+# How long a process waits for another one that is building the same version
+LOCK_TIMEOUT = float(os.environ.get("DATA_SHARED_LOCK_SECONDS", "600"))
+
+Frames = Dict[str, pd.DataFrame]
+
+
+def shared_paths(data_dir: Path, fingerprint: str) -> Tuple[Path, Path]:
+    """(stem of the Arrow files, pickle of the rest) for one data-dir fingerprint."""
+    stem = SHARED_DIR / f"dataset_v{FORMAT}_{Path(data_dir).name}_{fingerprint}"
+    return stem, stem.with_name(f"{stem.name}.pkl")
+
+
+def _frame_path(stem: Path, name: str) -> Path:
+    return stem.with_name(f"{stem.name}.{name}.arrow")
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    # Text as large strings, the layout pandas' Arrow-backed strings use, so mapping
+    # them back needs no conversion; one contiguous chunk per column
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema = pa.schema([
+        f.with_type(pa.large_string()) if pa.types.is_string(f.type) else f for f in table.schema
+    ])
+    return table.cast(schema).combine_chunks()
+
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    # split_blocks keeps one array per column, so null-free numeric columns stay zero-copy;
+    # text columns wrap the mapped Arrow buffers as they are
+    return table.to_pandas(
+        split_blocks=True, self_destruct=False, types_mapper={pa.large_string(): pd.StringDtype("pyarrow")}.get
+    )
+
+
+def load(data_dir: Path, fingerprint: str) -> Tuple[Frames, object] | None:
+    """Map a shared dataset if one exists for `fingerprint`: (frames, derived), else None."""
+    stem, meta_path = shared_paths(data_dir, fingerprint)
+    if not meta_path.exists():
+        return None
+    try:
+        with open(meta_path, "rb") as f:
+            names, derived = pickle.load(f)
+        frames = {
+            name: _to_frame(pa.ipc.open_file(pa.memory_map(str(_frame_path(stem, name)), "r")).read_all())
+            for name in names
+        }
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError, pa.ArrowInvalid):
+        return None
+    return frames, derived
+
+
+def save(data_dir: Path, fingerprint: str, frames: Frames, derived: object, keep: int = 2) -> None:
+    """Write every file under a temp name and move it into place, the pickle last.
+
+    Readers only look for the pickle, so they never see a partial version.
+    """
+    stem, meta_path = shared_paths(data_dir, fingerprint)
+    stem.parent.mkdir(parents=True, exist_ok=True)
+    suffix = f".{os.getpid()}.tmp"
+    for name, df in frames.items():
+        path = _frame_path(stem, name)
+        tmp = path.with_name(path.name + suffix)
+        table = _to_table(df)
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    meta_tmp = meta_path.with_name(meta_path.name + suffix)
+    with open(meta_tmp, "wb") as f:
+        pickle.dump((list(frames), derived), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(meta_tmp, meta_path)
+    _prune(stem, keep)
+
+
+def _prune(current: Path, keep: int) -> None:
+    """Drop older versions for the same data dir, keeping the newest `keep`.
+
+    Processes that still map a removed file keep reading it; the space is freed when they let go.
+    """
+    prefix = current.name.rsplit("_", 1)[0] + "_"
+    old = sorted(
+        (p for p in current.parent.glob(f"{prefix}*.pkl") if p.name != f"{current.name}.pkl"),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for p in old[max(keep - 1, 0):]:
+        for f in current.parent.glob(f"{p.name[:-len('.pkl')]}.*"):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+
+@contextmanager
+def _build_lock(path: Path) -> Iterator[None]:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(path, "a") if fcntl is not None else None
+    except OSError:
+        f = None
+    if f is None:
+        yield
+        return
+    with f:
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    break  # build without the lock rather than hang
+                time.sleep(0.2)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def build_once(
+    data_dir: Path, fingerprint: str, build: Callable[[], Tuple[Frames, object]]
+) -> Tuple[Frames, object]:
+    """Map the shared dataset for `fingerprint`, building and writing it first if no process has.
+
+    `build` returns (frames, derived) and runs in at most one process per version while
+    the others wait for its files.
+    """
+    hit = load(data_dir, fingerprint)
+    if hit is not None:
+        return hit
+    stem, _ = shared_paths(data_dir, fingerprint)
+    with _build_lock(stem.with_name(f"{stem.name}.lock")):
+        hit = load(data_dir, fingerprint)
+        if hit is not None:
+            return hit
+        frames, derived = build()
+        try:
+            save(data_dir, fingerprint, frames, derived)
+        except OSError:
+            return frames, derived  # e.g. a read-only or full disk: serve this process's copy
+    # Serve the mapped copies so the parsed ones can be freed
+    return load(data_dir, fingerprint) or (frames, derived)
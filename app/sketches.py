@@ -0,0 +1,195 @@
+from __future__ import annotations
+import os
+from typing import Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Mergeable quantile sketches for the cost ratios (CPC, CPM). Each ratio is counted in
+# logarithmic buckets, as in DDSketch: bucket i holds values in (gamma^(i-1), gamma^i],
+# so a percentile read back from a bucket is within SKETCH_ACCURACY (relative) of the
+# exact one, and two sketches merge by adding their counts bucket by bucket. Ingest keeps
+# one sketch per group of each GRAINS table, much coarser than the rows; the percentiles
+# for a date range, filter set or grouping come from summing the counts of the smallest
+# table that covers them (see covering) rather than re-sorting the rows.
+
+SKETCH_ACCURACY = float(os.environ.get("SKETCH_ACCURACY", "0.01"))
+# name -> sketch keys, after the groupings and filters the pages use: per channel and day
+# for channel rows, per campaign and week for campaign rows (a date range takes its whole
+# weeks from there and sketches only the edge days, see split_range). Campaigns nest in a
+# tactic, so keeping it costs little; state is left out, as it would multiply the sketches.
+GRAINS = {
+    "channel_daily": ["date", "channel"],
+    "campaign_weekly": ["week", "channel", "tactic", "campaign"],
+}
+# ratio -> (numerator, denominator, scale); rows with a zero denominator are not counted
+SKETCH_METRICS = {"cpc": ("spend", "clicks", 1.0), "cpm": ("spend", "impressions", 1000.0)}
+QUANTILES = (0.5, 0.9, 0.99)
+# Zero has no logarithm; it gets a bucket below every positive one
+ZERO_BUCKET = np.iinfo(np.int32).min
+
+Sketches = Dict[str, pd.DataFrame]
+
+
+def _gamma(accuracy: float) -> float:
+    return (1 + accuracy) / (1 - accuracy)
+
+
+def bucket_index(values: np.ndarray, accuracy: float = SKETCH_ACCURACY) -> np.ndarray:
+    """Bucket of each non-negative value (ZERO_BUCKET for 0)."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, ZERO_BUCKET, dtype=np.int32)
+    pos = values > 0
+    out[pos] = np.ceil(np.log(values[pos]) / np.log(_gamma(accuracy)))
+    return out
+
+
+def bucket_value(index: np.ndarray, accuracy: float = SKETCH_ACCURACY) -> np.ndarray:
+    """Representative value of each bucket: within `accuracy` of anything counted in it."""
+    index = np.asarray(index)
+    g = _gamma(accuracy)
+    with np.errstate(over="ignore"):
+        values = 2 * np.power(g, index.astype(float)) / (g + 1)
+    return np.where(index == ZERO_BUCKET, 0.0, values)
+
+
+def empty_sketch(keys: Sequence[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        **{k: pd.Series(dtype="datetime64[ns]" if k in ("date", "week") else object) for k in keys},
+        "metric": pd.Series(dtype=object),
+        "bucket": pd.Series(dtype=np.int32),
+        "count": pd.Series(dtype=np.int64),
+    })
+
+
+def empty_sketches() -> Sketches:
+    return {name: empty_sketch(keys) for name, keys in GRAINS.items()}
+
+
+def merge(sketch: pd.DataFrame, by: Sequence[str]) -> pd.DataFrame:
+    """Sum bucket counts into one sketch per `by` group and metric, sorted by bucket."""
+    keys = list(by) + ["metric", "bucket"]
+    if sketch.empty:
+        return empty_sketch(by)[keys + ["count"]]
+    out = sketch.groupby(keys, as_index=False, sort=True, observed=True)["count"].sum()
+    return out.astype({"bucket": np.int32, "count": np.int64})
+
+
+def _combine_table(old: pd.DataFrame, new: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    if new.empty:
+        return old
+    if old.empty:
+        return new
+    if keys[0] == "date" and new["date"].iloc[0] > old["date"].iloc[-1]:
+        return pd.concat([old, new], ignore_index=True)
+    return merge(pd.concat([old, new], ignore_index=True), keys)
+
+
+def combine(old: Sketches, new: Sketches) -> Sketches:
+    """Merge two sets of GRAINS tables; per-day sketches for days after `old`'s last are appended as is."""
+    return {name: _combine_table(old[name], new[name], keys) for name, keys in GRAINS.items()}
+
+
+def week_start(dates: pd.Series) -> pd.Series:
+    """Monday starting each date's week (the `week` key)."""
+    return dates - pd.to_timedelta(dates.dt.dayofweek, unit="D")
+
+
+def split_range(span: tuple, start, end) -> Tuple[tuple | None, list[tuple]]:
+    """Split a date range into whole weeks and the edge days around them.
+
+    Returns ((first week, last week) or None, [(first day, last day), ...]). A week counts
+    as whole when the range holds every day of it within `span` (the data's first and last
+    day), so the weeks at either end of the history are whole under a range covering it.
+    """
+    one, week = pd.Timedelta(days=1), pd.Timedelta(days=7)
+    s, e = max(pd.Timestamp(start), span[0]), min(pd.Timestamp(end), span[1])
+    if s > e:
+        return None, []
+    first = s - pd.Timedelta(days=s.dayofweek)
+    if max(first, span[0]) < s:
+        first += week
+    last = e - pd.Timedelta(days=e.dayofweek)
+    if min(last + week - one, span[1]) > e:
+        last -= week
+    if first > last:
+        return None, [(s, e)]
+    edges = [(s, first - one)] if s < first else []
+    if last + week - one < e:
+        edges.append((last + week, e))
+    return (first, last), edges
+
+
+def _sketch_rows(df: pd.DataFrame, keys: list[str], accuracy: float) -> pd.DataFrame:
+    if "week" in keys:
+        df = df.assign(week=week_start(df["date"]))
+    parts = []
+    for metric, (num, den, scale) in SKETCH_METRICS.items():
+        d = df[den].to_numpy(dtype=float)
+        keep = d > 0
+        ratio = df[num].to_numpy(dtype=float)[keep] / d[keep] * scale
+        parts.append(df.loc[keep, keys].assign(metric=metric, bucket=bucket_index(ratio, accuracy), count=1))
+    return merge(pd.concat(parts, ignore_index=True), keys)
+
+
+def sketch(frames: Iterable[pd.DataFrame], keys: Sequence[str], accuracy: float = SKETCH_ACCURACY) -> pd.DataFrame:
+    """One sketch per `keys` group of every SKETCH_METRICS ratio, from marketing rows.
+
+    `frames` can be the rows in chunks (e.g. store.iter_rows); each chunk is reduced to
+    bucket counts before the next is read, and the chunks' counts are merged at the end.
+    Every row with a positive denominator counts once, whatever its volume.
+    """
+    keys = list(keys)
+    parts = [_sketch_rows(df, keys, accuracy) for df in frames if not df.empty]
+    if not parts:
+        return empty_sketch(keys)
+    return parts[0] if len(parts) == 1 else merge(pd.concat(parts, ignore_index=True), keys)
+
+
+def build(frames: Iterable[pd.DataFrame], accuracy: float = SKETCH_ACCURACY) -> Sketches:
+    """Every GRAINS table from marketing rows, given whole or in chunks."""
+    out = empty_sketches()
+    for df in frames:
+        if not df.empty:
+            out = combine(out, {name: _sketch_rows(df, keys, accuracy) for name, keys in GRAINS.items()})
+    return out
+
+
+def covering(sketches: Sketches, need: set[str]) -> pd.DataFrame | None:
+    """The smallest GRAINS table keyed by every column in `need`, or None if none is."""
+    tables = [sketches[name] for name, keys in GRAINS.items() if need <= set(keys)]
+    return min(tables, key=len) if tables else None
+
+
+def quantiles(
+    sketch: pd.DataFrame,
+    by: Sequence[str] = (),
+    qs: Sequence[float] = QUANTILES,
+    accuracy: float = SKETCH_ACCURACY,
+) -> pd.DataFrame:
+    """Approximate percentiles of each metric per `by` group, from merged sketches.
+
+    One row per group and metric with the group keys, metric, count (values sketched)
+    and a p<q> column per quantile, e.g. p50, p90, p99.
+    """
+    by = list(by)
+    cols = by + ["metric", "count"] + [f"p{q * 100:g}" for q in qs]
+    merged = merge(sketch, by)
+    if merged.empty:
+        return pd.DataFrame(columns=cols)
+    # Groups are contiguous and bucket-sorted, so one running total locates every rank
+    counts = merged["count"].to_numpy()
+    running = np.cumsum(counts)
+    group = merged.groupby(by + ["metric"], sort=False, observed=True).ngroup().to_numpy()
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    ends = np.r_[starts[1:], len(group)]
+    before = running[starts] - counts[starts]
+    totals = running[ends - 1] - before
+    out = merged.iloc[starts][by + ["metric"]].reset_index(drop=True)
+    out["count"] = totals
+    buckets = merged["bucket"].to_numpy()
+    for q, col in zip(qs, cols[len(by) + 2:]):
+        # The value of rank q * (n - 1) sits in the first bucket whose running count passes it
+        rank = before + np.floor(q * (totals - 1))
+        out[col] = bucket_value(buckets[np.searchsorted(running, rank, side="right")], accuracy)
+    return out
@@ -0,0 +1,227 @@
+from __future__ import annotations
+from contextlib import closing
+from pathlib import Path
+import os
+import sqlite3
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+import pandas as pd
+
+# Disk-backed marketing store: one SQLite file per data-dir fingerprint, indexed on
+# date, channel and state. Used when DATA_STORAGE=disk so the raw history never has
+# to fit in memory; views get aggregates back instead of rows.
+
+ROOT = Path(__file__).resolve().parents[1]
+STORE_DIR = Path(os.environ.get("DATA_STORE_DIR") or (ROOT / ".store")).expanduser()
+# Rows parsed and inserted per batch while building the store
+CHUNK_ROWS = 200_000
+
+DIMENSIONS = ("date", "channel", "tactic", "state", "campaign")
+METRICS = ("impressions", "clicks", "spend", "attributed_revenue")
+
+_SCHEMA = """
+CREATE TABLE marketing (
+    date TEXT NOT NULL,
+    channel TEXT,
+    tactic TEXT,
+    state TEXT,
+    campaign TEXT,
+    impressions REAL,
+    clicks REAL,
+    spend REAL,
+    attributed_revenue REAL
+)
+"""
+_INDEXES = (
+    "CREATE INDEX ix_marketing_date ON marketing(date)",
+    "CREATE INDEX ix_marketing_channel ON marketing(channel, date)",
+    "CREATE INDEX ix_marketing_state ON marketing(state, date)",
+)
+
+
+def store_path(data_dir: Path, fingerprint: str) -> Path:
+    return STORE_DIR / f"marketing_{Path(data_dir).name}_{fingerprint}.sqlite"
+
+
+def build(
+    path: Path,
+    sources: Iterable,
+    read: Callable[[object], Iterable[pd.DataFrame]],
+    keep: int = 2,
+    extra: Callable[[], Dict[str, pd.DataFrame]] | None = None,
+) -> Tuple[Path, bool]:
+    """Stream every channel source into a new store at `path`; returns (path, built).
+
+    `read(source)` yields a source's rows normalized to the marketing schema, in batches
+    (data._marketing_chunks reads CHUNK_ROWS at a time). After the rows are loaded,
+    `extra()` may return more tables to keep in the store (see read_table), e.g. results
+    gathered by `read` along the way. The file is written under a temp name and moved into
+    place, so readers in other processes never see a half-built store.
+
+    If a store already exists at `path` (built by another process, or before a restart),
+    it is reused as is: `built` is False and neither `read` nor `extra` is called, so
+    callers must get anything those would have produced from the store instead.
+    """
+    path = Path(path)
+    if path.exists():
+        return path, False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    if tmp.exists():
+        tmp.unlink()
+    cols = ", ".join(("date",) + DIMENSIONS[1:] + METRICS)
+    insert = f"INSERT INTO marketing ({cols}) VALUES ({', '.join('?' * (len(DIMENSIONS) + len(METRICS)))})"
+    with closing(sqlite3.connect(tmp)) as con:
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        con.execute(_SCHEMA)
+        for src in sources:
+            if not Path(src.path).exists():
+                continue
+            for df in read(src):
+                if df.empty:
+                    continue
+                df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+                con.executemany(insert, df[list(DIMENSIONS + METRICS)].itertuples(index=False, name=None))
+        # Indexes are cheaper to build once after the bulk load than to maintain per insert
+        for ddl in _INDEXES:
+            con.execute(ddl)
+        for name, df in (extra() if extra is not None else {}).items():
+            df.to_sql(name, con, index=False)
+        con.execute("ANALYZE")
+        con.commit()
+    os.replace(tmp, path)
+    _prune(path, keep)
+    return path, True
+
+
+def _prune(current: Path, keep: int) -> None:
+    """Drop older stores for the same data dir, keeping the newest `keep` files."""
+    prefix = current.name.rsplit("_", 1)[0] + "_"
+    old = sorted(
+        (p for p in current.parent.glob(f"{prefix}*.sqlite") if p != current),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for p in old[max(keep - 1, 0):]:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+def _connect(path: str | Path) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def _where(filters: dict | None) -> Tuple[str, list]:
+    clauses: list[str] = []
+    params: list = []
+    for key, col in (("channels", "channel"), ("tactics", "tactic"), ("states", "state")):
+        vals = (filters or {}).get(key) or []
+        if vals:
+            clauses.append(f"{col} IN ({', '.join('?' * len(vals))})")
+            params.extend(vals)
+    date_range = (filters or {}).get("date_range") or []
+    if len(date_range) == 2:
+        clauses.append("date BETWEEN ? AND ?")
+        params.extend(pd.to_datetime(d).strftime("%Y-%m-%d") for d in date_range)
+    return (("WHERE " + " AND ".join(clauses)) if clauses else ""), params
+
+
+def read_table(path: str | Path, name: str) -> pd.DataFrame | None:
+    """A table stored by build's `extra`, or None if this store has none by that name."""
+    with closing(_connect(path)) as con:
+        found = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [name]).fetchone()
+        return pd.read_sql_query(f'SELECT * FROM "{name}"', con) if found else None
+
+
+def aggregate(path: str | Path, by: Iterable[str], filters: dict | None = None) -> pd.DataFrame:
+    """SQL counterpart of data.aggregate_marketing: metric sums plus `rows`, grouped by `by`."""
+    by = list(by)
+    unknown = set(by) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Cannot group marketing store by {sorted(unknown)}")
+    where, params = _where(filters)
+    sums = ", ".join(f"COALESCE(SUM({m}), 0) AS {m}" for m in METRICS)
+    select = ", ".join(by + [sums, "COUNT(*) AS rows"])
+    sql = f"SELECT {select} FROM marketing {where}"
+    if by:
+        sql += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+    with closing(_connect(path)) as con:
+        df = pd.read_sql_query(sql, con, params=params)
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def iter_rows(path: str | Path, filters: dict | None = None, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Filtered rows in date order as frames of at most `chunk_rows`; at least one (maybe empty) frame."""
+    where, params = _where(filters)
+    sql = f"SELECT {', '.join(DIMENSIONS + METRICS)} FROM marketing {where} ORDER BY date, channel"
+    empty = True
+    with closing(_connect(path)) as con:
+        for df in pd.read_sql_query(sql, con, params=params, chunksize=chunk_rows):
+            df["date"] = pd.to_datetime(df["date"])
+            # An empty result comes back as object columns
+            df = df.astype({m: float for m in METRICS})
+            empty = False
+            yield df
+    if empty:
+        yield pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "date" else object if c in DIMENSIONS else float)
+                            for c in DIMENSIONS + METRICS})
+
+
+def dimension_catalog(path: str | Path, cols: Iterable[str]) -> pd.DataFrame:
+    """Rows, spend and date coverage per distinct value of each dimension (see data.build_catalog)."""
+    frames: list[pd.DataFrame] = []
+    with closing(_connect(path)) as con:
+        for col in cols:
+            if col not in DIMENSIONS:
+                raise ValueError(f"Unknown marketing dimension {col!r}")
+            frames.append(pd.read_sql_query(
+                f"SELECT '{col}' AS dimension, {col} AS value, COUNT(*) AS rows, "
+                f"COALESCE(SUM(spend), 0) AS spend, MIN(date) AS first_date, MAX(date) AS last_date "
+                f"FROM marketing WHERE {col} IS NOT NULL GROUP BY {col}",
+                con,
+            ))
+    df = pd.concat(frames, ignore_index=True)
+    for c in ("first_date", "last_date"):
+        df[c] = pd.to_datetime(df[c])
+    return df
+
+
+def duplicate_keys(path: str | Path, limit: int = 50) -> pd.DataFrame:
+    """Keys (date, channel, campaign, state) with more than one row, most repeated first."""
+    sql = (
+        "SELECT date, channel, campaign, state, COUNT(*) AS rows, SUM(spend) AS spend FROM marketing "
+        "GROUP BY date, channel, campaign, state HAVING COUNT(*) > 1 ORDER BY rows DESC, spend DESC LIMIT ?"
+    )
+    with closing(_connect(path)) as con:
+        df = pd.read_sql_query(sql, con, params=[limit])
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def cpc_outliers(path: str | Path, z: float = 3.0) -> pd.DataFrame | None:
+    """Rows whose CPC z-score exceeds `z`; mean and std come from one aggregate pass."""
+    with closing(_connect(path)) as con:
+        n, s1, s2 = con.execute(
+            "SELECT COUNT(*), SUM(spend / clicks), SUM((spend / clicks) * (spend / clicks)) "
+            "FROM marketing WHERE clicks > 0"
+        ).fetchone()
+        if not n:
+            return None
+        mean = s1 / n
+        std = max(s2 / n - mean * mean, 0.0) ** 0.5
+        if std == 0:
+            return None
+        df = pd.read_sql_query(
+            "SELECT date, channel, tactic, state, campaign, clicks, spend, spend / clicks AS cpc "
+            "FROM marketing WHERE clicks > 0 AND ABS(spend / clicks - ?) > ?",
+            con,
+            params=[mean, z * std],
+        )
+    df["date"] = pd.to_datetime(df["date"])
+    df["cpc_z"] = (df["cpc"] - mean) / std
+    return df
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 CHANNEL_COLORS = {
     "Facebook": "#4267B2",
     "Google": "#DB4437",
@@ -9,6 +11,35 @@ def color_for_channel(name: str) -> str:
     return CHANNEL_COLORS.get(name, "#888888")
 
 
+@lru_cache(maxsize=None)
+def apply_plotly_theme() -> None:
+    """Make a transparent variant of plotly_white the default template (once per process).
+
+    Deferred until a page draws charts; pages without charts never import Plotly.
+    """
+    import copy
+    import plotly.io as pio
+    import plotly.express as px
+
+    # Build transparent variants so charts blend with app background
+    base_light = pio.templates["plotly_white"] if "plotly_white" in pio.templates else None
+    if base_light is None:
+        return
+    _light = copy.deepcopy(base_light)
+    _light.layout.paper_bgcolor = "rgba(0,0,0,0)"
+    _light.layout.plot_bgcolor = "rgba(0,0,0,0)"
+    try:
+        _light.layout.font.family = "Inter, ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Helvetica Neue, Arial, Noto Sans, 'Apple Color Emoji', 'Segoe UI Emoji'"
+        _light.layout.font.color = "#0f172a"
+    except Exception:
+        pass
+    pio.templates["custom_light"] = _light
+    # Set Plotly defaults for light theme
+    pio.templates.default = "custom_light"
+    px.defaults.template = "custom_light"
+
+
+@lru_cache(maxsize=None)
 def apply_theme(name: str) -> str:
     # Add a flex row class for horizontal layout
     flex_row_css = """
@@ -26,34 +57,11 @@ def apply_theme(name: str) -> str:
     }
 }
 """
-    """Apply the light theme with transparent Plotly backgrounds and readable UI.
+    """Light theme CSS to inject via st.markdown.
 
-    Dark theme support removed by request. Always returns light CSS to inject via st.markdown.
+    Dark theme support removed by request. Chart styling lives in apply_plotly_theme, so
+    building the CSS does not import Plotly.
     """
-    import copy
-    import plotly.io as pio
-    import plotly.express as px
-
-    # Always use light theme
-    theme_name = "Light"
-
-    # Build transparent variants so charts blend with app background
-    base_light = pio.templates["plotly_white"] if "plotly_white" in pio.templates else None
-    _light = None
-    if base_light is not None:
-        _light = copy.deepcopy(base_light)
-        _light.layout.paper_bgcolor = "rgba(0,0,0,0)"
-        _light.layout.plot_bgcolor = "rgba(0,0,0,0)"
-        try:
-            _light.layout.font.family = "Inter, ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Helvetica Neue, Arial, Noto Sans, 'Apple Color Emoji', 'Segoe UI Emoji'"
-            _light.layout.font.color = "#0f172a"
-        except Exception:
-            pass
-        pio.templates["custom_light"] = _light
-    # Set Plotly defaults for light theme
-    if _light is not None:
-        pio.templates.default = "custom_light"
-        px.defaults.template = "custom_light"
     text = "#1D1D1F"          # Apple's dark text - nearly black but not quite
     bg = "#FFFFFF"            # Apple's clean white background
     bg2 = "#F5F5F7"           # Apple's subtle light gray for secondary backgrounds
@@ -0,0 +1,192 @@
+from __future__ import annotations
+import threading
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Ingest validation for marketing rows. The normalizer reports what it coerced or
+# dropped, and every normalized frame (a whole channel file, or one chunk of it in disk
+# mode) is checked with column-wise array operations while it is still in hand. Duplicate
+# keys are found from 64-bit row hashes of the key columns, so a pass over the full
+# history keeps 20 bytes per row instead of the rows themselves.
+
+KEY_COLUMNS = ["date", "channel", "campaign", "state"]
+METRICS = ["impressions", "clicks", "spend", "attributed_revenue"]
+# Most-duplicated keys listed in the report
+DUPLICATE_SAMPLE = 50
+
+ISSUE_COLUMNS = ["channel", "check", "column", "rows"]
+DUPLICATE_COLUMNS = KEY_COLUMNS + ["rows", "spend"]
+# Checks that drop the row; the others keep it (coerced to 0, or as-is)
+DROPPING_CHECKS = ("missing date", "invalid date")
+
+
+class ValidationReport(NamedTuple):
+    rows: int  # rows kept after normalization
+    issues: pd.DataFrame  # ISSUE_COLUMNS, one row per (channel, check, column) with a nonzero count
+    zeros: pd.Series  # per metric, over kept rows
+    duplicate_rows: int  # rows repeating an earlier row's key (the extra copies)
+    duplicate_spend: float  # spend on those extra copies, double counted in every aggregate
+    duplicates: pd.DataFrame  # DUPLICATE_COLUMNS, the most repeated keys (filled in by the caller)
+
+    @property
+    def dropped(self) -> int:
+        return int(self.issues.loc[self.issues["check"].isin(DROPPING_CHECKS), "rows"].sum())
+
+    def count(self, check: str) -> int:
+        return int(self.issues.loc[self.issues["check"] == check, "rows"].sum())
+
+
+class ValidatorState(NamedTuple):
+    """What an IngestValidator has accumulated, to resume checking rows appended later."""
+
+    counts: dict
+    zeros: np.ndarray
+    rows: int
+    channels: list
+    hashes: np.ndarray
+    spend: np.ndarray
+    channel_ids: np.ndarray
+
+
+def empty_report() -> ValidationReport:
+    return ValidationReport(
+        0, pd.DataFrame(columns=ISSUE_COLUMNS), pd.Series(0, index=METRICS, name="zeros"), 0, 0.0,
+        pd.DataFrame(columns=DUPLICATE_COLUMNS),
+    )
+
+
+def report_tables(report: ValidationReport) -> dict[str, pd.DataFrame]:
+    """The report as plain tables, for a disk store to keep (see store.build's `extra`).
+
+    `duplicates` is left out: the caller lists those from the stored rows.
+    """
+    totals = {"rows": report.rows, "duplicate_rows": report.duplicate_rows, "duplicate_spend": report.duplicate_spend}
+    totals.update({f"zeros_{m}": int(report.zeros[m]) for m in METRICS})
+    issues = report.issues if not report.issues.empty else pd.DataFrame(
+        {c: pd.Series(dtype=np.int64 if c == "rows" else object) for c in ISSUE_COLUMNS}
+    )
+    return {"validation_totals": pd.DataFrame([totals]), "validation_issues": issues}
+
+
+def report_from_tables(totals: pd.DataFrame, issues: pd.DataFrame) -> ValidationReport:
+    """Inverse of report_tables."""
+    t = totals.iloc[0]
+    zeros = pd.Series([int(t[f"zeros_{m}"]) for m in METRICS], index=METRICS, name="zeros")
+    return ValidationReport(
+        int(t["rows"]), issues[ISSUE_COLUMNS].astype({"rows": np.int64}), zeros, int(t["duplicate_rows"]),
+        float(t["duplicate_spend"]), pd.DataFrame(columns=DUPLICATE_COLUMNS),
+    )
+
+
+def coercion_counts(raw: pd.Series, parsed: pd.Series) -> tuple[int, int]:
+    """(missing, unparseable) values of `raw` given its coerced `parsed` version."""
+    missing = raw.isna().to_numpy()
+    failed = parsed.isna().to_numpy()
+    return int(missing.sum()), int((failed & ~missing).sum())
+
+
+def key_hashes(df: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(df[KEY_COLUMNS], index=False).to_numpy()
+
+
+class IngestValidator:
+    """Accumulates checks over the frames of one ingest; `report()` summarizes them.
+
+    Safe to feed from the parallel channel readers. Started from a `state()` of an earlier
+    validator, it carries on from those rows, so appended rows are checked against them.
+    """
+
+    def __init__(self, state: ValidatorState | None = None):
+        self._lock = threading.Lock()
+        self._counts: dict[tuple[str, str, str], int] = {}
+        self._zeros = np.zeros(len(METRICS), dtype=np.int64)
+        self._rows = 0
+        self._channels: list[str] = []
+        self._hashes: list[np.ndarray] = []
+        self._spend: list[np.ndarray] = []
+        self._channel_ids: list[np.ndarray] = []
+        if state is not None:
+            self._counts = dict(state.counts)
+            self._zeros = state.zeros.copy()
+            self._rows = state.rows
+            self._channels = list(state.channels)
+            self._hashes, self._spend, self._channel_ids = [state.hashes], [state.spend], [state.channel_ids]
+
+    def _bump(self, channel: str, check: str, column: str, n: int) -> None:
+        if n:
+            key = (channel, check, column)
+            self._counts[key] = self._counts.get(key, 0) + int(n)
+
+    def parsed(self, channel: str, column: str, missing: int, invalid: int) -> None:
+        """Record values the normalizer could not use for `column` (see coercion_counts)."""
+        with self._lock:
+            if column == "date":
+                self._bump(channel, "missing date", column, missing)
+                self._bump(channel, "invalid date", column, invalid)
+            else:
+                self._bump(channel, "missing value", column, missing)
+                self._bump(channel, "non-numeric", column, invalid)
+
+    def add(self, df: pd.DataFrame, channel: str) -> None:
+        """Range checks and key hashes for one normalized frame of `channel`."""
+        if df.empty:
+            return
+        values = df[METRICS].to_numpy(dtype=float)
+        negative = (values < 0).sum(axis=0)
+        zeros = (values == 0).sum(axis=0)
+        over = int((df["clicks"].to_numpy() > df["impressions"].to_numpy()).sum())
+        hashes = key_hashes(df)
+        spend = df["spend"].to_numpy(dtype=float)
+        with self._lock:
+            for col, n in zip(METRICS, negative):
+                self._bump(channel, "negative", col, n)
+            self._bump(channel, "clicks > impressions", "clicks", over)
+            self._zeros += zeros
+            self._rows += len(df)
+            if channel not in self._channels:
+                self._channels.append(channel)
+            self._hashes.append(hashes)
+            self._spend.append(spend)
+            self._channel_ids.append(np.full(len(df), self._channels.index(channel), dtype=np.int32))
+
+    def state(self) -> ValidatorState:
+        with self._lock:
+            def cat(parts: list[np.ndarray], dtype) -> np.ndarray:
+                return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+            return ValidatorState(
+                dict(self._counts), self._zeros.copy(), self._rows, list(self._channels),
+                cat(self._hashes, np.uint64), cat(self._spend, float), cat(self._channel_ids, np.int32),
+            )
+
+    def report(self) -> ValidationReport:
+        with self._lock:
+            counts = dict(self._counts)
+            if self._hashes:
+                hashes = np.concatenate(self._hashes)
+                extra = pd.Series(hashes).duplicated(keep="first").to_numpy()
+                spend = np.concatenate(self._spend)
+                per_channel = np.bincount(np.concatenate(self._channel_ids)[extra], minlength=len(self._channels))
+            else:
+                extra, spend, per_channel = np.zeros(0, dtype=bool), np.zeros(0), []
+            for channel, n in zip(self._channels, per_channel):
+                counts[(channel, "duplicate key", ", ".join(KEY_COLUMNS))] = int(n)
+            issues = pd.DataFrame(
+                [(*k, n) for k, n in counts.items() if n], columns=ISSUE_COLUMNS
+            ).sort_values(["channel", "check", "column"], ignore_index=True)
+            return ValidationReport(
+                self._rows, issues, pd.Series(self._zeros, index=METRICS, name="zeros"),
+                int(extra.sum()), float(spend[extra].sum()), pd.DataFrame(columns=DUPLICATE_COLUMNS),
+            )
+
+
+def duplicate_keys(df: pd.DataFrame, limit: int = DUPLICATE_SAMPLE) -> pd.DataFrame:
+    """The `limit` keys with the most rows among those appearing more than once."""
+    dup = df.loc[df.duplicated(KEY_COLUMNS, keep=False), KEY_COLUMNS + ["spend"]]
+    if dup.empty:
+        return pd.DataFrame(columns=DUPLICATE_COLUMNS)
+    out = dup.groupby(KEY_COLUMNS, sort=False).agg(rows=("spend", "size"), spend=("spend", "sum")).reset_index()
+    return out.sort_values(["rows", "spend"], ascending=False).head(limit).reset_index(drop=True)
+
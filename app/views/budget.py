@@ -0,0 +1,88 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from theme import CHANNEL_COLORS
+import data as data_mod
+from curves import RECENT_DAYS
+from optimizer import allocate
+
+
+@st.fragment
+def _optimizer(fits: pd.DataFrame, keys: list[str], margin: float):
+    # The whole optimizer is a fragment, so editing the budget reruns only this section
+    current_total = float(fits["spend"].sum())
+    c1, c2, c3 = st.columns(3)
+    budget = c1.number_input("Daily budget ($)", min_value=0.0, value=round(current_total, 2), step=max(round(current_total / 100, 0), 1.0))
+    objective = c2.radio("Maximize", options=["Revenue", "Contribution after ads"], horizontal=True)
+    max_change = c3.slider("Max change per group (±%)", min_value=10, max_value=300, value=100, step=10)
+
+    current = fits["spend"].to_numpy()
+    lo = current * max(0.0, 1 - max_change / 100)
+    hi = current * (1 + max_change / 100)
+    result = allocate(fits, budget, "revenue" if objective == "Revenue" else "contribution", margin, lo, hi)
+    if result.budget < budget - 0.5:
+        st.info(f"Only ${result.budget:,.0f}/day can be placed: the per-group limits cap spend, or more spend would lose money.")
+    elif result.budget > budget + 0.5:
+        st.info(f"Per-group minimums need at least ${result.budget:,.0f}/day.")
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Allocated spend / day", f"${result.budget:,.0f}", delta=f"{result.budget - current_total:+,.0f}")
+    m2.metric("Predicted revenue / day", f"${result.optimal_revenue:,.0f}", delta=f"{result.optimal_revenue - result.current_revenue:+,.0f}")
+    m3.metric("Contribution after ads / day", f"${result.optimal_contribution:,.0f}",
+              delta=f"{result.optimal_contribution - result.current_contribution:+,.0f}",
+              help=f"Gross margin {margin:.1%} × predicted revenue − spend")
+
+    table = result.table.copy()
+    table["group"] = table[keys].astype(str).agg(" · ".join, axis=1)
+    top = table.nlargest(25, "spend")
+    bars = top.melt(id_vars=["group", "channel"], value_vars=["spend", "optimal_spend"], var_name="allocation", value_name="daily_spend")
+    bars["allocation"] = bars["allocation"].map({"spend": "Current", "optimal_spend": "Optimized"})
+    fig = px.bar(bars, x="group", y="daily_spend", color="allocation", barmode="group", title="Daily spend: current vs. optimized",
+                 color_discrete_map={"Current": "#cbd5e1", "Optimized": "#0f172a"}, template=px.defaults.template)
+    fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", xaxis_title=None)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        table[keys + ["spend", "optimal_spend", "change", "revenue", "optimal_revenue", "marginal_roas"]]
+        .sort_values("change", ascending=False)
+        .rename(columns={
+            "channel": "Channel",
+            "tactic": "Tactic",
+            "campaign": "Campaign",
+            "spend": "Current spend",
+            "optimal_spend": "Optimized spend",
+            "change": "Change",
+            "revenue": "Predicted revenue (current)",
+            "optimal_revenue": "Predicted revenue (optimized)",
+            "marginal_roas": "Marginal ROAS",
+        }),
+        use_container_width=True,
+    )
+
+
+def render(filters: dict):
+    st.subheader("Budget Optimizer")
+    st.caption("Reallocate daily spend across channels, tactics, or campaigns using their fitted response curves")
+
+    level = st.selectbox("Allocate across", options=list(data_mod.CURVE_LEVELS), index=0)
+    keys = data_mod.CURVE_LEVELS[level]
+    fits = data_mod.response_curves(level)
+    channels = (filters or {}).get("channels") or []
+    if channels:
+        fits = fits[fits["channel"].isin(channels)]
+    fits = fits[fits["spend"] > 0].reset_index(drop=True)
+    if fits.empty:
+        st.warning("No groups with recent spend for the selected filters.")
+        return
+
+    _optimizer(fits, keys, data_mod.recent_gross_margin())
+
+    with st.expander("Metrics & Interpretation", expanded=False):
+        st.write(
+            f"""
+            - Current spend is each group's average daily spend over the last {RECENT_DAYS} days; the optimizer moves that budget between groups.
+            - At the optimum every funded group has the same marginal ROAS. Spend moves from groups whose next dollar returns little to groups where it returns more.
+            - Contribution after ads uses the recent business gross margin. Spend stops where a dollar no longer returns a dollar of gross profit, so some budget can stay unspent.
+            - The per-group limit keeps recommendations near spend levels the curves were fitted on. Predictions far outside them are extrapolation.
+            """
+        )
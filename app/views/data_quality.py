@@ -1,42 +1,76 @@
 import streamlit as st
 import pandas as pd
+import aggregates
+import data as data_mod
+import sketches
+
+
+@st.fragment
+def _campaign_alerts():
+    # A fragment, so changing the window reruns only the alert table
+    days = st.selectbox("Alerts from the last", [1, 7, 14, 28], index=1, format_func=lambda d: f"{d} day(s)")
+    alerts = data_mod.anomaly_alerts(days=days)
+    if alerts.empty:
+        st.success("No spend, CTR, CPC or ROAS alerts in this window.")
+        return
+    st.caption(f"{len(alerts):,} alerts, most severe first. Severity is |z| / 4 or CUSUM / 6, whichever is larger.")
+    st.dataframe(alerts, use_container_width=True, hide_index=True)
 
 
 def render():
     st.subheader("Data Quality")
-    if "marketing_df" not in st.session_state or "business_df" not in st.session_state:
+    if "business_df" not in st.session_state:
         st.info("Data not loaded yet. Visit Executive Summary first or reload.")
         return
 
-    m = st.session_state["marketing_df"].copy()
+    m_stats = data_mod.marketing_quality_stats()
     b = st.session_state["business_df"].copy()
 
     # Coverage
     st.markdown("### Coverage")
-    m_dates = (m["date"].min(), m["date"].max()) if not m.empty else (None, None)
+    m_dates = (m_stats["min_date"], m_stats["max_date"])
     b_dates = (b["date"].min(), b["date"].max()) if not b.empty else (None, None)
     c1, c2, c3 = st.columns(3)
     with c1:
-        st.metric("Marketing rows", f"{len(m):,}")
+        st.metric("Marketing rows", f"{m_stats['rows']:,}")
     with c2:
         st.metric("Business rows", f"{len(b):,}")
     with c3:
         st.write(f"Marketing date range: {m_dates[0]} → {m_dates[1]}")
         st.write(f"Business date range: {b_dates[0]} → {b_dates[1]}")
 
+    # Ingest validation: recorded once per dataset version while the files were parsed
+    st.markdown("### Ingest Validation")
+    report = data_mod.validation_report()
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.metric("Rows dropped (bad date)", f"{report.dropped:,}")
+    with c2:
+        st.metric("Values coerced to 0", f"{report.count('missing value') + report.count('non-numeric'):,}")
+    with c3:
+        st.metric("Range violations", f"{report.count('negative') + report.count('clicks > impressions'):,}")
+    with c4:
+        st.metric("Duplicate rows", f"{report.duplicate_rows:,}", help="Rows repeating an earlier (date, channel, campaign, state)")
+    if report.duplicate_rows:
+        st.warning(
+            f"{report.duplicate_rows:,} duplicate rows add ${report.duplicate_spend:,.0f} of spend that is counted twice in every aggregate."
+        )
+        st.dataframe(report.duplicates, use_container_width=True, hide_index=True)
+    if report.issues.empty:
+        st.success("No validation issues found at ingest.")
+    else:
+        st.dataframe(report.issues, use_container_width=True, hide_index=True)
+
     # Nulls & zeros
     st.markdown("### Nulls & Zeros")
-    num_cols_m = ["impressions", "clicks", "spend", "attributed_revenue"]
-    nulls_m = m[num_cols_m].isna().sum().rename("nulls")
-    zeros_m = (m[num_cols_m] == 0).sum().rename("zeros")
-    dq_m = pd.concat([nulls_m, zeros_m], axis=1)
+    dq_m = pd.concat([m_stats["nulls"], m_stats["zeros"]], axis=1)
     num_cols_b = ["orders", "new_orders", "new_customers", "total_revenue", "gross_profit", "cogs"]
     nulls_b = b[num_cols_b].isna().sum().rename("nulls")
     zeros_b = (b[num_cols_b] == 0).sum().rename("zeros")
     dq_b = pd.concat([nulls_b, zeros_b], axis=1)
     col1, col2 = st.columns(2)
     with col1:
-        st.write("Marketing numeric columns:")
+        st.write("Marketing numeric columns (nulls: missing or non-numeric values coerced to 0):")
         st.dataframe(dq_m)
     with col2:
         st.write("Business numeric columns:")
@@ -44,7 +78,7 @@ def render():
 
     # Reconciliation: platform attributed revenue vs business revenue
     st.markdown("### Revenue Reconciliation")
-    platform_attr_rev = float(m["attributed_revenue"].sum()) if not m.empty else 0.0
+    platform_attr_rev = m_stats["attributed_revenue"]
     business_rev = float(b["total_revenue"].sum()) if not b.empty else 0.0
     delta = business_rev - platform_attr_rev
     c1, c2, c3 = st.columns(3)
@@ -57,39 +91,46 @@ def render():
 
     st.caption("Note: Platform-attributed revenue and business revenue measure different things. We show both for transparency.")
 
+    # Percentiles: the spread the CPC z-scores below are measured against
+    st.markdown("### Cost Percentiles by Channel")
+    pct = aggregates.cost_percentiles()
+    if pct.empty:
+        st.info("No rows with clicks or impressions.")
+    else:
+        st.dataframe(pct, use_container_width=True, hide_index=True)
+
     # Outliers: CPC z-score > 3 by campaign-date (using marketing data)
     st.markdown("### Outliers (CPC z-score > 3)")
-    if m.empty:
+    if m_stats["rows"] == 0:
         st.info("No marketing data to evaluate outliers.")
     else:
-        mm = m.copy()
-        mm["cpc"] = mm.apply(lambda r: (r["spend"] / r["clicks"]) if r["clicks"] else 0.0, axis=1)
-        # compute z-scores on rows with clicks>0
-        valid = mm[mm["clicks"] > 0].copy()
-        if valid.empty:
-            st.info("No rows with clicks > 0 to compute CPC outliers.")
+        # z-scores are computed on rows with clicks > 0
+        outliers = data_mod.cpc_outliers(z=3.0)
+        if outliers is None:
+            st.info("No rows with clicks > 0, or CPC standard deviation is zero; no outliers.")
+        elif outliers.empty:
+            st.success("No CPC outliers detected (|z| <= 3).")
         else:
-            mean_cpc = valid["cpc"].mean()
-            std_cpc = valid["cpc"].std(ddof=0)
-            if std_cpc == 0 or pd.isna(std_cpc):
-                st.info("CPC standard deviation is zero; no outliers.")
-            else:
-                valid["cpc_z"] = (valid["cpc"] - mean_cpc) / std_cpc
-                outliers = valid[valid["cpc_z"].abs() > 3][["date", "channel", "tactic", "state", "campaign", "clicks", "spend", "cpc", "cpc_z"]]
-                if outliers.empty:
-                    st.success("No CPC outliers detected (|z| <= 3).")
-                else:
-                    st.dataframe(outliers.sort_values("cpc_z", key=lambda s: s.abs(), ascending=False), use_container_width=True)
+            st.dataframe(outliers.sort_values("cpc_z", key=lambda s: s.abs(), ascending=False), use_container_width=True)
+
+    # Control charts: per-campaign EWMA baseline with CUSUM drift detection
+    st.markdown("### Campaign Alerts (EWMA / CUSUM)")
+    if m_stats["rows"] == 0:
+        st.info("No marketing data to chart.")
+    else:
+        _campaign_alerts()
 
     with st.expander("Metrics & Interpretation", expanded=False):
         st.markdown('<style>.metrics-header {font-size: 18px !important; font-weight: 500 !important;}</style>', unsafe_allow_html=True)
         st.write(
-            """
+            f"""
             - Coverage: confirm both data sources align in date ranges and record counts.
+            - Ingest validation: rows with missing or unparseable dates are dropped and non-numeric metrics become 0; negative values, clicks above impressions and repeated (date, channel, campaign, state) keys are kept but flagged, since duplicates double-count spend.
             - Nulls & Zeros: zeros may be legitimate but spikes can indicate tracking or ingestion issues.
             - Revenue reconciliation: large sustained deltas could signal attribution or accounting differences; investigate methodology.
+            - Cost percentiles: p50/p90/p99 of daily CPC and CPM per channel over the full history, approximate to within {sketches.SKETCH_ACCURACY:.0%} (merged from per-day sketches). A p99 many times the p50 usually points at low-click days or tracking gaps.
             - CPC outliers: extreme CPC spikes often trace to delivery anomalies, limited audience, or reporting glitches.
-            - To export data or charts, use the Export Data button in the header.
+            - Campaign alerts: each campaign's daily spend, CTR, CPC and ROAS is tracked against its own moving baseline. Single-day spikes (|z| > 4) and sustained drifts (CUSUM) are flagged; the same table is available headless via `python app/anomalies.py`.
+            - To export filtered rows or a page's table as CSV or Parquet, use Export data in the sidebar.
             """
         )
-    # Export note removed; exports not available.
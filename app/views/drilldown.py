@@ -2,53 +2,13 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from theme import CHANNEL_COLORS
+import aggregates
+import sketches
 
 
-def _apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    channels = filters.get("channels") or []
-    tactics = filters.get("tactics") or []
-    states = filters.get("states") or []
-    date_range = filters.get("date_range") or []
-
-    if channels:
-        out = out[out["channel"].isin(channels)]
-    if tactics:
-        out = out[out["tactic"].isin(tactics)]
-    if states:
-        out = out[out["state"].isin(states)]
-    if len(date_range) == 2:
-        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        out = out[(out["date"] >= start) & (out["date"] <= end)]
-    return out
-
-
-def render(filters: dict):
-    st.subheader("Drilldown")
-    st.caption("Explore performance by channel, tactic, state, and campaign")
-
-    # Expect marketing data injected via session_state by main
-    if "marketing_df" not in st.session_state:
-        st.info("Data not loaded yet. Visit Executive Summary first or reload.")
-        return
-
-    df = st.session_state["marketing_df"]
-    df = _apply_filters(df, filters)
-    if df is None or df.empty:
-        st.warning("No data for selected filters.")
-        return
-
-    # Channel bar charts
-    ch = df.groupby("channel", as_index=False).agg({
-        "spend": "sum",
-        "attributed_revenue": "sum",
-        "impressions": "sum",
-        "clicks": "sum",
-    })
-    ch["roas"] = ch.apply(lambda r: (r["attributed_revenue"] / r["spend"]) if r["spend"] else 0.0, axis=1)
-
+# Page sections are fragments: each can rerun on its own without re-executing the whole app
+@st.fragment
+def _channel_charts(ch: pd.DataFrame):
     c1, c2 = st.columns(2)
     with c1:
         df_sorted = ch.sort_values("spend", ascending=False)
@@ -63,20 +23,11 @@ def render(filters: dict):
         fig.update_traces(marker_color=[CHANNEL_COLORS.get(c, "#888888") for c in df_sorted["channel"]])
         fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
         st.plotly_chart(fig, use_container_width=True)
-        
 
-    # Campaign table
-    st.markdown("### Campaigns")
-    camp = df.groupby(["channel", "tactic", "state", "campaign"], as_index=False).agg({
-        "impressions": "sum",
-        "clicks": "sum",
-        "spend": "sum",
-        "attributed_revenue": "sum",
-    })
-    camp["ctr"] = camp.apply(lambda r: (r["clicks"] / r["impressions"]) if r["impressions"] else 0.0, axis=1)
-    camp["cpc"] = camp.apply(lambda r: (r["spend"] / r["clicks"]) if r["clicks"] else 0.0, axis=1)
-    camp["cpm"] = camp.apply(lambda r: (1000 * r["spend"] / r["impressions"]) if r["impressions"] else 0.0, axis=1)
-    camp["roas"] = camp.apply(lambda r: (r["attributed_revenue"] / r["spend"]) if r["spend"] else 0.0, axis=1)
+
+@st.fragment
+def _campaign_table(filters: dict):
+    camp = aggregates.campaign_table(filters)
     st.dataframe(
         camp.sort_values(["channel", "spend"], ascending=[True, False])
         .rename(columns={
@@ -95,6 +46,46 @@ def render(filters: dict):
         }),
         use_container_width=True,
     )
+
+
+@st.fragment
+def _cost_percentiles(filters: dict):
+    level = st.radio("Percentiles by", ["Channel", "Campaign"], horizontal=True)
+    by = ("channel",) if level == "Channel" else ("channel", "campaign")
+    pct = aggregates.cost_percentiles(filters, by=by)
+    if pct.empty:
+        st.info("No rows with clicks or impressions for the selected filters.")
+        return
+    st.dataframe(
+        pct.rename(columns={
+            "channel": "Channel",
+            "campaign": "Campaign",
+            **{f"{m}_p{q}": f"{m.upper()} p{q}" for m in ("cpc", "cpm") for q in (50, 90, 99)},
+        }),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def render(filters: dict):
+    st.subheader("Drilldown")
+    st.caption("Explore performance by channel, tactic, state, and campaign")
+
+    # Channel bar charts
+    ch = aggregates.channel_breakdown(filters)
+    if ch.empty:
+        st.warning("No data for selected filters.")
+        return
+    _channel_charts(ch)
+
+    # Campaign table
+    st.markdown("### Campaigns")
+    _campaign_table(filters)
+
+    # Cost distribution: merged from per-day sketches, so any range avoids sorting rows
+    st.markdown("### Cost percentiles")
+    st.caption(f"Daily CPC and CPM per row, approximate to within {sketches.SKETCH_ACCURACY:.0%}.")
+    _cost_percentiles(filters)
     with st.expander("Metrics & Interpretation", expanded=False):
         st.markdown('<style>.metrics-header {font-size: 18px !important; font-weight: 500 !important;}</style>', unsafe_allow_html=True)
         st.write("""
@@ -108,6 +99,6 @@ def render(filters: dict):
         - Start with the Channel bars to see where budget concentrates and which channels return the most (Attributed ROAS).
         - Use the Campaigns table to drill into tactics, states, or campaigns driving performance shifts.
         - CTR, CPC, CPM help diagnose whether issues are from funnel top (impressions/CTR), mid (CPC), or bottom (ROAS).
+        - Cost percentiles show the spread behind the averages: a p90 or p99 far above p50 means a few expensive days or placements are pulling the mean up.
         
         """)
-    # Export note removed; exports not available.
@@ -1,50 +1,81 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from theme import CHANNEL_COLORS
+import data as data_mod
+from metrics import safe_divide
 
+MAP_SCALES = {"spend": "Blues", "roas": "Tealrose"}
+MAP_HOVER = {"spend": "$%{z:,.0f}", "roas": "%{z:.2f}"}
 
-def _apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    channels = filters.get("channels") or []
-    tactics = filters.get("tactics") or []
-    states = filters.get("states") or []
-    date_range = filters.get("date_range") or []
-    if channels:
-        out = out[out["channel"].isin(channels)]
-    if tactics:
-        out = out[out["tactic"].isin(tactics)]
-    if states:
-        out = out[out["state"].isin(states)]
-    if len(date_range) == 2:
-        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        out = out[(out["date"] >= start) & (out["date"] <= end)]
-    return out
 
+def _animated_map(filters: dict, grain: str, metric: str) -> go.Figure | None:
+    """Choropleth stepping through periods; each frame carries only that period's z values.
 
-def render(filters: dict):
-    st.subheader("Geo & Tactic")
-    if "marketing_df" not in st.session_state:
-        st.info("Data not loaded yet. Visit Executive Summary first or reload.")
-        return
+    Locations, color scale and range are set once on the base trace, so the payload per
+    period is one row of the state x period matrix.
+    """
+    sp = data_mod.state_periods(grain, filters)
+    if not len(sp.periods):
+        return None
+    values = getattr(sp, metric)
+    # Blank rather than zero-colored where a state had no spend that period
+    z = pd.DataFrame(values).where(sp.spend > 0).round(2)
+    rows = [[None if pd.isna(v) else v for v in row] for row in z.itertuples(index=False)]
+    labels = list(sp.periods.strftime("%Y-%m-%d"))
+    zmax = float(z.max().max()) if z.notna().any().any() else 1.0
+    fig = go.Figure(
+        data=[go.Choropleth(
+            locations=sp.states,
+            z=rows[0],
+            locationmode="USA-states",
+            zmin=0,
+            zmax=zmax,
+            colorscale=MAP_SCALES[metric],
+            colorbar_title=metric.upper(),
+            hovertemplate=f"%{{location}}: {MAP_HOVER[metric]}<extra></extra>",
+        )],
+        frames=[go.Frame(name=label, data=[go.Choropleth(z=row)], traces=[0]) for label, row in zip(labels, rows)],
+    )
+    step = {"frame": {"duration": 700, "redraw": True}, "mode": "immediate", "transition": {"duration": 0}}
+    fig.update_layout(
+        title=f"US map: {metric.upper()} by state, {grain.lower()} by {grain.lower()}",
+        template=px.defaults.template,
+        geo_scope="usa",
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        updatemenus=[{
+            "type": "buttons",
+            "showactive": False,
+            "x": 0.0,
+            "y": 0.0,
+            "xanchor": "right",
+            "yanchor": "top",
+            "buttons": [
+                {"label": "Play", "method": "animate", "args": [None, {**step, "fromcurrent": True}]},
+                {"label": "Pause", "method": "animate", "args": [[None], {**step, "frame": {"duration": 0, "redraw": False}}]},
+            ],
+        }],
+        sliders=[{
+            "currentvalue": {"prefix": f"{grain} of "},
+            "steps": [{"label": label, "method": "animate", "args": [[label], step]} for label in labels],
+        }],
+    )
+    return fig
 
-    df = st.session_state["marketing_df"]
-    df = _apply_filters(df, filters)
-    if df.empty:
-        st.warning("No data for selected filters.")
-        return
 
-    # Options
-    st.sidebar.markdown("### Geo options")
-    map_mode = st.sidebar.selectbox("State view", options=["Bars", "US Map"], index=0)
-    map_metric = st.sidebar.selectbox("Metric for map", options=["spend", "roas"], index=0)
+@st.fragment
+def _state_view(state_grp: pd.DataFrame, filters: dict):
+    # Options live inside the fragment (not the sidebar) so switching them reruns only this section
+    o1, o2, o3 = st.columns(3)
+    map_mode = o1.selectbox("State view", options=["Bars", "US Map", "Animated map"], index=0)
+    map_metric = o2.selectbox("Metric for map", options=["spend", "roas"], index=0, disabled=(map_mode == "Bars"))
+    grains = list(data_mod.ROLLUP_GRAINS)
+    grain = o3.selectbox("Animation step", options=grains, index=grains.index("Month"), disabled=(map_mode != "Animated map"))
 
-    # By state
-    st.markdown("### By state")
-    state_grp = df.groupby("state", as_index=False).agg({"spend": "sum", "attributed_revenue": "sum"})
-    state_grp["roas"] = state_grp.apply(lambda r: (r["attributed_revenue"] / r["spend"]) if r["spend"] else 0.0, axis=1)
+    state_grp = state_grp[["state", "spend", "attributed_revenue"]].copy()
+    state_grp["roas"] = safe_divide(state_grp["attributed_revenue"], state_grp["spend"])
     # Determine top states and build a consistent color map
     top_spend = state_grp.sort_values("spend", ascending=False).head(20)
     top_roas = state_grp.sort_values("roas", ascending=False).head(20)
@@ -91,6 +122,12 @@ def render(filters: dict):
             fig.update_layout(legend_title_text="State")
             st.plotly_chart(fig, use_container_width=True)
             
+    elif map_mode == "Animated map":
+        fig = _animated_map(filters, grain, map_metric)
+        if fig is None:
+            st.info("No state data to animate for the selected filters.")
+        else:
+            st.plotly_chart(fig, use_container_width=True)
     else:
         # US choropleth (requires two-letter state codes in `state` column)
         metric_col = map_metric
@@ -107,12 +144,23 @@ def render(filters: dict):
         )
         fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
         st.plotly_chart(fig, use_container_width=True)
-        # Exports are centralized in the Export center on the Executive Summary
+
+
+def render(filters: dict):
+    st.subheader("Geo & Tactic")
+    state_grp = data_mod.query_marketing(["state"], filters)
+    if state_grp.empty:
+        st.warning("No data for selected filters.")
+        return
+
+    # By state
+    st.markdown("### By state")
+    _state_view(state_grp, filters)
 
     # By tactic
     st.markdown("### By tactic")
-    tactic_grp = df.groupby(["channel", "tactic"], as_index=False).agg({"spend": "sum", "attributed_revenue": "sum"})
-    tactic_grp["roas"] = tactic_grp.apply(lambda r: (r["attributed_revenue"] / r["spend"]) if r["spend"] else 0.0, axis=1)
+    tactic_grp = data_mod.query_marketing(["channel", "tactic"], filters)[["channel", "tactic", "spend", "attributed_revenue"]]
+    tactic_grp["roas"] = safe_divide(tactic_grp["attributed_revenue"], tactic_grp["spend"])
     fig = px.bar(
         tactic_grp.sort_values("spend", ascending=False),
         x="tactic",
@@ -132,7 +180,7 @@ def render(filters: dict):
         st.markdown('<style>.metrics-header {font-size: 18px !important; font-weight: 500 !important;}</style>', unsafe_allow_html=True)
         st.write(
             """
-            - Use the state view to see geographic performance; bars help rank, the map helps spot regional clusters.
+            - Use the state view to see geographic performance; bars help rank, the map helps spot regional clusters, and the animated map shows how they shift week to week or month to month.
             - ROAS highlights efficiency; Spend highlights scale. Look for states with high ROAS and enough Spend to matter.
             - The tactic view shows the mix by channel; investigate tactics with high Spend but weak ROAS.
             
@@ -0,0 +1,66 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from theme import CHANNEL_COLORS
+import data as data_mod
+
+
+def render(filters: dict):
+    st.subheader("Media Mix Model")
+    st.caption("Business revenue explained by adstocked spend per channel (ridge regression, decays chosen on a holdout)")
+
+    # Business revenue is a total, so only the date range applies here
+    result = data_mod.media_mix_model({"date_range": (filters or {}).get("date_range") or []})
+    if result is None:
+        st.warning("Need at least 30 days with both marketing and business data in the selected range.")
+        return
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Holdout R²", f"{result.holdout_r2:.2f}", help="Fit on the most recent days, which the grid search did not train on")
+    c2.metric("In-sample R²", f"{result.r2:.2f}")
+    c3.metric("Baseline revenue / day", f"${result.intercept:,.0f}", help="Revenue the model attributes to no spend")
+
+    summary = result.summary
+    c1, c2 = st.columns(2)
+    with c1:
+        fig = px.bar(summary, x="channel", y="roi", color="channel", title="Modelled revenue per $ of spend",
+                     color_discrete_map=CHANNEL_COLORS, template=px.defaults.template)
+        fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", showlegend=False)
+        st.plotly_chart(fig, use_container_width=True)
+    with c2:
+        fig = px.pie(summary.assign(contribution=summary["contribution"].clip(lower=0)), names="channel", values="contribution",
+                     title="Share of modelled media contribution", color="channel", color_discrete_map=CHANNEL_COLORS, hole=0.5)
+        fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+        st.plotly_chart(fig, use_container_width=True)
+
+    fitted = result.fitted
+    long = fitted.melt(id_vars="date", value_vars=["baseline"] + result.channels, var_name="component", value_name="modelled")
+    fig = px.area(long, x="date", y="modelled", color="component", title="Revenue decomposition vs. actual",
+                  color_discrete_map={**CHANNEL_COLORS, "baseline": "#cbd5e1"}, template=px.defaults.template)
+    fig.add_scatter(x=fitted["date"], y=fitted["revenue"], mode="lines", name="Actual revenue", line=dict(color="#0f172a", width=2))
+    fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        summary.rename(columns={
+            "channel": "Channel",
+            "decay": "Adstock decay",
+            "spend": "Spend",
+            "contribution": "Modelled revenue",
+            "share": "Share of revenue",
+            "roi": "Revenue per $",
+        }),
+        use_container_width=True,
+    )
+    with st.expander(f"Grid search ({len(result.grid):,} candidates, ridge alpha {result.alpha:g})", expanded=False):
+        st.dataframe(result.grid.nsmallest(20, "holdout_sse"), use_container_width=True)
+
+    with st.expander("Metrics & Interpretation", expanded=False):
+        st.write(
+            """
+            - Adstock carries part of each day's spend into later days: decay 0.6 means 60% of the effect rolls over to the next day.
+            - Each channel's decay and the ridge strength are chosen by holdout error over the whole grid; the winner is then refit on every day.
+            - Revenue per $ is modelled incremental revenue divided by spend. Unlike platform ROAS it is estimated from business revenue.
+            - With a short history or channels whose spend moves together, estimates are unstable; check the holdout R² first.
+            """
+        )
@@ -3,21 +3,11 @@ import pandas as pd
 import plotly.express as px
 from theme import CHANNEL_COLORS  # For consistency if channel splits are added later
 
-from metrics import compute_blended_kpis
+import data as data_mod
+from lags import MAX_LAG
 import io
 
 
-def _apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    date_range = filters.get("date_range") or []
-    if len(date_range) == 2:
-        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        out = out[(out["date"] >= start) & (out["date"] <= end)]
-    return out
-
-
 essential_cols = [
     "contribution_after_ads",
     "profit_roas",
@@ -35,31 +25,45 @@ def _rolling(df: pd.DataFrame, cols: list[str], window: int) -> pd.DataFrame:
     return out
 
 
-def render(filters: dict):
-    st.subheader("Profit & Contribution")
-
-    if "marketing_daily" not in st.session_state or "business_df" not in st.session_state:
-        st.info("Data not loaded yet. Visit Executive Summary first or reload.")
-        return
+@st.fragment
+def _top_bottom_days(day_tbl: pd.DataFrame, unit: str = "day"):
+    # A fragment, so moving the slider reruns only these two tables
+    top_n = st.slider(f"Show top/bottom N {unit}s", min_value=3, max_value=15, value=5)
+    left, right = st.columns(2)
+    with left:
+        st.write(f"Top {unit}s")
+        st.dataframe(day_tbl.sort_values("contribution_after_ads", ascending=False).head(top_n), use_container_width=True)
+    with right:
+        st.write(f"Bottom {unit}s")
+        st.dataframe(day_tbl.sort_values("contribution_after_ads", ascending=True).head(top_n), use_container_width=True)
 
-    m_daily = st.session_state["marketing_daily"]
-    b_df = st.session_state["business_df"]
 
-    # Apply date filters
-    m_daily = _apply_filters(m_daily, filters)
-    b_df = _apply_filters(b_df, filters)
+def render(filters: dict):
+    st.subheader("Profit & Contribution")
 
-    blended = compute_blended_kpis(m_daily, b_df)
+    # Blended metrics use total marketing spend (date filter only) joined with business by date
+    blended = data_mod.blended_kpis({"date_range": (filters or {}).get("date_range") or []})
     if blended is None or blended.empty:
         st.warning("No data for selected date range.")
         return
 
     st.sidebar.markdown("### Profit options")
-    rolling = st.sidebar.checkbox("7-day rolling average", value=True)
-    lag_days = st.sidebar.selectbox("Lag business metrics (days)", options=[0, 1, 2, 3], index=0)
+    grain = st.sidebar.selectbox("Granularity", options=["Day"] + list(data_mod.ROLLUP_GRAINS), index=0)
+    daily = grain == "Day"
+    # Rolling and lag are day-based, so they only apply at daily grain
+    rolling = st.sidebar.checkbox("7-day rolling average", value=True, disabled=not daily)
+    # A lag as long as the range would leave no revenue to show
+    max_lag = min(MAX_LAG, len(blended) - 1)
+    lag_days = st.sidebar.slider(
+        "Lag business metrics (days)", min_value=0, max_value=max(max_lag, 1), value=0, disabled=not daily or max_lag < 1
+    )
+    lag_days = min(lag_days, max_lag)
+    if not daily:
+        rolling, lag_days = False, 0
     targets = (filters or {}).get("targets", {})
+    unit = grain.lower()
 
-    df = blended.copy().sort_values("date")
+    df = (blended.copy() if daily else data_mod.blended_rollup(grain, filters)).sort_values("date")
     if lag_days:
         # Lag gross-profit-derived metrics by shifting total_revenue and gross_profit together
         df["gross_profit"] = df["gross_margin_pct"] * df["total_revenue"]
@@ -105,16 +109,8 @@ def render(filters: dict):
     st.caption("Contribution after ads = Gross Profit − Total Ad Spend. Profit ROAS = Gross Profit / Total Ad Spend.")
 
     # Top/Bottom days by contribution
-    st.markdown("### Top/Bottom days by Contribution")
-    top_n = st.slider("Show top/bottom N days", min_value=3, max_value=15, value=5)
-    day_tbl = df[["date", "contribution_after_ads", "profit_roas"]].dropna().copy()
-    left, right = st.columns(2)
-    with left:
-        st.write("Top days")
-        st.dataframe(day_tbl.sort_values("contribution_after_ads", ascending=False).head(top_n), use_container_width=True)
-    with right:
-        st.write("Bottom days")
-        st.dataframe(day_tbl.sort_values("contribution_after_ads", ascending=True).head(top_n), use_container_width=True)
+    st.markdown(f"### Top/Bottom {unit}s by Contribution")
+    _top_bottom_days(df[["date", "contribution_after_ads", "profit_roas"]].dropna().copy(), unit)
 
     with st.expander("Metrics & Interpretation", expanded=False):
         st.markdown('<style>.metrics-header {font-size: 18px !important; font-weight: 500 !important;}</style>', unsafe_allow_html=True)
@@ -0,0 +1,100 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from theme import CHANNEL_COLORS
+import data as data_mod
+from curves import RECENT_DAYS, predict
+
+
+def _labels(fits: pd.DataFrame, keys: list[str]) -> pd.Series:
+    return fits[keys].astype(str).agg(" · ".join, axis=1)
+
+
+def _curve_points(fits: pd.DataFrame, labels: pd.Series, points: int = 60) -> pd.DataFrame:
+    # Every curve on a shared spend grid, evaluated in one vectorized call
+    top = float(max(fits["spend"].max(), fits["h"].max()) * 2.0) or 1.0
+    grid = np.linspace(0.0, top, points)
+    rep = fits.loc[fits.index.repeat(points)]
+    spend = np.tile(grid, len(fits))
+    return pd.DataFrame({
+        "group": labels.loc[rep.index].to_numpy(),
+        "channel": rep["channel"].to_numpy(),
+        "spend": spend,
+        "revenue": predict(rep, spend),
+    })
+
+
+@st.fragment
+def _curves(fits: pd.DataFrame, keys: list[str]):
+    # Local controls live in the fragment so changing them reruns only the charts
+    # A single group has nothing to choose between (and a slider needs min < max)
+    if len(fits) > 1:
+        top_n = st.slider("Groups to plot (by current spend)", min_value=1, max_value=min(len(fits), 25), value=min(len(fits), 10))
+        shown = fits.nlargest(top_n, "spend")
+    else:
+        shown = fits
+    labels = _labels(shown, keys)
+    color_map = CHANNEL_COLORS if keys == ["channel"] else None
+
+    c1, c2 = st.columns(2)
+    with c1:
+        pts = _curve_points(shown, labels)
+        fig = px.line(pts, x="spend", y="revenue", color="group", title="Daily attributed revenue vs. daily spend",
+                      color_discrete_map=color_map, template=px.defaults.template)
+        now = pd.DataFrame({"group": labels.to_numpy(), "spend": shown["spend"].to_numpy(), "revenue": shown["revenue"].to_numpy()})
+        fig.add_scatter(x=now["spend"], y=now["revenue"], mode="markers", marker=dict(size=9, color="#0f172a"),
+                        name="Current spend", text=now["group"], hovertemplate="%{text}<br>$%{x:,.0f} → $%{y:,.0f}<extra></extra>")
+        fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+        st.plotly_chart(fig, use_container_width=True)
+    with c2:
+        bars = pd.DataFrame({"group": labels.to_numpy(), "channel": shown["channel"].to_numpy(), "marginal_roas": shown["marginal_roas"].to_numpy()})
+        fig = px.bar(bars.sort_values("marginal_roas", ascending=False), x="group", y="marginal_roas", color="channel",
+                     title="Marginal ROAS at current spend", color_discrete_map=CHANNEL_COLORS, template=px.defaults.template)
+        fig.add_hline(y=1.0, line_dash="dot", annotation_text="Break-even")
+        fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", xaxis_title=None)
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def render(filters: dict):
+    st.subheader("Response Curves")
+    st.caption("Diminishing-returns curves of attributed revenue on spend, fitted per group over the full daily history")
+
+    level = st.selectbox("Fit level", options=list(data_mod.CURVE_LEVELS), index=0)
+    keys = data_mod.CURVE_LEVELS[level]
+    fits = data_mod.response_curves(level)
+    channels = (filters or {}).get("channels") or []
+    if channels:
+        fits = fits[fits["channel"].isin(channels)]
+    if fits.empty:
+        st.warning("No data for selected filters.")
+        return
+
+    _curves(fits, keys)
+
+    st.markdown("### Fitted curves")
+    table = fits[keys + ["model", "r2", "spend", "revenue", "roas", "marginal_roas"]].sort_values("spend", ascending=False)
+    st.dataframe(
+        table.rename(columns={
+            "channel": "Channel",
+            "tactic": "Tactic",
+            "campaign": "Campaign",
+            "model": "Model",
+            "r2": "R²",
+            "spend": "Current daily spend",
+            "revenue": "Predicted daily revenue",
+            "roas": "ROAS",
+            "marginal_roas": "Marginal ROAS",
+        }),
+        use_container_width=True,
+    )
+
+    with st.expander("Metrics & Interpretation", expanded=False):
+        st.write(
+            f"""
+            - Each group's daily attributed revenue is fitted with a Hill curve a·sᵏ/(sᵏ+hᵏ) or a log curve a·log(1+s/h), whichever fits better.
+            - Current spend is the group's average daily spend over the last {RECENT_DAYS} days of data.
+            - Marginal ROAS is the revenue from the next dollar at current spend. Below 1.0 that dollar no longer pays back, even if average ROAS looks healthy.
+            - Curves use platform-attributed revenue, so they inherit the platforms' attribution bias; check R² before acting on a curve.
+            """
+        )
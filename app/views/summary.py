@@ -2,32 +2,11 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from metrics import compute_blended_kpis
+import aggregates
 from theme import CHANNEL_COLORS
 
 
 
-def _apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    channels = filters.get("channels") or []
-    tactics = filters.get("tactics") or []
-    states = filters.get("states") or []
-    date_range = filters.get("date_range") or []
-
-    if channels:
-        out = out[out["channel"].isin(channels)]
-    if tactics:
-        out = out[out["tactic"].isin(tactics)]
-    if states:
-        out = out[out["state"].isin(states)]
-    if len(date_range) == 2:
-        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        out = out[(out["date"] >= start) & (out["date"] <= end)]
-    return out
-
-
 def _fmt_currency(x: float) -> str:
     try:
         return f"${x:,.0f}"
@@ -42,61 +21,27 @@ def _fmt_float(x: float) -> str:
         return "0.00"
 
 
-def render(filters: dict, marketing_df: pd.DataFrame, business_df: pd.DataFrame, marketing_daily: pd.DataFrame):
-    st.subheader("Executive Summary")
+# Page sections are fragments: each can rerun on its own without re-executing the whole app
+@st.fragment
+def _kpi_cards(filters: dict):
+    cur = aggregates.kpis(filters)
+    total_spend = cur["spend"]
+    total_revenue = cur["total_revenue"]
+    mer = cur["mer"]
+    blended_cac = cur["blended_cac"]
+    attributed_roas = cur["attributed_roas"]
 
-    # Apply filters to marketing data for channel-level cards
-    m_filtered = _apply_filters(marketing_df, filters)
-    # For blended KPIs, aggregate filtered marketing then join with business
-    m_daily = m_filtered.groupby("date", as_index=False)[["impressions", "clicks", "spend", "attributed_revenue"]].sum()
-    blended = compute_blended_kpis(m_daily, business_df)
-
-    # Helper: compute previous period date range for deltas
-    def _prev_period_rng() -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
-        dr = (filters or {}).get("date_range") or []
-        if not (isinstance(dr, list) and len(dr) == 2):
-            return None, None
-        try:
-            cur_start = pd.to_datetime(dr[0])
-            cur_end = pd.to_datetime(dr[1])
-        except Exception:
-            return None, None
-        if pd.isna(cur_start) or pd.isna(cur_end):
-            return None, None
-        # previous period length matches current; end is day before current start
-        period_len = (cur_end - cur_start).days
-        prev_end = cur_start - pd.Timedelta(days=1)
-        prev_start = prev_end - pd.Timedelta(days=period_len)
-        return prev_start.normalize(), prev_end.normalize()
-
-    pp_start, pp_end = _prev_period_rng()
-
-    total_spend = float(m_daily["spend"].sum()) if not m_daily.empty else 0.0
-    total_revenue = float(blended["total_revenue"].sum()) if not blended.empty else 0.0
-    total_attr_rev = float(m_filtered["attributed_revenue"].sum()) if not m_filtered.empty else 0.0
-    total_new_customers = int(business_df["new_customers"].sum()) if not business_df.empty else 0
-    mer = (total_revenue / total_spend) if total_spend else 0.0
-    blended_cac = (total_spend / total_new_customers) if total_new_customers else 0.0
-    attributed_roas = (total_attr_rev / total_spend) if total_spend else 0.0
-
-    # Previous period aggregates (if date range is set)
-    spend_pp = rev_pp = attr_rev_pp = mer_pp = cac_pp = roas_pp = None
-    if pp_start is not None and pp_end is not None:
-        # Marketing prev window
-        m_pp = marketing_df[(marketing_df["date"] >= pp_start) & (marketing_df["date"] <= pp_end)].copy()
-        # Respect current categorical filters (channels/tactics/states)
-        m_pp = _apply_filters(m_pp, {**(filters or {}), "date_range": [pp_start, pp_end]})
-        m_daily_pp = m_pp.groupby("date", as_index=False)[["impressions", "clicks", "spend", "attributed_revenue"]].sum()
-        blended_pp = compute_blended_kpis(m_daily_pp, business_df[(business_df["date"] >= pp_start) & (business_df["date"] <= pp_end)])
-        spend_pp = float(m_daily_pp["spend"].sum()) if not m_daily_pp.empty else 0.0
-        rev_pp = float(blended_pp["total_revenue"].sum()) if not blended_pp.empty else 0.0
-        attr_rev_pp = float(m_pp["attributed_revenue"].sum()) if not m_pp.empty else 0.0
-        mer_pp = (rev_pp / spend_pp) if spend_pp else 0.0
-        # Use prev window new customers for CAC baseline
-        b_pp = business_df[(business_df["date"] >= pp_start) & (business_df["date"] <= pp_end)]
-        new_cust_pp = float(b_pp["new_customers"].sum()) if not b_pp.empty else 0.0
-        cac_pp = (spend_pp / new_cust_pp) if new_cust_pp else 0.0
-        roas_pp = (attr_rev_pp / spend_pp) if spend_pp else 0.0
+    # Previous equal-length period (if a date range is set), respecting the categorical filters
+    prev_filters = aggregates.previous_period(filters)
+    pp_start = prev_filters["date_range"][0] if prev_filters else None
+    spend_pp = rev_pp = mer_pp = cac_pp = roas_pp = None
+    if prev_filters is not None:
+        prev = aggregates.kpis(prev_filters)
+        spend_pp = prev["spend"]
+        rev_pp = prev["total_revenue"]
+        mer_pp = prev["mer"]
+        cac_pp = prev["blended_cac"]
+        roas_pp = prev["attributed_roas"]
 
     def pct_delta(cur: float, prev: float | None) -> str | None:
         if prev is None:
@@ -295,20 +240,11 @@ def render(filters: dict, marketing_df: pd.DataFrame, business_df: pd.DataFrame,
         </div>
         """, unsafe_allow_html=True)
 
-    st.markdown("### Channel breakdown")
-    if m_filtered.empty:
-        st.warning("No data for selected filters.")
-        return
-    
-    channel_grp = m_filtered.groupby("channel", as_index=False).agg({
-        "spend": "sum",
-        "attributed_revenue": "sum",
-        "impressions": "sum",
-        "clicks": "sum",
-    })
-    channel_grp["roas"] = channel_grp.apply(
-        lambda r: (r["attributed_revenue"] / r["spend"]) if r["spend"] else 0.0, axis=1
-    )
+
+@st.fragment
+def _channel_breakdown(filters: dict, channel_grp: pd.DataFrame):
+    targets = (filters or {}).get("targets", {})
+    tg_roas = targets.get("roas")
     
     # Create visual charts for channel metrics
     col1, col2 = st.columns(2)
@@ -425,11 +361,7 @@ def render(filters: dict, marketing_df: pd.DataFrame, business_df: pd.DataFrame,
     
     # CTR & CPC comparison
     st.markdown("### Channel Efficiency Metrics")
-    channel_metrics = m_filtered.groupby("channel", as_index=False).agg({
-        "impressions": "sum",
-        "clicks": "sum",
-        "spend": "sum"
-    })
+    channel_metrics = channel_grp[["channel", "impressions", "clicks", "spend"]].copy()
     channel_metrics["ctr"] = channel_metrics.apply(
         lambda r: (r["clicks"] / r["impressions"]) * 100 if r["impressions"] else 0.0, axis=1
     )
@@ -481,6 +413,19 @@ def render(filters: dict, marketing_df: pd.DataFrame, business_df: pd.DataFrame,
         )
         st.plotly_chart(fig, use_container_width=True)
 
+
+def render(filters: dict):
+    st.subheader("Executive Summary")
+
+    _kpi_cards(filters)
+
+    st.markdown("### Channel breakdown")
+    channel_grp = aggregates.channel_breakdown(filters)
+    if channel_grp.empty:
+        st.warning("No data for selected filters.")
+        return
+    _channel_breakdown(filters, channel_grp)
+
     with st.expander("Metrics & Interpretation", expanded=False):
         st.markdown('<style>.metrics-header {font-size: 18px !important; font-weight: 500 !important;}</style>', unsafe_allow_html=True)
         st.markdown(
@@ -3,18 +3,9 @@ import pandas as pd
 import plotly.express as px
 from theme import CHANNEL_COLORS
 
-from metrics import compute_blended_kpis
-
-
-def _apply_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    date_range = filters.get("date_range") or []
-    if len(date_range) == 2:
-        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        out = out[(out["date"] >= start) & (out["date"] <= end)]
-    return out
+import data as data_mod
+from lags import MAX_LAG, MIN_OVERLAP
+from metrics import safe_divide
 
 
 def _rolling(df: pd.DataFrame, cols: list[str], window: int) -> pd.DataFrame:
@@ -28,26 +19,6 @@ def _rolling(df: pd.DataFrame, cols: list[str], window: int) -> pd.DataFrame:
     return out
 
 
-def _apply_marketing_filters(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    channels = filters.get("channels") or []
-    tactics = filters.get("tactics") or []
-    states = filters.get("states") or []
-    date_range = filters.get("date_range") or []
-    if channels:
-        out = out[out["channel"].isin(channels)]
-    if tactics:
-        out = out[out["tactic"].isin(tactics)]
-    if states:
-        out = out[out["state"].isin(states)]
-    if len(date_range) == 2:
-        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-        out = out[(out["date"] >= start) & (out["date"] <= end)]
-    return out
-
-
 def _rolling_by_group(df: pd.DataFrame, group_col: str, cols: list[str], window: int) -> pd.DataFrame:
     if df.empty or window <= 1:
         return df
@@ -61,33 +32,105 @@ def _rolling_by_group(df: pd.DataFrame, group_col: str, cols: list[str], window:
     return out.reset_index(drop=True)
 
 
-def render(filters: dict):
-    st.subheader("Trends")
-    if "marketing_daily" not in st.session_state or "business_df" not in st.session_state:
-        st.info("Data not loaded yet. Visit Executive Summary first or reload.")
+@st.fragment
+def _channel_trends(filters: dict, rolling: bool, grain: str):
+    # The toggle sits in the fragment so flipping it reruns only the per-channel charts
+    show_channel_lines = st.checkbox("Show per-channel time series", value=True)
+    if not show_channel_lines:
         return
+    if grain == "Day":
+        ch_ts = data_mod.query_marketing(["date", "channel"], filters)
+    else:
+        ch_ts = data_mod.channel_rollup(grain, filters)
+    if not ch_ts.empty:
+        ch_ts = ch_ts[["date", "channel", "spend", "attributed_revenue"]].sort_values(["channel", "date"])
+        ch_ts["roas"] = safe_divide(ch_ts["attributed_revenue"], ch_ts["spend"])
+        if rolling:
+            ch_ts = _rolling_by_group(ch_ts, "channel", ["spend", "roas"], window=7)
+
+        st.markdown("### Per-channel trends")
+        c1, c2 = st.columns(2)
+        with c1:
+            fig = px.line(
+                ch_ts,
+                x="date",
+                y="spend",
+                color="channel",
+                title="Spend by channel over time",
+                color_discrete_map=CHANNEL_COLORS,
+                template=px.defaults.template,
+            )
+            fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+            st.plotly_chart(fig, use_container_width=True)
+        with c2:
+            fig = px.line(
+                ch_ts,
+                x="date",
+                y="roas",
+                color="channel",
+                title="Attributed ROAS by channel over time",
+                color_discrete_map=CHANNEL_COLORS,
+                template=px.defaults.template,
+            )
+            fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+            st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def _lag_scan(filters: dict):
+    # The scan length is a local control, so changing it reruns only this section
+    st.markdown("### Spend → revenue lag")
+    max_lag = st.slider("Scan lags up to (days)", min_value=1, max_value=MAX_LAG, value=MAX_LAG, key="lag_scan_max")
+    scan = data_mod.lag_correlations(filters, max_lag)
+    if scan.empty:
+        st.info(f"Not enough data to scan lags: each lag needs at least {MIN_OVERLAP} overlapping days.")
+        return
+    best = scan.loc[scan.groupby("series", sort=False)["corr"].idxmax()]
+    for col, row in zip(st.columns(len(best)), best.itertuples()):
+        col.metric(f"Best lag · {row.series}", f"{row.lag} days", help=f"Correlation {row.corr:.2f}")
+    fig = px.line(
+        scan,
+        x="lag",
+        y="corr",
+        color="series",
+        title=f"Correlation of spend with revenue N days later (0–{max_lag})",
+        color_discrete_map={**CHANNEL_COLORS, "Total": "#0f172a"},
+        template=px.defaults.template,
+    )
+    fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", xaxis_title="Lag (days)", yaxis_title="Correlation")
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(
+        "Channel lines correlate that channel's spend with total business revenue. "
+        f"Each lag needs at least {MIN_OVERLAP} overlapping days, so widen the date range to scan longer lags."
+    )
 
-    m_daily = st.session_state["marketing_daily"]
-    b_df = st.session_state["business_df"]
-
-    # Apply date filter
-    m_daily = _apply_filters(m_daily, filters)
-    b_df = _apply_filters(b_df, filters)
 
-    # Compute blended metrics joined by date
-    blended = compute_blended_kpis(m_daily, b_df)
+def render(filters: dict):
+    st.subheader("Trends")
+    # Blended metrics use total marketing spend (date filter only) joined with business by date
+    blended = data_mod.blended_kpis({"date_range": (filters or {}).get("date_range") or []})
     if blended is None or blended.empty:
         st.warning("No data for selected date range.")
         return
 
     st.sidebar.markdown("### Trend options")
-    rolling = st.sidebar.checkbox("7-day rolling average", value=True)
-    lag_days = st.sidebar.selectbox("Lag business metrics (days)", options=[0, 1, 2, 3], index=0)
-    show_channel_lines = st.sidebar.checkbox("Show per-channel time series", value=True)
+    grain = st.sidebar.selectbox("Granularity", options=["Day"] + list(data_mod.ROLLUP_GRAINS), index=0)
+    daily = grain == "Day"
+    # Rolling and lag are day-based, so they only apply at daily grain
+    rolling = st.sidebar.checkbox("7-day rolling average", value=True, disabled=not daily)
+    # A lag as long as the range would leave no revenue to show
+    max_lag = min(MAX_LAG, len(blended) - 1)
+    lag_days = st.sidebar.slider(
+        "Lag business metrics (days)", min_value=0, max_value=max(max_lag, 1), value=0, disabled=not daily or max_lag < 1
+    )
+    lag_days = min(lag_days, max_lag)
+    if not daily:
+        rolling, lag_days = False, 0
     targets = (filters or {}).get("targets", {})
+    unit = grain.lower()
 
     # Optionally lag business metrics (revenue)
-    df = blended.copy()
+    df = blended.copy() if daily else data_mod.blended_rollup(grain, filters)
     if lag_days:
         df = df.sort_values("date")
         df["total_revenue"] = df["total_revenue"].shift(lag_days)
@@ -110,67 +153,32 @@ def render(filters: dict):
         st.plotly_chart(fig, use_container_width=True)
         
 
-    st.caption("Tip: Use the lag toggle to visualize delayed conversion effects.")
+    if daily:
+        st.caption("Tip: Use the lag toggle to visualize delayed conversion effects.")
+    else:
+        st.caption(f"Each point is a whole calendar {unit}, labelled by its first day; edge periods may include days outside the selected range.")
 
     # Optional: per-channel trends (Spend and Attributed ROAS)
-    if show_channel_lines:
-        if "marketing_df" in st.session_state:
-            m_df = st.session_state["marketing_df"]
-            m_df = _apply_marketing_filters(m_df, filters)
-            if not m_df.empty:
-                ch_ts = (
-                    m_df.groupby(["date", "channel"], as_index=False)[["spend", "attributed_revenue"]]
-                    .sum()
-                    .sort_values(["channel", "date"]) 
-                )
-                ch_ts["roas"] = ch_ts.apply(lambda r: (r["attributed_revenue"] / r["spend"]) if r["spend"] else 0.0, axis=1)
-                if rolling:
-                    ch_ts = _rolling_by_group(ch_ts, "channel", ["spend", "roas"], window=7)
-
-                st.markdown("### Per-channel trends")
-                c1, c2 = st.columns(2)
-                with c1:
-                    fig = px.line(
-                        ch_ts,
-                        x="date",
-                        y="spend",
-                        color="channel",
-                        title="Spend by channel over time",
-                        color_discrete_map=CHANNEL_COLORS,
-                        template=px.defaults.template,
-                    )
-                    fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                    st.plotly_chart(fig, use_container_width=True)
-                    # Exports are centralized in the Export center on the Executive Summary
-                with c2:
-                    fig = px.line(
-                        ch_ts,
-                        x="date",
-                        y="roas",
-                        color="channel",
-                        title="Attributed ROAS by channel over time",
-                        color_discrete_map=CHANNEL_COLORS,
-                        template=px.defaults.template,
-                    )
-                    fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                    st.plotly_chart(fig, use_container_width=True)
-                    # Exports are centralized in the Export center on the Executive Summary
-
-    # Small callouts
-    max_rev_row = df.loc[df["total_revenue"].idxmax()] if not df.empty else None
-    max_spend_row = df.loc[df["spend"].idxmax()] if not df.empty else None
-    min_cac_row = df.loc[df["blended_cac"].idxmin()] if not df.empty else None
+    _channel_trends(filters, rolling, grain)
+
+    _lag_scan(filters)
+
+    # Small callouts, over the days the lag left revenue for
+    shown = df.dropna(subset=["total_revenue"])
+    max_rev_row = shown.loc[shown["total_revenue"].idxmax()] if not shown.empty else None
+    max_spend_row = shown.loc[shown["spend"].idxmax()] if not shown.empty else None
+    min_cac_row = shown.loc[shown["blended_cac"].idxmin()] if not shown.empty else None
 
     c1, c2, c3 = st.columns(3)
     with c1:
         if max_rev_row is not None:
-            st.metric("Max revenue day", f"{max_rev_row['date'].date()}", help=f"${max_rev_row['total_revenue']:,.0f}")
+            st.metric(f"Max revenue {unit}", f"{max_rev_row['date'].date()}", help=f"${max_rev_row['total_revenue']:,.0f}")
     with c2:
         if max_spend_row is not None:
-            st.metric("Max spend day", f"{max_spend_row['date'].date()}", help=f"${max_spend_row['spend']:,.0f}")
+            st.metric(f"Max spend {unit}", f"{max_spend_row['date'].date()}", help=f"${max_spend_row['spend']:,.0f}")
     with c3:
         if min_cac_row is not None:
-            st.metric("Min blended CAC day", f"{min_cac_row['date'].date()}", help=f"${min_cac_row['blended_cac']:,.2f}")
+            st.metric(f"Min blended CAC {unit}", f"{min_cac_row['date'].date()}", help=f"${min_cac_row['blended_cac']:,.2f}")
 
     with st.expander("Metrics & Interpretation", expanded=False):
         st.markdown('<style>.metrics-header {font-size: 18px !important; font-weight: 500 !important;}</style>', unsafe_allow_html=True)
@@ -179,6 +187,7 @@ def render(filters: dict):
             - Spend vs Total Revenue shows the relationship between investment and top-line outcomes; consider enabling 7-day rolling averages for seasonality/noise.
             - MER and Blended CAC track efficiency: MER higher is better; CAC lower is better.
             - The Lag option shifts revenue to simulate delayed conversions; use it to test attribution lag hypotheses.
+            - The lag scan correlates spend with revenue 0–60 days later; the best lag is a starting point for the Lag option, not proof of causation.
             - Per-channel trends help catch mix shifts: a channel with rising spend but falling ROAS may need attention.
             
             """
@@ -0,0 +1,132 @@
+from __future__ import annotations
+from pathlib import Path
+import hashlib
+import os
+import threading
+from typing import Callable, Iterable, Tuple
+
+# Seconds between directory scans; override via env for slow network mounts
+POLL_SECONDS = float(os.environ.get("DATA_POLL_SECONDS", "5"))
+
+Snapshot = Tuple[Tuple[str, int, int], ...]
+# data_dir -> every file a dataset is read from, wherever it lives (see data._watched_files)
+Files = Callable[[Path], Iterable[Path]]
+
+
+def _listing(data_dir: Path) -> list[Path]:
+    """Every data file directly under data_dir."""
+    try:
+        with os.scandir(data_dir) as it:
+            return [Path(e.path) for e in it if e.is_file() and e.name.lower().endswith((".csv", ".json"))]
+    except OSError:
+        return []
+
+
+def _snapshot(data_dir: Path, files: Files | None = None) -> Snapshot:
+    """(name, mtime_ns, size) for every file `files` lists; missing files are left out.
+
+    Without `files`, or when it fails (e.g. on a manifest caught mid-write), every data
+    file directly under data_dir is listed instead.
+    """
+    paths = _listing(data_dir)
+    if files is not None:
+        try:
+            paths = list(files(data_dir))
+        except Exception:
+            pass
+    entries: set[tuple[str, int, int]] = set()
+    for p in paths:
+        try:
+            s = os.stat(p)
+        except OSError:
+            continue
+        name = os.path.relpath(p, data_dir) if Path(p).is_relative_to(data_dir) else str(p)
+        entries.add((name, s.st_mtime_ns, s.st_size))
+    return tuple(sorted(entries))
+
+
+class DataDirWatcher:
+    """Background thread that polls a data directory and bumps a version on change.
+
+    Reruns only read `version` (a plain int), so no per-session filesystem calls are made.
+    Given `files`, each scan stats the files it lists (e.g. channel files a manifest places
+    in subdirectories) rather than the top level of the directory.
+    """
+
+    def __init__(self, data_dir: Path, interval: float = POLL_SECONDS, files: Files | None = None):
+        self.data_dir = Path(data_dir)
+        self.interval = max(float(interval), 0.1)
+        self._files = files
+        self._snap = _snapshot(self.data_dir, files)
+        self._version = 0
+        self._listeners: list[Callable[[int], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"data-watcher:{self.data_dir.name}", daemon=True)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snap
+
+    @property
+    def fingerprint(self) -> str:
+        """Content key of the current snapshot; unlike `version` it is stable across processes."""
+        return hashlib.sha1(repr(self._snap).encode()).hexdigest()[:16]
+
+    def start(self) -> "DataDirWatcher":
+        if not self._thread.is_alive():
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def subscribe(self, callback: Callable[[int], None]) -> None:
+        """Register callback(version), invoked from the watcher thread after each bump."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def check_now(self) -> bool:
+        """Scan once; returns True if the directory changed and the version was bumped."""
+        snap = _snapshot(self.data_dir, self._files)
+        if snap == self._snap:
+            return False
+        with self._lock:
+            self._snap = snap
+            self._version += 1
+            version = self._version
+            listeners = list(self._listeners)
+        for cb in listeners:
+            try:
+                cb(version)
+            except Exception:
+                pass
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check_now()
+
+
+_watchers: dict[str, DataDirWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(data_dir: str, files: Files | None = None) -> DataDirWatcher:
+    """One running watcher per data directory per process, with or without a Streamlit runtime.
+
+    `files` is used when the watcher is first created; later calls get that watcher as is.
+    """
+    with _watchers_lock:
+        w = _watchers.get(data_dir)
+        if w is None:
+            w = _watchers[data_dir] = DataDirWatcher(Path(data_dir), files=files).start()
+        return w
+
+
+def data_version(data_dir: Path) -> int:
+    return get_watcher(str(data_dir)).version
@@ -0,0 +1,93 @@
+"""Import-time profile of the dashboard's cold start.
+
+    python benchmarks/bench_imports.py [--repeat R] [--top N]
+
+Each case imports a set of modules in a fresh interpreter under `python -X importtime`
+and reports the best total over R runs. "eager" is what main.py used to import before
+serving anything (every view); the "lazy" cases are main.py's own imports plus the one
+view a first visit to that page loads. Streamlit and pandas make up most of every total
+and any page needs them, so each case also reports "own": the modules it imports beyond
+those libraries (the LIBRARIES case), which is where eager and lazy actually differ.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+APP = Path(__file__).resolve().parents[1] / "app"
+
+
+def main_imports() -> list[str]:
+    """What main.py imports at the top, before any page is chosen, read from its source."""
+    tree = ast.parse((APP / "main.py").read_text())
+    names: list[str] = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+MAIN_IMPORTS = main_imports()
+VIEWS = ["summary", "drilldown", "trends", "profit", "geo_tactic", "response_curves", "budget", "media_mix", "data_quality"]
+
+LIBRARIES = ["streamlit", "pandas", "numpy", "pyarrow"]
+
+CASES = {
+    "libraries only": LIBRARIES,
+    "eager (all views)": MAIN_IMPORTS + [f"views.{v}" for v in VIEWS],
+    "lazy: main only": MAIN_IMPORTS,
+    "lazy: Data Quality": MAIN_IMPORTS + ["views.data_quality"],
+    "lazy: Executive Summary": MAIN_IMPORTS + ["views.summary"],
+}
+
+
+def profile(modules: list[str]) -> dict[str, tuple[int, int]]:
+    """{module: (self_us, cumulative_us)} from one fresh interpreter importing `modules`."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(APP), os.environ.get("PYTHONPATH")])))
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True, check=True
+    )
+    out: dict[str, tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        out.setdefault(name.strip(), (int(self_us), int(cum_us)))
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="slowest top-level imports to list for the eager case")
+    args = ap.parse_args()
+
+    print(f"best of {args.repeat} fresh interpreters")
+    runs: dict[str, dict[str, tuple[int, int]]] = {}
+    for name, modules in CASES.items():
+        profiles = [profile(modules) for _ in range(args.repeat)]
+        best = min(profiles, key=lambda p: sum(s for s, _ in p.values()))
+        runs[name] = best
+        total = sum(s for s, _ in best.values())
+        # Best of the runs on its own: it is a few percent of the total, well under its noise
+        own = min(sum(s for m, (s, _) in p.items() if m not in runs["libraries only"]) for p in profiles)
+        print(
+            f"  {name:<26} {total / 1e3:8.1f} ms  own {own / 1e3:6.1f} ms  {len(best):5d} modules"
+            f"  plotly.express: {'plotly.express' in best}"
+        )
+
+    eager = runs["eager (all views)"]
+    print("\nslowest packages imported eagerly (cumulative):")
+    roots = {k: v for k, v in eager.items() if "." not in k}
+    for mod, (_, cum) in sorted(roots.items(), key=lambda kv: -kv[1][1])[: args.top]:
+        print(f"  {mod:<26} {cum / 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark typed CSV parsing against the inferred path it replaced.
+
+    python benchmarks/bench_ingest.py [--rows N] [--repeat R]
+
+"inferred" is the previous reader: pd.read_csv with every dtype inferred, then
+_normalize_marketing's to_datetime without a format, to_numeric per metric and
+astype(str).str.strip per text column. "typed" is data._read_marketing_csv, which reads
+the declared schema in one pass and falls back to the inferred path only for files that
+break it. The CSVs are synthetic and written to a temporary directory.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import data  # noqa: E402
+
+
+def write_channel(path: Path, rows: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2024-01-01", periods=365).strftime("%Y-%m-%d")
+    campaigns = np.array([f"Campaign {i:04d}" for i in range(2_000)])
+    impressions = rng.integers(1_000, 200_000, rows)
+    pd.DataFrame({
+        "date": np.sort(rng.choice(days, rows)),
+        "tactic": rng.choice(["Prospecting", "Retargeting", "Search", "Display"], rows),
+        "state": rng.choice(["CA", "NY", "TX", "FL", "WA", "IL", "GA"], rows),
+        "campaign": rng.choice(campaigns, rows),
+        "impression": impressions,
+        "clicks": rng.binomial(impressions, 0.015),
+        "spend": rng.gamma(2.0, 300.0, rows).round(2),
+        "attributed revenue": rng.gamma(2.0, 900.0, rows).round(2),
+    }).to_csv(path, index=False)
+
+
+def write_business(path: Path, days: int = 3_650, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "date": pd.date_range("2015-01-01", periods=days).strftime("%Y-%m-%d"),
+        "# of orders": rng.integers(1_000, 3_000, days),
+        "# of new orders": rng.integers(300, 1_000, days),
+        "new customers": rng.integers(300, 1_000, days),
+        "total revenue": rng.gamma(20.0, 10_000.0, days).round(2),
+        "gross profit": rng.gamma(10.0, 10_000.0, days).round(2),
+        "COGS": rng.gamma(10.0, 10_000.0, days).round(2),
+    }).to_csv(path, index=False)
+
+
+def inferred_channel(path: Path) -> pd.DataFrame:
+    return data._normalize_marketing(pd.read_csv(path), "Bench", dict(data.DEFAULT_RENAME_MAP))
+
+
+def inferred_business(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path).rename(columns=data.BUSINESS_RENAME_MAP)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for col in data.BUSINESS_COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    return df.dropna(subset=["date"]).reset_index(drop=True)[data.BUSINESS_COLUMNS]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        channel, business = Path(tmp) / "Bench.csv", Path(tmp) / "business.csv"
+        write_channel(channel, args.rows)
+        write_business(business)
+        size_mb = channel.stat().st_size / 1e6
+        # Both readers must produce the same frame before either is timed
+        pd.testing.assert_frame_equal(data._read_marketing_csv(channel, "Bench"), inferred_channel(channel))
+        pd.testing.assert_frame_equal(data._read_business(business), inferred_business(business))
+
+        cases = {
+            "channel: inferred": lambda: inferred_channel(channel),
+            "channel: typed": lambda: data._read_marketing_csv(channel, "Bench"),
+            "business: inferred": lambda: inferred_business(business),
+            "business: typed": lambda: data._read_business(business),
+        }
+        print(f"channel file {args.rows:,} rows ({size_mb:.0f} MB), best of {args.repeat}")
+        for name, fn in cases.items():
+            best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+            rate = f"{args.rows / best / 1e6:6.2f} M rows/s" if name.startswith("channel") else ""
+            print(f"  {name:<22} {best * 1e3:9.1f} ms  {rate}")
+
+
+if __name__ == "__main__":
+    main()
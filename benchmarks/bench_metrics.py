@@ -0,0 +1,79 @@
+"""Benchmark the ratio-metric kernel against the previous compute_derived_metrics.
+
+    python benchmarks/bench_metrics.py [--rows N] [--repeat R]
+
+The baseline is the pre-kernel implementation (astype copies, a full division with
+warnings, then np.where), kept here verbatim so the comparison stays reproducible.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import sys
+import timeit
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from kernels import MARKETING_RATIOS, ratio_metrics  # noqa: E402
+from metrics import compute_derived_metrics  # noqa: E402
+
+
+def _legacy_safe_divide(numer: pd.Series, denom: pd.Series) -> pd.Series:
+    denom = denom.astype(float)
+    numer = numer.astype(float)
+    return pd.Series(np.where(denom == 0, 0.0, numer / denom))
+
+
+def legacy_derived_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    out["ctr"] = _legacy_safe_divide(out["clicks"], out["impressions"]).astype(float)
+    out["cpc"] = _legacy_safe_divide(out["spend"], out["clicks"]).astype(float)
+    out["cpm"] = 1000.0 * _legacy_safe_divide(out["spend"], out["impressions"]).astype(float)
+    out["roas"] = _legacy_safe_divide(out["attributed_revenue"], out["spend"]).astype(float)
+    return out
+
+
+def sample(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    impressions = rng.integers(0, 50_000, rows)
+    clicks = rng.binomial(impressions, 0.02)
+    spend = np.where(rng.random(rows) < 0.05, 0.0, rng.gamma(2.0, 40.0, rows))
+    return pd.DataFrame({
+        "impressions": impressions.astype(float),
+        "clicks": clicks.astype(float),
+        "spend": spend,
+        "attributed_revenue": spend * rng.lognormal(0.8, 0.5, rows),
+    })
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+    df = sample(args.rows)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = legacy_derived_metrics(df)
+    pd.testing.assert_frame_equal(compute_derived_metrics(df), expected)
+
+    cases = {
+        "legacy compute_derived_metrics": lambda: legacy_derived_metrics(df),
+        "compute_derived_metrics (kernel)": lambda: compute_derived_metrics(df),
+        "ratio_metrics float64": lambda: ratio_metrics(df, MARKETING_RATIOS),
+        "ratio_metrics float32": lambda: ratio_metrics(df, MARKETING_RATIOS, dtype=np.float32),
+    }
+    print(f"{args.rows:,} rows, best of {args.repeat}")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for name, fn in cases.items():
+            best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+            print(f"  {name:<34} {best * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()